@@ -6,6 +6,7 @@ import { ViewBase }   from './components/views/view-base/view-base';
 import { PipelineView } from './components/views/pipeline-view/pipeline-view';
 import { DictionaryView } from './components/views/dictionary-view/dictionary-view';
 import { DuplicatesView } from './components/views/duplicates-view/duplicates-view';
+import { CubeView } from './components/views/cube-view/cube-view';
 
 import { FzlbpmsContainersView } from './components/views/fzlbpms-containers-view/fzlbpms-containers-view';
 import { DesktopHomeView } from './components/views/desktop-home-view/desktop-home-view'
@@ -39,6 +40,10 @@ export const routes: Routes = [
         path:'duplicatesview',
         component: DuplicatesView
     },
+    {
+        path:'cubeview',
+        component: CubeView
+    },
     {
         path: 'moodle-install',
         component: MoodleInstallView
@@ -1,8 +1,8 @@
 import { Component, OnInit } from '@angular/core';
 import { HttpClient } from '@angular/common/http';
 import { CommonModule } from '@angular/common';
-import { DomSanitizer, SafeResourceUrl } from '@angular/platform-browser';
 import { MatCardModule } from '@angular/material/card';
+import { DashboardChart } from '../components/charts/dashboard-chart/dashboard-chart';
 
 interface YearStat {
   year: string;
@@ -12,15 +12,14 @@ interface YearStat {
 @Component({
   selector: 'app-census-analysis',
   standalone: true,
-  imports: [CommonModule, MatCardModule],
+  imports: [CommonModule, MatCardModule, DashboardChart],
   templateUrl: './census-analysis.html',
   styleUrl: './census-analysis.css'
 })
 export class CensusAnalysisComponent implements OnInit {
   data: YearStat[] = [];
-  plotlyChartUrl: SafeResourceUrl | null = null;
 
-  constructor(private http: HttpClient, private sanitizer: DomSanitizer) {}
+  constructor(private http: HttpClient) {}
 
   ngOnInit(): void {
     this.http.get<YearStat[]>('assets/data_analysis/summary_stats.json')
@@ -30,8 +29,5 @@ export class CensusAnalysisComponent implements OnInit {
         },
         error: (err) => console.error('Failed to load summary stats', err)
       });
-
-    const unsafeUrl = 'assets/data_analysis/student_count_by_year.html';
-    this.plotlyChartUrl = this.sanitizer.bypassSecurityTrustResourceUrl(unsafeUrl);
   }
 }
\ No newline at end of file
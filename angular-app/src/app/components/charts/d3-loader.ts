@@ -0,0 +1,7 @@
+// d3 is only fetched when a chart is first drawn, as one lazily loaded chunk shared by every chart
+let d3Module: Promise<typeof import('d3')> | null = null;
+
+export function loadD3(): Promise<typeof import('d3')> {
+  d3Module ??= import('d3');
+  return d3Module;
+}
@@ -0,0 +1,146 @@
+import { Component, computed, effect, ElementRef, HostListener, inject, input, OnInit, signal, ViewChild } from '@angular/core';
+import { CommonModule } from '@angular/common';
+import { HttpClient } from '@angular/common/http';
+import { loadD3 } from '../d3-loader';
+
+export interface DashboardSeries {
+  name: string;
+  y: (number | null)[];
+}
+
+export interface DashboardView {
+  name: string;
+  x_label: string;
+  y_label: string;
+  clustered: boolean;
+  x: (string | number)[];
+  series: DashboardSeries[];
+}
+
+export interface Dashboard {
+  title: string;
+  views: DashboardView[];
+}
+
+interface Bar {
+  x: string;
+  series: string;
+  value: number;
+}
+
+@Component({
+  selector: 'app-dashboard-chart',
+  standalone: true,
+  imports: [CommonModule],
+  templateUrl: './dashboard-chart.html',
+  styleUrl: './dashboard-chart.css',
+})
+export class DashboardChart implements OnInit {
+  private http = inject(HttpClient);
+
+  // Columnar dashboard data written by fzl_statistics_utils.generate_interactive_dashboard
+  src = input<string>('assets/data_analysis/dashboard.json');
+  showTable = input<boolean>(true);
+
+  @ViewChild('chartContainer', { static: true }) chartContainer!: ElementRef<HTMLDivElement>;
+
+  dashboard = signal<Dashboard | null>(null);
+  selectedView = signal<string>('');
+  view = computed(() => this.dashboard()?.views.find(v => v.name === this.selectedView()) ?? null);
+
+  constructor() {
+    effect(() => {
+      const view = this.view();
+      if (view) this.render(view);
+    });
+  }
+
+  ngOnInit() {
+    this.http.get<Dashboard>(this.src()).subscribe({
+      next: (data) => {
+        this.dashboard.set(data);
+        this.selectedView.set(data.views[0]?.name ?? '');
+      },
+      error: (err) => console.error('Error loading dashboard data:', err)
+    });
+  }
+
+  @HostListener('window:resize')
+  onResize() {
+    const view = this.view();
+    if (view) this.render(view);
+  }
+
+  setView(name: string) {
+    this.selectedView.set(name);
+  }
+
+  private async render(view: DashboardView) {
+    const d3 = await loadD3();
+    const container = this.chartContainer.nativeElement;
+    const width = container.offsetWidth || 800;
+    const height = 450;
+    const margin = { top: view.clustered ? 40 : 20, right: 20, bottom: 100, left: 70 };
+
+    const categories = view.x.map(String);
+    const names = view.series.map(s => s.name);
+    const bars: Bar[] = view.series.flatMap(s =>
+      s.y.flatMap((value, i) => value === null ? [] : [{ x: categories[i], series: s.name, value }])
+    );
+
+    const x = d3.scaleBand().domain(categories).range([margin.left, width - margin.right]).padding(0.2);
+    const inner = d3.scaleBand().domain(names).range([0, x.bandwidth()]).padding(0.05);
+    const y = d3.scaleLinear()
+      .domain([0, d3.max(bars, b => b.value) || 1]).nice()
+      .range([height - margin.bottom, margin.top]);
+    const color = d3.scaleOrdinal<string, string>().domain(names).range(view.clustered ? d3.schemeTableau10 : ['#1976d2']);
+
+    d3.select(container).selectAll('*').remove();
+    const svg = d3.select(container)
+      .append('svg')
+      .attr('width', width)
+      .attr('height', height);
+
+    svg.append('g')
+      .attr('transform', `translate(0,${height - margin.bottom})`)
+      .call(d3.axisBottom(x))
+      .selectAll('text')
+      .attr('transform', 'rotate(-40)')
+      .style('text-anchor', 'end');
+
+    svg.append('g')
+      .attr('transform', `translate(${margin.left},0)`)
+      .call(d3.axisLeft(y).ticks(6, '~s'));
+
+    svg.append('text')
+      .attr('transform', 'rotate(-90)')
+      .attr('x', -(height - margin.bottom + margin.top) / 2)
+      .attr('y', 16)
+      .attr('text-anchor', 'middle')
+      .attr('font-size', '12px')
+      .text(view.y_label);
+
+    svg.append('g')
+      .selectAll('rect')
+      .data(bars)
+      .join('rect')
+      .attr('x', b => (x(b.x) ?? 0) + (inner(b.series) ?? 0))
+      .attr('y', b => y(b.value))
+      .attr('width', inner.bandwidth())
+      .attr('height', b => y(0) - y(b.value))
+      .attr('fill', b => color(b.series))
+      .append('title')
+      .text(b => `${view.clustered ? b.series + ' · ' : ''}${b.x}: ${b.value.toLocaleString('pt-BR')}`);
+
+    if (view.clustered) {
+      const legend = svg.append('g')
+        .attr('transform', `translate(${margin.left},10)`)
+        .selectAll('g')
+        .data(names)
+        .join('g')
+        .attr('transform', (_, i) => `translate(${i * 110},0)`);
+      legend.append('rect').attr('width', 12).attr('height', 12).attr('fill', n => color(n));
+      legend.append('text').attr('x', 16).attr('y', 10).attr('font-size', '12px').text(n => n);
+    }
+  }
+}
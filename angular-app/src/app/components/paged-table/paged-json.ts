@@ -0,0 +1,95 @@
+import { Injectable, inject } from '@angular/core';
+import { HttpClient } from '@angular/common/http';
+import { CollectionViewer, DataSource } from '@angular/cdk/collections';
+import { BehaviorSubject, catchError, Observable, of, shareReplay, Subscription } from 'rxjs';
+
+// manifest.json of a paged artifact (see fzl_statistics_utils.export_paged_json)
+export interface PagedManifest {
+  columns: string[];
+  rows: number;
+  page_size: number;
+  pages: string[];
+  encodings: string[];
+  [meta: string]: unknown;
+}
+
+export type PagedRow = (string | number | boolean | null)[];
+
+// Fetches manifests and pages once per URL, so switching back to a year is served from memory.
+// Failed requests emit null and are not kept, so asking again retries them.
+@Injectable({ providedIn: 'root' })
+export class PagedJsonStore {
+  private http = inject(HttpClient);
+  private requests = new Map<string, Observable<unknown>>();
+
+  manifest(baseUrl: string): Observable<PagedManifest | null> {
+    return this.get<PagedManifest>(`${baseUrl}/manifest.json`);
+  }
+
+  page(baseUrl: string, name: string): Observable<PagedRow[] | null> {
+    return this.get<PagedRow[]>(`${baseUrl}/${name}`);
+  }
+
+  private get<T>(url: string): Observable<T | null> {
+    let request = this.requests.get(url) as Observable<T | null> | undefined;
+    if (!request) {
+      request = this.http.get<T>(url).pipe(
+        catchError(() => {
+          this.requests.delete(url);
+          return of(null);
+        }),
+        shareReplay(1)
+      );
+      this.requests.set(url, request);
+    }
+    return request;
+  }
+}
+
+// Virtual scroll data source: one entry per row, undefined until the page holding it is fetched.
+// Only the pages intersecting the rendered range are requested.
+export class PagedJsonDataSource extends DataSource<PagedRow | undefined> {
+  private rows: (PagedRow | undefined)[];
+  private rows$: BehaviorSubject<(PagedRow | undefined)[]>;
+  private requested = new Set<number>();
+  private subscription = new Subscription();
+
+  constructor(private store: PagedJsonStore, private baseUrl: string, private manifest: PagedManifest) {
+    super();
+    this.rows = new Array(manifest.rows).fill(undefined);
+    this.rows$ = new BehaviorSubject(this.rows);
+  }
+
+  connect(collectionViewer: CollectionViewer): Observable<(PagedRow | undefined)[]> {
+    this.subscription.add(
+      collectionViewer.viewChange.subscribe(range => {
+        const first = Math.floor(range.start / this.manifest.page_size);
+        const last = Math.floor(Math.max(range.end - 1, range.start) / this.manifest.page_size);
+        for (let page = first; page <= last; page++) {
+          this.loadPage(page);
+        }
+      })
+    );
+    return this.rows$;
+  }
+
+  disconnect(): void {
+    this.subscription.unsubscribe();
+  }
+
+  private loadPage(page: number) {
+    if (page >= this.manifest.pages.length || this.requested.has(page)) return;
+    this.requested.add(page);
+    this.subscription.add(
+      this.store.page(this.baseUrl, this.manifest.pages[page]).subscribe(rows => {
+        if (!rows) {
+          // Requested again the next time the page is scrolled into view
+          this.requested.delete(page);
+          return;
+        }
+        this.rows.splice(page * this.manifest.page_size, rows.length, ...rows);
+        this.rows$.next([...this.rows]);
+      })
+    );
+  }
+}
@@ -0,0 +1,47 @@
+import { Component, computed, inject, input, signal } from '@angular/core';
+import { CommonModule } from '@angular/common';
+import { ScrollingModule } from '@angular/cdk/scrolling';
+import { toObservable, toSignal } from '@angular/core/rxjs-interop';
+import { map, switchMap } from 'rxjs';
+import { PagedJsonDataSource, PagedJsonStore } from './paged-json';
+
+@Component({
+  selector: 'app-paged-table',
+  standalone: true,
+  imports: [CommonModule, ScrollingModule],
+  templateUrl: './paged-table.html',
+  styleUrl: './paged-table.css',
+})
+export class PagedTable {
+  private store = inject(PagedJsonStore);
+
+  // Directory of a paged artifact, e.g. assets/data_analysis/dictionary/2023
+  baseUrl = input.required<string>();
+  rowHeight = input<number>(48);
+
+  // Bumped by retry(), so a manifest that failed to load is requested again
+  private attempt = signal(0);
+
+  // The manifest is paired with its URL so a data source never mixes two artifacts
+  private source = toSignal(
+    toObservable(computed(() => ({ url: this.baseUrl(), attempt: this.attempt() }))).pipe(
+      switchMap(({ url }) => this.store.manifest(url).pipe(map(manifest => ({ url, manifest }))))
+    )
+  );
+
+  manifest = computed(() => this.source()?.manifest ?? null);
+
+  // The manifest of the current artifact could not be loaded
+  failed = computed(() => this.source()?.url === this.baseUrl() && this.source()?.manifest === null);
+
+  dataSource = computed(() => {
+    const source = this.source();
+    return source?.manifest ? new PagedJsonDataSource(this.store, source.url, source.manifest) : null;
+  });
+
+  columnsTemplate = computed(() => `repeat(${this.manifest()?.columns.length ?? 1}, minmax(120px, 1fr))`);
+
+  retry() {
+    this.attempt.update(n => n + 1);
+  }
+}
@@ -0,0 +1,198 @@
+import { Component, computed, inject, signal } from '@angular/core';
+import { CommonModule } from '@angular/common';
+import { HttpClient } from '@angular/common/http';
+import { toObservable, toSignal } from '@angular/core/rxjs-interop';
+import { catchError, map, Observable, of, shareReplay, switchMap } from 'rxjs';
+
+interface CubeDimension {
+  name: string;
+  label: string;
+  values: Record<string, string>;
+}
+
+interface CubeManifest {
+  year_col: string;
+  years: string[];
+  dimensions: CubeDimension[];
+  measures: { name: string; label: string }[];
+  cuboids: { dimensions: string[]; file: string; rows: number }[];
+}
+
+interface Cuboid {
+  dimensions: string[];
+  measures: string[];
+  rows: number;
+  dictionaries: Record<string, (string | number)[]>;
+  columns: Record<string, (string | number)[]>;
+}
+
+interface DrillStep {
+  dimension: string;
+  value: string;
+}
+
+interface CubeRow {
+  value: string;
+  label: string;
+  total: number;
+}
+
+@Component({
+  selector: 'app-cube-view',
+  standalone: true,
+  imports: [CommonModule],
+  templateUrl: './cube-view.html',
+  styleUrl: './cube-view.css',
+})
+export class CubeView {
+  private http = inject(HttpClient);
+  private baseUrl = 'assets/data_analysis/cube';
+  // Cuboids already requested, so going back up the drill path does not fetch again
+  // (failed requests are dropped, so they are retried)
+  private cuboids = new Map<string, Observable<Cuboid | null>>();
+  // Bumped by retry(), so a cuboid that failed to load is requested again
+  private attempt = signal(0);
+
+  manifest = signal<CubeManifest | null>(null);
+  manifestFailed = signal(false);
+  selectedYear = signal<string>('');
+  selectedMeasure = signal<string>('');
+  breakdown = signal<string>('');
+  path = signal<DrillStep[]>([]);
+
+  // Dimensions still available to break the current slice down by
+  nextDimensions = computed(() => {
+    const manifest = this.manifest();
+    if (!manifest) return [];
+    const used = this.path().map(step => step.dimension);
+    return manifest.dimensions.filter(d => !used.includes(d.name) && this.findCuboid([...used, d.name]));
+  });
+
+  private request = computed(() => {
+    const used = this.path().map(step => step.dimension);
+    const breakdown = this.breakdown();
+    const entry = breakdown ? this.findCuboid([...used, breakdown]) : null;
+    return entry ? { file: entry.file, attempt: this.attempt() } : null;
+  });
+
+  private cuboid = toSignal(
+    toObservable(this.request).pipe(
+      switchMap(entry => entry ? this.loadCuboid(entry.file) : of(null))
+    )
+  );
+
+  // The cuboid of the current slice could not be loaded
+  cuboidFailed = computed(() => !!this.request() && this.cuboid() === null);
+
+  rows = computed<CubeRow[]>(() => {
+    const cuboid = this.cuboid();
+    const manifest = this.manifest();
+    const breakdown = this.breakdown();
+    if (!cuboid || !manifest || !cuboid.dimensions.includes(breakdown)) return [];
+
+    const years = cuboid.columns[manifest.year_col];
+    const measure = cuboid.columns[this.selectedMeasure()] ?? [];
+    const filters = this.path().map(step => ({
+      codes: cuboid.columns[step.dimension],
+      code: cuboid.dictionaries[step.dimension].findIndex(v => String(v) === step.value)
+    }));
+    const codes = cuboid.columns[breakdown];
+    const values = cuboid.dictionaries[breakdown];
+
+    const totals = new Map<number, number>();
+    for (let i = 0; i < cuboid.rows; i++) {
+      if (years[i] !== this.selectedYear()) continue;
+      if (filters.some(f => f.codes[i] !== f.code)) continue;
+      const code = codes[i] as number;
+      totals.set(code, (totals.get(code) ?? 0) + Number(measure[i] ?? 0));
+    }
+    return [...totals.entries()]
+      .map(([code, total]) => ({ value: String(values[code]), label: this.valueLabel(breakdown, values[code]), total }))
+      .sort((a, b) => b.total - a.total);
+  });
+
+  maxTotal = computed(() => Math.max(1, ...this.rows().map(r => r.total)));
+
+  constructor() {
+    this.loadManifest();
+  }
+
+  loadManifest() {
+    this.manifestFailed.set(false);
+    this.http.get<CubeManifest>(`${this.baseUrl}/manifest.json`).subscribe({
+      next: (manifest) => {
+        this.manifest.set(manifest);
+        this.selectedYear.set(manifest.years[manifest.years.length - 1] ?? '');
+        this.selectedMeasure.set(manifest.measures[0]?.name ?? '');
+        this.breakdown.set(manifest.dimensions[0]?.name ?? '');
+      },
+      error: (err) => {
+        console.error('Error loading cube manifest:', err);
+        this.manifestFailed.set(true);
+      }
+    });
+  }
+
+  retry() {
+    this.attempt.update(n => n + 1);
+  }
+
+  setYear(year: string) {
+    this.selectedYear.set(year);
+  }
+
+  setBreakdown(dimension: string) {
+    this.breakdown.set(dimension);
+  }
+
+  // Fixes the clicked value and breaks it down by the next available dimension
+  drillDown(row: CubeRow) {
+    const used = [...this.path().map(step => step.dimension), this.breakdown()];
+    const next = this.manifest()?.dimensions.find(d => !used.includes(d.name) && this.findCuboid([...used, d.name]));
+    if (!next) return;
+    this.path.set([...this.path(), { dimension: this.breakdown(), value: row.value }]);
+    this.breakdown.set(next.name);
+  }
+
+  // Goes back to the given level of the drill path (0 = everything)
+  drillUp(level: number) {
+    const removed = this.path()[level];
+    this.path.set(this.path().slice(0, level));
+    if (removed) this.breakdown.set(removed.dimension);
+  }
+
+  canDrillDown(): boolean {
+    const used = [...this.path().map(step => step.dimension), this.breakdown()];
+    return !!this.manifest()?.dimensions.some(d => !used.includes(d.name) && this.findCuboid([...used, d.name]));
+  }
+
+  dimensionLabel(name: string): string {
+    return this.manifest()?.dimensions.find(d => d.name === name)?.label ?? name;
+  }
+
+  valueLabel(dimension: string, value: string | number): string {
+    const labels = this.manifest()?.dimensions.find(d => d.name === dimension)?.values ?? {};
+    return labels[String(value)] ?? String(value);
+  }
+
+  private findCuboid(dimensions: string[]) {
+    return this.manifest()?.cuboids.find(c =>
+      c.dimensions.length === dimensions.length && dimensions.every(d => c.dimensions.includes(d))
+    ) ?? null;
+  }
+
+  private loadCuboid(file: string): Observable<Cuboid | null> {
+    let cuboid = this.cuboids.get(file);
+    if (!cuboid) {
+      cuboid = this.http.get<Cuboid>(`${this.baseUrl}/${file}`).pipe(
+        catchError(() => {
+          this.cuboids.delete(file);
+          return of(null);
+        }),
+        shareReplay(1)
+      );
+      this.cuboids.set(file, cuboid);
+    }
+    return cuboid;
+  }
+}
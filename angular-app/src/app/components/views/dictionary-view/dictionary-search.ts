@@ -0,0 +1,82 @@
+// Search over the prebuilt dictionary index (fzl_opendata_build_dictionary_search_index)
+
+export interface DictionarySearchIndex {
+  years: string[];
+  // [variable name, description, indexes into years]
+  docs: [string, string, number[]][];
+  // Sorted tokens and, for each, the sorted ids of the docs containing it
+  terms: string[];
+  postings: number[][];
+}
+
+export interface DictionaryHit {
+  name: string;
+  description: string;
+  years: string[];
+}
+
+// Same folding and stopwords as the pipeline (fold_search_text / SEARCH_STOPWORDS)
+const STOPWORDS = new Set([
+  'a', 'o', 'as', 'os', 'e', 'de', 'da', 'do', 'das', 'dos', 'em', 'na', 'no', 'nas', 'nos',
+  'para', 'por', 'com', 'ou', 'um', 'uma', 'que', 'se', 'ao', 'aos', 'pela', 'pelo'
+]);
+
+export function foldSearchText(text: string): string {
+  return text.normalize('NFKD').replace(/[\u0300-\u036f]/g, '').toLowerCase();
+}
+
+// First position in the sorted terms whose term is >= token
+function lowerBound(terms: string[], token: string): number {
+  let lo = 0;
+  let hi = terms.length;
+  while (lo < hi) {
+    const mid = (lo + hi) >> 1;
+    if (terms[mid] < token) lo = mid + 1;
+    else hi = mid;
+  }
+  return lo;
+}
+
+// Docs with a term starting with the token
+function prefixMatches(index: DictionarySearchIndex, token: string): Set<number> {
+  const docs = new Set<number>();
+  for (let i = lowerBound(index.terms, token); i < index.terms.length && index.terms[i].startsWith(token); i++) {
+    for (const doc of index.postings[i]) docs.add(doc);
+  }
+  return docs;
+}
+
+/**
+ * Every query token must prefix-match a term of the variable (name, name part or description word).
+ * Stopwords are not indexed, so they are ignored; a stopword in the last position may still be
+ * the start of a longer word and only narrows the results when something matches it.
+ * Exact and prefix matches on the variable name come first.
+ */
+export function searchDictionary(index: DictionarySearchIndex, query: string, limit = 50): DictionaryHit[] {
+  const folded = foldSearchText(query).trim();
+  const words = folded.match(/[a-z0-9_]+/g) ?? [];
+
+  let matches: Set<number> | null = null;
+  for (const [i, token] of words.entries()) {
+    const stopword = STOPWORDS.has(token);
+    if (stopword && i < words.length - 1) continue;
+    const docs = prefixMatches(index, token);
+    const narrowed: Set<number> = matches === null ? docs : new Set([...matches].filter(doc => docs.has(doc)));
+    if (stopword && narrowed.size === 0 && matches !== null) continue;
+    matches = narrowed;
+    if (matches.size === 0) return [];
+  }
+
+  const rank = (name: string) => {
+    const lower = name.toLowerCase();
+    if (lower === folded) return 0;
+    if (lower.startsWith(folded)) return 1;
+    return 2;
+  };
+
+  return [...(matches ?? [])]
+    .map(doc => index.docs[doc])
+    .sort((a, b) => rank(a[0]) - rank(b[0]) || a[0].localeCompare(b[0]))
+    .slice(0, limit)
+    .map(([name, description, years]) => ({ name, description, years: years.map(y => index.years[y]) }));
+}
@@ -1,24 +1,31 @@
-import { Component, inject, signal } from '@angular/core';
+import { Component, computed, inject, signal } from '@angular/core';
 import { CommonModule } from '@angular/common';
 import { HttpClient } from '@angular/common/http';
-import { DomSanitizer, SafeHtml } from '@angular/platform-browser';
-import { toObservable, toSignal } from '@angular/core/rxjs-interop';
-import { catchError, map, of, switchMap, filter } from 'rxjs';
+import { PagedTable } from '../../paged-table/paged-table';
+import { DictionarySearchIndex, searchDictionary } from './dictionary-search';
 
 @Component({
   selector: 'app-dictionary-view',
   standalone: true,
-  imports: [CommonModule],
+  imports: [CommonModule, PagedTable],
   templateUrl: './dictionary-view.html',
   styleUrl: './dictionary-view.css',
 })
 export class DictionaryView {
   private http = inject(HttpClient);
-  private sanitizer = inject(DomSanitizer);
 
   years = signal<string[]>([]);
   selectedYear = signal<string>('');
 
+  // Cross-year search index, fetched once on the first search
+  private searchIndex = signal<DictionarySearchIndex | null>(null);
+  private searchIndexRequested = false;
+  query = signal<string>('');
+  searchResults = computed(() => {
+    const index = this.searchIndex();
+    return index ? searchDictionary(index, this.query()) : [];
+  });
+
   constructor() {
     this.loadYears();
   }
@@ -40,20 +47,24 @@ export class DictionaryView {
     });
   }
 
-  dictionaryHtml = toSignal(
-    toObservable(this.selectedYear).pipe(
-      // Only fetch if a year is selected
-      filter(year => !!year),
-      switchMap(year => 
-        this.http.get(`assets/data_analysis/dictionary_${year}.html`, { responseType: 'text' }).pipe(
-          map(html => this.sanitizer.bypassSecurityTrustHtml(html)),
-          catchError(() => of(this.sanitizer.bypassSecurityTrustHtml('<p class="text-danger">Erro ao carregar dicionário.</p>')))
-        )
-      )
-    )
-  );
-
   setYear(year: string) {
     this.selectedYear.set(year);
   }
-}
\ No newline at end of file
+
+  loadSearchIndex() {
+    if (this.searchIndexRequested) return;
+    this.searchIndexRequested = true;
+    this.http.get<DictionarySearchIndex>('assets/data_analysis/dictionary/search_index.json').subscribe({
+      next: (data) => this.searchIndex.set(data),
+      error: (err) => {
+        this.searchIndexRequested = false;
+        console.error('Error loading dictionary search index:', err);
+      }
+    });
+  }
+
+  search(query: string) {
+    this.loadSearchIndex();
+    this.query.set(query);
+  }
+}
@@ -1,20 +1,29 @@
 import { Component, inject, signal } from '@angular/core';
 import { CommonModule } from '@angular/common';
 import { HttpClient } from '@angular/common/http';
-import { DomSanitizer, SafeHtml } from '@angular/platform-browser';
 import { toObservable, toSignal } from '@angular/core/rxjs-interop';
-import { catchError, map, of, switchMap, filter } from 'rxjs';
+import { filter, map, switchMap } from 'rxjs';
+import { PagedTable } from '../../paged-table/paged-table';
+import { PagedJsonStore, PagedManifest } from '../../paged-table/paged-json';
+
+// Summary written in the manifest by fzl_opendata_write_duplicates_json
+interface DuplicatesManifest extends PagedManifest {
+  checked_rows: number;
+  duplicate_rows: number;
+  duplicate_groups: number;
+  largest_group: number;
+}
 
 @Component({
   selector: 'app-duplicates-view',
   standalone: true,
-  imports: [CommonModule],
+  imports: [CommonModule, PagedTable],
   templateUrl: './duplicates-view.html',
   styleUrl: './duplicates-view.css',
 })
 export class DuplicatesView {
   private http = inject(HttpClient);
-  private sanitizer = inject(DomSanitizer);
+  private store = inject(PagedJsonStore);
 
   years = signal<string[]>([]);
   selectedYear = signal<string>('');
@@ -38,19 +47,16 @@ export class DuplicatesView {
     });
   }
 
-  duplicatesHtml = toSignal(
+  // Same cached request as the table's, so the manifest is fetched once per year
+  summary = toSignal(
     toObservable(this.selectedYear).pipe(
       filter(year => !!year),
-      switchMap(year => 
-        this.http.get(`assets/data_analysis/duplicates_${year}.html`, { responseType: 'text' }).pipe(
-          map(html => this.sanitizer.bypassSecurityTrustHtml(html)),
-          catchError(() => of(this.sanitizer.bypassSecurityTrustHtml('<p class="text-info">Nenhum registro duplicado detectado para este ano.</p>')))
-        )
-      )
+      switchMap(year => this.store.manifest(`assets/data_analysis/duplicates/${year}`)),
+      map(manifest => manifest as DuplicatesManifest | null)
     )
   );
 
   setYear(year: string) {
     this.selectedYear.set(year);
   }
-}
\ No newline at end of file
+}
@@ -1,12 +1,50 @@
-import { Component, inject, OnInit, signal, ViewChild, ElementRef, AfterViewInit } from '@angular/core';
+import { Component, computed, inject, OnInit, signal, ViewChild, ElementRef, AfterViewInit } from '@angular/core';
 import { CommonModule } from '@angular/common';
 import { HttpClient } from '@angular/common/http';
-import * as d3 from 'd3';
+import { loadD3 } from '../../charts/d3-loader';
+
+// Profile of a stage, in total or for one year (fzl_profiling_utils.StageProfiler)
+interface StageMetrics {
+  wall_s: number;
+  cpu_s: number;
+  peak_rss_bytes: number | null;
+  bytes_read: number | null;
+  rows: number | null;
+  rows_per_s: number | null;
+}
+
+interface YearProfile extends StageMetrics {
+  year: string;
+  status: string;
+}
 
-interface PipelineStep {
+interface PipelineStep extends Partial<StageMetrics> {
   id: string;
   label: string;
   status: 'pending' | 'completed' | 'error';
+  years?: YearProfile[];
+  bottleneck?: boolean;
+}
+
+const ROW_HEIGHT = 110;
+
+function formatBytes(bytes: number | null | undefined): string {
+  if (bytes === null || bytes === undefined) return '–';
+  const units = ['B', 'KB', 'MB', 'GB', 'TB'];
+  let value = bytes;
+  let unit = 0;
+  while (value >= 1024 && unit < units.length - 1) {
+    value /= 1024;
+    unit++;
+  }
+  return `${value.toFixed(unit ? 1 : 0)} ${units[unit]}`;
+}
+
+function formatMetrics(m: Partial<StageMetrics>): string {
+  const parts = [`${(m.wall_s ?? 0).toFixed(2)} s`, `CPU ${(m.cpu_s ?? 0).toFixed(2)} s`, `RSS ${formatBytes(m.peak_rss_bytes)}`,
+    `read ${formatBytes(m.bytes_read)}`];
+  if (m.rows_per_s) parts.push(`${Math.round(m.rows_per_s).toLocaleString()} rows/s`);
+  return parts.join(' · ');
 }
 
 @Component({
@@ -22,6 +60,7 @@ export class PipelineView implements OnInit, AfterViewInit {
   @ViewChild('d3Container') d3Container!: ElementRef;
 
   pipelineSteps = signal<PipelineStep[]>([]);
+  bottleneck = computed(() => this.pipelineSteps().find(s => s.bottleneck) ?? null);
 
   ngOnInit() {
   }
@@ -41,12 +80,20 @@ export class PipelineView implements OnInit, AfterViewInit {
       });
   }
 
-  renderD3Graph(steps: PipelineStep[]) {
+  formatMetrics = formatMetrics;
+
+  async renderD3Graph(steps: PipelineStep[]) {
     if (!this.d3Container) return;
+    const d3 = await loadD3();
 
     const container = this.d3Container.nativeElement;
     const width = container.offsetWidth || 400;
-    const height = steps.length * 100;
+    const height = steps.length * ROW_HEIGHT + 40;
+    const nodeX = 40;
+    // Per-year bars of the wall time, on the right, with one scale for every step
+    const barsLeft = Math.max(width * 0.55, 320);
+    const barsWidth = Math.max(width - barsLeft - 20, 80);
+    const barsHeight = ROW_HEIGHT - 50;
 
     d3.select(container).selectAll('*').remove();
 
@@ -57,8 +104,8 @@ export class PipelineView implements OnInit, AfterViewInit {
 
     const nodes = steps.map((s, i) => ({ 
       ...s, 
-      x: width / 2, 
-      y: (i + 1) * 80 
+      x: nodeX, 
+      y: i * ROW_HEIGHT + 50 
     }));
     
     const links = [];
@@ -77,10 +124,11 @@ export class PipelineView implements OnInit, AfterViewInit {
       .attr('stroke', '#999')
       .attr('stroke-width', 2);
 
-    const nodeGroups = svg.selectAll('g')
+    const nodeGroups = svg.selectAll('g.step')
       .data(nodes)
       .enter()
       .append('g')
+      .attr('class', 'step')
       .attr('transform', d => `translate(${d.x},${d.y})`);
 
     nodeGroups.append('circle')
@@ -90,8 +138,8 @@ export class PipelineView implements OnInit, AfterViewInit {
         if (d.status === 'error') return '#f44336';
         return '#2196f3';
       })
-      .attr('stroke', '#fff')
-      .attr('stroke-width', 2);
+      .attr('stroke', d => d.bottleneck ? '#ff9800' : '#fff')
+      .attr('stroke-width', d => d.bottleneck ? 5 : 2);
 
     nodeGroups.append('text')
       .attr('dy', 5)
@@ -107,11 +155,56 @@ export class PipelineView implements OnInit, AfterViewInit {
 
     nodeGroups.append('text')
       .attr('dx', 40)
-      .attr('dy', 5)
+      .attr('dy', -2)
       .attr('text-anchor', 'start')
       .attr('fill', '#333')
       .attr('font-size', '14px')
       .attr('font-weight', 'bold')
-      .text(d => d.label);
+      .text(d => d.bottleneck ? `${d.label} — bottleneck` : d.label);
+
+    nodeGroups.filter(d => d.wall_s !== undefined)
+      .append('text')
+      .attr('dx', 40)
+      .attr('dy', 16)
+      .attr('text-anchor', 'start')
+      .attr('fill', '#616161')
+      .attr('font-size', '12px')
+      .text(d => formatMetrics(d));
+
+    const yearEntries = nodes.flatMap(n => n.years ?? []);
+    if (!yearEntries.length) return;
+
+    const years = [...new Set(yearEntries.map(y => y.year))].sort();
+    const x = d3.scaleBand().domain(years).range([0, barsWidth]).padding(0.2);
+    const y = d3.scaleLinear().domain([0, d3.max(yearEntries, e => e.wall_s) || 1]).nice().range([barsHeight, 0]);
+
+    const charts = svg.selectAll('g.years')
+      .data(nodes.filter(n => n.years?.length))
+      .enter()
+      .append('g')
+      .attr('class', 'years')
+      .attr('transform', d => `translate(${barsLeft},${d.y - barsHeight / 2 - 10})`);
+
+    charts.append('g')
+      .attr('transform', `translate(0,${barsHeight})`)
+      .call(d3.axisBottom(x).tickSizeOuter(0))
+      .selectAll('text')
+      .attr('font-size', '10px');
+
+    charts.append('g')
+      .call(d3.axisLeft(y).ticks(3).tickFormat(v => `${v}s`))
+      .selectAll('text')
+      .attr('font-size', '10px');
+
+    charts.selectAll('rect')
+      .data(d => (d.years ?? []).map(entry => ({ ...entry, bottleneck: !!d.bottleneck })))
+      .join('rect')
+      .attr('x', e => x(e.year) ?? 0)
+      .attr('y', e => y(e.wall_s))
+      .attr('width', x.bandwidth())
+      .attr('height', e => barsHeight - y(e.wall_s))
+      .attr('fill', e => e.status === 'cached' || e.status === 'skipped' ? '#bdbdbd' : e.bottleneck ? '#ff9800' : '#2196f3')
+      .append('title')
+      .text(e => `${e.year} (${e.status}): ${formatMetrics(e)}`);
   }
 }
@@ -0,0 +1,49 @@
+import { inject, Injectable } from '@angular/core';
+import { HttpBackend, HttpClient, HttpInterceptorFn } from '@angular/common/http';
+import { catchError, map, Observable, of, shareReplay, switchMap } from 'rxjs';
+
+// Written by fzl_statistics_utils.publish_content_hashed_assets
+const DATA_PREFIX = 'assets/data_analysis/';
+const MANIFEST = 'data-manifest.json';
+const HASHED_DIR = 'blobs/';
+
+interface DataManifest {
+  version: string;
+  // Logical path (relative to DATA_PREFIX) -> content-hashed copy
+  files: Record<string, string>;
+}
+
+/**
+ * Resolves pipeline outputs to their content-hashed copies. Hashed files never change, so the
+ * service worker caches them for good and only the manifest has to be revalidated.
+ */
+@Injectable({ providedIn: 'root' })
+export class DataAssets {
+  // Bypasses the interceptors, so loading the manifest is not resolved through itself
+  private http = new HttpClient(inject(HttpBackend));
+
+  private manifest$: Observable<Record<string, string>> = this.http.get<DataManifest>(DATA_PREFIX + MANIFEST).pipe(
+    map(manifest => manifest.files),
+    // Without a manifest (pipeline output from before hashing) the logical paths are used
+    catchError(() => of({} as Record<string, string>)),
+    shareReplay(1)
+  );
+
+  resolve(path: string): Observable<string> {
+    return this.manifest$.pipe(map(files => files[path] ? DATA_PREFIX + files[path] : DATA_PREFIX + path));
+  }
+}
+
+// Logical path of a request for a pipeline output, or null for anything else
+function dataAssetPath(url: string): string | null {
+  const path = url.replace(/^\.?\//, '');
+  if (!path.startsWith(DATA_PREFIX) || path.includes('?')) return null;
+  const logical = path.slice(DATA_PREFIX.length);
+  return logical === MANIFEST || logical.startsWith(HASHED_DIR) ? null : logical;
+}
+
+export const dataAssetsInterceptor: HttpInterceptorFn = (req, next) => {
+  const path = req.method === 'GET' ? dataAssetPath(req.url) : null;
+  if (path === null) return next(req);
+  return inject(DataAssets).resolve(path).pipe(switchMap(url => next(req.clone({ url }))));
+};
@@ -0,0 +1,227 @@
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import statistics
+import pandas as pd
+
+from fzl_opendata_utils import find_census_members_in_zip, open_file_in_zip, read_file_from_zip, fzl_opendata_read_dictionary_fields
+from fzl_opendata_censoeducacaoinep import load_census_csv, aggregate_by_year, census_dtype_plan, CONTEXT_COLUMNS
+from fzl_dedup_utils import find_duplicates
+from fzl_statistics_utils import generate_interactive_dashboard
+from fzl_profiling_utils import StageProfiler
+from fzl_synthetic_census import make_synthetic_census_zip
+import process_census
+
+# Synthetic inputs are generated once per (year, rows, columns, seed) and reused by later runs
+BENCHMARK_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'benchmark')
+BENCHMARK_OUTPUT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'benchmarks', 'results.json')
+
+BENCHMARK_YEAR = '2023'
+BENCHMARK_ROWS = 200000
+BENCHMARK_COLUMNS = 400
+BENCHMARK_REPEAT = 3
+BENCHMARK_CHUNKSIZE = 100000
+
+# Metrics summed by the aggregation benchmarks, as in main.FIELDS_TO_ANALYZE
+BENCHMARK_FIELDS = ['QT_MAT_ESP', 'QT_MAT_BAS', 'QT_MAT_INF', 'QT_MAT_FUND', 'QT_MAT_MED']
+
+# A benchmark is reported as a regression when its best time exceeds the baseline by this fraction
+REGRESSION_TOLERANCE = 0.25
+
+def prepare_input(work_dir, year=BENCHMARK_YEAR, rows=BENCHMARK_ROWS, columns=BENCHMARK_COLUMNS, seed=0):
+    """
+    Returns the context shared by the benchmarks: the synthetic zip (generated when missing),
+    its members, the dtype plan and columns main.process_year would read, and the loaded
+    DataFrame and tables the later stages start from.
+    """
+    os.makedirs(work_dir, exist_ok=True)
+    zip_path = os.path.join(work_dir, f"microdados_censo_escolar_{year}_{rows}x{columns}_s{seed}.zip")
+    if not os.path.exists(zip_path):
+        print(f"Generating synthetic census {zip_path} ({rows} rows, {columns} columns)...")
+        tmp_path = f"{zip_path}.{os.getpid()}.tmp"
+        make_synthetic_census_zip(tmp_path, year, rows, columns=columns, seed=seed)
+        os.replace(tmp_path, zip_path)
+
+    csv_member, dict_member = find_census_members_in_zip(zip_path)
+    df_fields = fzl_opendata_read_dictionary_fields(read_file_from_zip(zip_path, dict_member))
+    variable_names = [str(v).strip().upper() for v in df_fields['Nome da Variável']]
+    columns_to_use = variable_names[:CONTEXT_COLUMNS]
+    for c in ['NU_ANO_CENSO', 'NO_UF', 'TP_DEPENDENCIA', 'CO_ENTIDADE'] + BENCHMARK_FIELDS:
+        if c not in columns_to_use:
+            columns_to_use.append(c)
+
+    context = {
+        'zip_path': zip_path,
+        'csv_member': csv_member,
+        'work_dir': work_dir,
+        'rows': rows,
+        'columns': columns_to_use,
+        'dtype': census_dtype_plan(df_fields)
+    }
+    with open_file_in_zip(zip_path, csv_member) as csv_file:
+        context['df'] = load_census_csv(csv_file, columns=columns_to_use, dtype=context['dtype'])
+
+    df = context['df']
+    context['data_views'] = {
+        'Por Ano': {'df': aggregate_by_year(df, value_col='QT_MAT_ESP'), 'x_col': 'NU_ANO_CENSO', 'y_col': 'QT_MAT_ESP',
+                    'x_label': 'Ano do Censo'},
+        'Por Estado': {'df': aggregate_by_year(df, value_col='QT_MAT_ESP', group_cols=['NO_UF', 'TP_DEPENDENCIA']),
+                       'x_col': 'NO_UF', 'y_col': 'QT_MAT_ESP', 'x_label': 'Unidade da Federação',
+                       'cluster_col': 'TP_DEPENDENCIA'},
+        'Por Município': {'df': aggregate_by_year(df, value_col='QT_MAT_ESP', group_cols=['CO_MUNICIPIO']),
+                          'x_col': 'CO_MUNICIPIO', 'y_col': 'QT_MAT_ESP', 'x_label': 'Município'}
+    }
+    return context
+
+def bench_load_census_csv(ctx):
+    with open_file_in_zip(ctx['zip_path'], ctx['csv_member']) as csv_file:
+        return len(load_census_csv(csv_file, columns=ctx['columns'], dtype=ctx['dtype']))
+
+def bench_load_census_csv_chunked(ctx):
+    rows = 0
+    with open_file_in_zip(ctx['zip_path'], ctx['csv_member']) as csv_file:
+        for chunk in load_census_csv(csv_file, columns=ctx['columns'], dtype=ctx['dtype'], chunksize=BENCHMARK_CHUNKSIZE):
+            rows += len(chunk)
+    return rows
+
+def bench_aggregate_by_year(ctx):
+    df = ctx['df']
+    aggregate_by_year(df, value_col=BENCHMARK_FIELDS)
+    aggregate_by_year(df, value_col=BENCHMARK_FIELDS, group_cols=['NO_UF'])
+    return len(df)
+
+def bench_read_and_aggregate(ctx):
+    with open_file_in_zip(ctx['zip_path'], ctx['csv_member']) as csv_file:
+        process_census.read_and_aggregate(csv_file)
+    return ctx['rows']
+
+def bench_dedup(ctx):
+    keys = ctx['df'][['CO_ENTIDADE']]
+    chunks = (keys.iloc[i:i + BENCHMARK_CHUNKSIZE] for i in range(0, len(keys), BENCHMARK_CHUNKSIZE))
+    find_duplicates(chunks, ['CO_ENTIDADE'], spill_dir=ctx['work_dir'])
+    return len(keys)
+
+def bench_generate_interactive_dashboard(ctx):
+    generate_interactive_dashboard(ctx['data_views'], 'Benchmark', os.path.join(ctx['work_dir'], 'dashboard.json'))
+    return sum(len(view['df']) for view in ctx['data_views'].values())
+
+BENCHMARKS = {
+    'load_census_csv': bench_load_census_csv,
+    'load_census_csv_chunked': bench_load_census_csv_chunked,
+    'aggregate_by_year': bench_aggregate_by_year,
+    'process_census.read_and_aggregate': bench_read_and_aggregate,
+    'dedup': bench_dedup,
+    'generate_interactive_dashboard': bench_generate_interactive_dashboard
+}
+
+def run_benchmarks(context, names=None, repeat=BENCHMARK_REPEAT):
+    """
+    Runs each benchmark repeat times and returns {name: metrics}: the wall time of every run,
+    the best and median, and CPU time, bytes read and rows/s of the best run (see StageProfiler).
+    """
+    results = {}
+    for name in names or BENCHMARKS:
+        runs = []
+        for _ in range(repeat):
+            profiler = StageProfiler()
+            with profiler.stage(name) as run:
+                run.add_rows(BENCHMARKS[name](context))
+            runs.append(profiler.records[0])
+
+        best = min(runs, key=lambda r: r['wall_s'])
+        results[name] = {
+            'runs_s': [round(r['wall_s'], 4) for r in runs],
+            'best_s': round(best['wall_s'], 4),
+            'median_s': round(statistics.median(r['wall_s'] for r in runs), 4),
+            'cpu_s': round(best['cpu_s'], 4),
+            'peak_rss_bytes': max((r['peak_rss_bytes'] for r in runs if r['peak_rss_bytes'] is not None), default=None),
+            'bytes_read': best['bytes_read'],
+            'rows': best['rows'],
+            'rows_per_s': round(best['rows'] / best['wall_s'], 1) if best['rows'] and best['wall_s'] > 0 else None
+        }
+        print(f"{name:40s} best {results[name]['best_s']:8.3f}s  median {results[name]['median_s']:8.3f}s  "
+              f"{results[name]['rows_per_s'] or 0:12,.0f} rows/s")
+    return results
+
+def compare_with_baseline(report, baseline, tolerance=REGRESSION_TOLERANCE):
+    """
+    Returns the benchmarks whose best time is more than tolerance slower than in the baseline report,
+    as {name: {'baseline_s', 'best_s', 'ratio'}}.
+    """
+    if baseline.get('params') != report['params']:
+        print(f"Warning: baseline params {baseline.get('params')} differ from {report['params']}")
+    regressions = {}
+    for name, result in report['benchmarks'].items():
+        previous = baseline.get('benchmarks', {}).get(name)
+        if not previous or not previous.get('best_s'):
+            continue
+        ratio = result['best_s'] / previous['best_s']
+        result['baseline_ratio'] = round(ratio, 3)
+        if ratio > 1 + tolerance:
+            regressions[name] = {'baseline_s': previous['best_s'], 'best_s': result['best_s'], 'ratio': round(ratio, 3)}
+    return regressions
+
+def main(rows=BENCHMARK_ROWS, columns=BENCHMARK_COLUMNS, repeat=BENCHMARK_REPEAT, seed=0, names=None,
+         work_dir=BENCHMARK_DIR, output=BENCHMARK_OUTPUT, baseline=None, tolerance=REGRESSION_TOLERANCE):
+    print("########## Census pipeline benchmarks (synthetic data) ##########")
+    context = prepare_input(work_dir, rows=rows, columns=columns, seed=seed)
+
+    report = {
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'environment': {
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count()
+        },
+        'params': {'year': BENCHMARK_YEAR, 'rows': rows, 'columns': columns, 'seed': seed, 'repeat': repeat,
+                   'chunksize': BENCHMARK_CHUNKSIZE, 'fields': BENCHMARK_FIELDS},
+        'input_bytes': os.path.getsize(context['zip_path']),
+        'benchmarks': run_benchmarks(context, names, repeat)
+    }
+
+    regressions = {}
+    if baseline:
+        with open(baseline, 'r', encoding='utf-8') as f:
+            regressions = compare_with_baseline(report, json.load(f), tolerance)
+        report['regressions'] = regressions
+        for name, r in regressions.items():
+            print(f"REGRESSION {name}: {r['best_s']:.3f}s vs {r['baseline_s']:.3f}s (x{r['ratio']})")
+
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"Benchmark results saved to {output}")
+    return report, regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks of the census pipeline on synthetic INEP-shaped data")
+    parser.add_argument('--rows', type=int, default=BENCHMARK_ROWS,
+                        help="rows of the synthetic microdados_ed_basica CSV (default: %(default)s)")
+    parser.add_argument('--columns', type=int, default=BENCHMARK_COLUMNS,
+                        help="columns of the synthetic CSV (default: %(default)s)")
+    parser.add_argument('--repeat', type=int, default=BENCHMARK_REPEAT,
+                        help="runs per benchmark; the best one is compared (default: %(default)s)")
+    parser.add_argument('--seed', type=int, default=0,
+                        help="seed of the synthetic data generator (default: %(default)s)")
+    parser.add_argument('--only', default='',
+                        help=f"comma separated benchmarks to run (default: all of {', '.join(BENCHMARKS)})")
+    parser.add_argument('--work-dir', default=BENCHMARK_DIR,
+                        help="where the synthetic zips are generated and kept (default: %(default)s)")
+    parser.add_argument('--output', default=BENCHMARK_OUTPUT,
+                        help="JSON file with the results (default: %(default)s)")
+    parser.add_argument('--baseline',
+                        help="earlier results JSON; exits with status 1 when a benchmark got slower than --tolerance")
+    parser.add_argument('--tolerance', type=float, default=REGRESSION_TOLERANCE,
+                        help="allowed slowdown over the baseline, as a fraction (default: %(default)s)")
+    args = parser.parse_args()
+    names = [n.strip() for n in args.only.split(',') if n.strip()] or None
+    unknown = [n for n in names or [] if n not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(unknown)}")
+    _, regressions = main(rows=args.rows, columns=args.columns, repeat=args.repeat, seed=args.seed, names=names,
+                          work_dir=args.work_dir, output=args.output, baseline=args.baseline, tolerance=args.tolerance)
+    sys.exit(1 if regressions else 0)
@@ -1,14 +1,19 @@
 import os
-import urllib.request
-import csv
 import json
-import codecs
+import argparse
+import pandas as pd
+
+from fzl_http_utils import download_file
 
 # Constants
 DATA_URL = "https://dados.educacao.sp.gov.br/sites/default/files/microdados_matricula_sp_2024_12.2024.csv"
 OUTPUT_DIR = "data-analysis/data"
 RAW_FILE = os.path.join(OUTPUT_DIR, "microdados_sp_2024.csv")
 JSON_OUTPUT = os.path.join(OUTPUT_DIR, "sp_disability_stats.json")
+JSON_OUTPUT_BY_REDE = os.path.join(OUTPUT_DIR, "sp_disability_stats_by_rede.json")
+
+# Rows per chunk when reading the enrollment CSV
+SP_CHUNKSIZE = 500000
 
 # Disability Code Mapping (from Dictionary)
 DISABILITY_MAP = {
@@ -37,96 +42,101 @@ def download_data():
         print(f"File {RAW_FILE} already exists. Skipping download.")
         return
 
-    print(f"Downloading data from {DATA_URL}...")
-    try:
-        if not os.path.exists(OUTPUT_DIR):
-            os.makedirs(OUTPUT_DIR)
-        
-        # Download with progress indication (simple)
-        def progress(block_num, block_size, total_size):
-            downloaded = block_num * block_size
-            if total_size > 0:
-                percent = downloaded * 100 / total_size
-                if block_num % 1000 == 0:  # Update every ~8MB
-                    print(f"Download progress: {percent:.1f}%", end='\r')
-        
-        urllib.request.urlretrieve(DATA_URL, RAW_FILE, progress)
-        print("\nDownload complete.")
-    except Exception as e:
-        print(f"Failed to download data: {e}")
-        # Clean up partial file
-        if os.path.exists(RAW_FILE):
-            os.remove(RAW_FILE)
-        raise
+    if not os.path.exists(OUTPUT_DIR):
+        os.makedirs(OUTPUT_DIR)
+
+    # Partial data is kept in RAW_FILE.part and resumed by the next run
+    if not download_file(DATA_URL, RAW_FILE):
+        raise RuntimeError(f"Failed to download data from {DATA_URL}")
 
-def process_data():
+def _disability_dtype():
+    """
+    Categorical dtype over the DEF codes that count as a disability ("0" is no disability).
+    Setting a column's categories to these turns any other value (0, blank, unknown codes) into NaN.
+    """
+    return pd.CategoricalDtype([code for code in DISABILITY_MAP if code != "0"])
+
+def aggregate_disabilities(chunk, mun_col, rede_col, def_cols):
+    """
+    Counts the disabilities of one chunk of enrollments.
+    The DEF columns are recategorised to _disability_dtype, melted into one categorical column,
+    labelled through DISABILITY_MAP and counted with a single groupby.
+    Returns a Series indexed by (MUN, NOMEDEP, disability), in order of first appearance.
+    """
+    dtype = _disability_dtype()
+    # set_categories, unlike astype(dtype), drops the other codes without a deprecation warning
+    defs = chunk[def_cols].apply(lambda col: col.astype('category').cat.set_categories(dtype.categories))
+    long = defs.melt(value_name='code', ignore_index=False)['code']
+    long = long[long.notna()]
+    # Back to row order (DEF1..DEF10 within a row) so groups keep the order of the row-wise scan
+    long = long.sort_index(kind='stable')
+    labels = long.cat.rename_categories([DISABILITY_MAP[code] for code in dtype.categories])
+
+    rows = chunk.index.get_indexer(long.index)
+    keys = pd.DataFrame({
+        'mun': chunk[mun_col].iloc[rows].to_numpy(),
+        'rede': chunk[rede_col].iloc[rows].to_numpy(),
+        'disability': labels.astype(str).to_numpy()
+    })
+    return keys.groupby(['mun', 'rede', 'disability'], sort=False).size()
+
+def process_data(by_rede=False, chunksize=SP_CHUNKSIZE):
+    """
+    Counts students per municipality and disability (DEF1..DEF10 columns) and writes
+    {municipality: {disability: count}} to JSON_OUTPUT.
+    With by_rede, a {NOMEDEP: {municipality: {disability: count}}} breakdown is also
+    written to JSON_OUTPUT_BY_REDE.
+    """
     print("Processing data...")
-    
-    # Columns of interest - we need to find their indices
-    # We will read the header row first
-    
+
     stats = {}
-    
+    stats_by_rede = {}
+
     try:
-        # Use latin1 encoding as per usual Brazilian gov data
-        with open(RAW_FILE, 'r', encoding='latin1', errors='replace') as f:
+        with open(RAW_FILE, 'rb') as f:
             # Check delimiter
             sample = f.read(1024)
-            f.seek(0)
-            delimiter = ';' if ';' in sample else ','
-            
-            reader = csv.DictReader(f, delimiter=delimiter)
-            
-            # Verify columns exist
-            fieldnames = reader.fieldnames
-            if not fieldnames:
-                raise Exception("Empty CSV or no header.")
-                
-            # Normalize field names just in case (strip spaces)
-            field_map = {name.strip(): name for name in fieldnames}
-            
-            mun_col = field_map.get('MUN')
-            rede_col = field_map.get('NOMEDEP')
-            
-            # Find DEF columns
-            def_cols = []
-            for i in range(1, 11):
-                col_name = f"DEF{i}"
-                if col_name in field_map:
-                    def_cols.append(field_map[col_name])
-            
-            if not mun_col or not rede_col:
-                print(f"Available columns: {list(field_map.keys())}")
-                raise Exception("Missing required columns MUN or NOMEDEP")
-
-            print(f"Processing with columns: MUN={mun_col}, DEF={def_cols}")
-
-            count = 0
-            for row in reader:
-                count += 1
-                if count % 100000 == 0:
-                    print(f"Processed {count} rows...", end='\r')
-
-                # Check for disability
-                has_disability = False
-                student_disabilities = []
-
-                for col in def_cols:
-                    val = row.get(col, "0")
-                    if val and val != "0" and val in DISABILITY_MAP:
-                        has_disability = True
-                        student_disabilities.append(DISABILITY_MAP[val])
-                
-                if has_disability:
-                    mun = row.get(mun_col, "DESCONHECIDO")
-                    if mun not in stats:
-                        stats[mun] = {}
-                    
-                    for d in student_disabilities:
-                        if d not in stats[mun]:
-                            stats[mun][d] = 0
-                        stats[mun][d] += 1
-                        
+        delimiter = ';' if b';' in sample else ','
+
+        # Use latin1 encoding as per usual Brazilian gov data
+        read_options = dict(sep=delimiter, encoding='latin1', encoding_errors='replace',
+                            dtype=str, keep_default_na=False)
+        fieldnames = list(pd.read_csv(RAW_FILE, nrows=0, **read_options).columns)
+        if not fieldnames:
+            raise Exception("Empty CSV or no header.")
+
+        # Normalize field names just in case (strip spaces)
+        field_map = {name.strip(): name for name in fieldnames}
+
+        mun_col = field_map.get('MUN')
+        rede_col = field_map.get('NOMEDEP')
+        def_cols = [field_map[f"DEF{i}"] for i in range(1, 11) if f"DEF{i}" in field_map]
+
+        if not mun_col or not rede_col:
+            print(f"Available columns: {list(field_map.keys())}")
+            raise Exception("Missing required columns MUN or NOMEDEP")
+
+        print(f"Processing with columns: MUN={mun_col}, NOMEDEP={rede_col}, DEF={def_cols}")
+
+        count = 0
+        # DEF codes are parsed as categoricals: a handful of distinct codes per column
+        usecols = [mun_col, rede_col] + def_cols
+        read_options['dtype'] = {col: ('category' if col in def_cols else str) for col in usecols}
+        chunks = pd.read_csv(RAW_FILE, usecols=usecols, chunksize=chunksize, **read_options)
+        for chunk in chunks:
+            count += len(chunk)
+            print(f"Processed {count} rows...", end='\r')
+            if not def_cols:
+                continue
+
+            counts = aggregate_disabilities(chunk, mun_col, rede_col, def_cols)
+            for (mun, rede, disability), n in counts.items():
+                by_mun = stats.setdefault(mun, {})
+                by_mun[disability] = by_mun.get(disability, 0) + int(n)
+                if by_rede:
+                    by_rede_mun = stats_by_rede.setdefault(rede, {}).setdefault(mun, {})
+                    by_rede_mun[disability] = by_rede_mun.get(disability, 0) + int(n)
+
     except Exception as e:
         print(f"Error processing CSV: {e}")
         raise
@@ -134,9 +144,20 @@ def process_data():
     # Save to JSON
     with open(JSON_OUTPUT, 'w', encoding='utf-8') as f:
         json.dump(stats, f, ensure_ascii=False, indent=4)
-    
+
     print(f"\nStats saved to {JSON_OUTPUT}")
 
+    if by_rede:
+        with open(JSON_OUTPUT_BY_REDE, 'w', encoding='utf-8') as f:
+            json.dump(stats_by_rede, f, ensure_ascii=False, indent=4)
+        print(f"Stats by rede saved to {JSON_OUTPUT_BY_REDE}")
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="SP enrollment microdata: disability counts per municipality")
+    parser.add_argument('--by-rede', action='store_true',
+                        help=f"also write counts per NOMEDEP (rede) to {JSON_OUTPUT_BY_REDE}")
+    parser.add_argument('--chunksize', type=int, default=SP_CHUNKSIZE,
+                        help="rows per chunk when reading the CSV (default: %(default)s)")
+    args = parser.parse_args()
     download_data()
-    process_data()
+    process_data(by_rede=args.by_rede, chunksize=args.chunksize)
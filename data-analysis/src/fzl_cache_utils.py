@@ -0,0 +1,93 @@
+import hashlib
+import json
+import os
+import pickle
+
+def file_content_hash(file_path, cache_dir=None, block_size=1024 * 1024):
+    """
+    Returns the sha256 of a file's content.
+    When cache_dir is given, the hash is memoized by (size, mtime) so multi-GB
+    zips are only re-hashed when they actually change on disk.
+    """
+    if not os.path.exists(file_path):
+        return None
+
+    stat = os.stat(file_path)
+    memo_key = f"{stat.st_size}|{stat.st_mtime_ns}"
+    memo_path = os.path.join(cache_dir, 'hashes', f"{os.path.basename(file_path)}.json") if cache_dir else None
+
+    if memo_path and os.path.exists(memo_path):
+        try:
+            with open(memo_path, 'r', encoding='utf-8') as f:
+                memo = json.load(f)
+            if memo.get('key') == memo_key:
+                return memo['sha256']
+        except (OSError, ValueError, KeyError):
+            pass
+
+    print(f"Hashing {file_path}...")
+    sha = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            sha.update(block)
+    digest = sha.hexdigest()
+
+    if memo_path:
+        os.makedirs(os.path.dirname(memo_path), exist_ok=True)
+        with open(memo_path, 'w', encoding='utf-8') as f:
+            json.dump({'key': memo_key, 'sha256': digest}, f)
+
+    return digest
+
+def stage_cache_key(*parts):
+    """
+    Builds a cache key from the inputs of a stage (content hashes, config values, code version).
+    """
+    payload = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+def _stage_cache_path(cache_dir, scope, stage, key):
+    return os.path.join(cache_dir, str(scope), f"{stage}-{key}.pkl")
+
+def load_cached_stage(cache_dir, scope, stage, key):
+    """
+    Returns the cached result of a stage, or None when there is no entry for this key.
+    """
+    if not cache_dir or not key:
+        return None
+
+    path = _stage_cache_path(cache_dir, scope, stage, key)
+    if not os.path.exists(path):
+        return None
+
+    try:
+        with open(path, 'rb') as f:
+            value = pickle.load(f)
+        print(f"Cache hit: {scope}/{stage} ({key})")
+        return value
+    except Exception as e:
+        print(f"Ignoring unreadable cache entry {path}: {e}")
+        return None
+
+def save_cached_stage(cache_dir, scope, stage, key, value):
+    """
+    Stores the result of a stage, replacing older entries of the same stage and scope.
+    """
+    if not cache_dir or not key:
+        return False
+
+    path = _stage_cache_path(cache_dir, scope, stage, key)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        for name in os.listdir(os.path.dirname(path)):
+            if name.startswith(f"{stage}-") and name.endswith('.pkl'):
+                os.remove(os.path.join(os.path.dirname(path), name))
+
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        return True
+    except Exception as e:
+        print(f"Error writing cache entry {path}: {e}")
+        return False
@@ -0,0 +1,139 @@
+import os
+import json
+import glob
+from itertools import combinations
+import pandas as pd
+
+# Dimensions the cube can be sliced by, in drill-down order (coarse to fine)
+CUBE_DIMENSIONS = ['NO_UF', 'NO_MUNICIPIO', 'TP_DEPENDENCIA', 'TP_LOCALIZACAO']
+
+# Dimensions whose values only identify a member within a parent dimension: municipality names
+# repeat across states, so NO_MUNICIPIO is always grouped (and drilled into) under NO_UF
+CUBE_PARENT_DIMENSIONS = {'NO_MUNICIPIO': 'NO_UF'}
+
+# Coded dimensions (INEP codes read as text from the CSV and as integers from Parquet)
+CUBE_CODE_PREFIXES = ('TP_', 'CO_')
+
+# Largest number of dimensions in one cuboid (2 -> every pair, e.g. NO_UF x TP_DEPENDENCIA)
+CUBE_MAX_DEPTH = 2
+
+# Grouping names of the cuboids start with this prefix (see cube_groupings)
+CUBE_PREFIX = 'cube:'
+
+# Labels of the coded dimensions (INEP microdata codes)
+CUBE_VALUE_LABELS = {
+    'TP_DEPENDENCIA': {1: 'Federal', 2: 'Estadual', 3: 'Municipal', 4: 'Privada'},
+    'TP_LOCALIZACAO': {1: 'Urbana', 2: 'Rural'}
+}
+
+def cube_groupings(dimensions=None, max_depth=CUBE_MAX_DEPTH, year_col='NU_ANO_CENSO'):
+    """
+    Returns the cuboids of the cube as groupings {name: keys}, like main.build_groupings:
+    every combination of up to max_depth dimensions, with year_col as the last key.
+    A dimension with a parent (CUBE_PARENT_DIMENSIONS) brings the parent into its cuboids
+    without counting towards max_depth, so NO_MUNICIPIO is never summed across states.
+    They are summed in the same pass over each year's file as the other groupings.
+    """
+    dimensions = list(CUBE_DIMENSIONS if dimensions is None else dimensions)
+    groupings = {}
+    for depth in range(1, min(max_depth, len(dimensions)) + 1):
+        for dims in combinations(dimensions, depth):
+            keys = []
+            for dim in dims:
+                parent = CUBE_PARENT_DIMENSIONS.get(dim)
+                if parent and parent not in dims and parent not in keys:
+                    keys.append(parent)
+                if dim not in keys:
+                    keys.append(dim)
+            groupings.setdefault(CUBE_PREFIX + '+'.join(keys), keys + [year_col])
+    return groupings
+
+def is_cuboid(name):
+    return name.startswith(CUBE_PREFIX)
+
+def _encode_cuboid(table, dims, year_col, measures):
+    """
+    Columnar, dictionary-encoded cuboid: every dimension column becomes a list of small
+    integer codes into a sorted list of its values, measures stay plain number lists.
+    """
+    columns = {}
+    dictionaries = {}
+    for dim in dims:
+        codes, values = pd.factorize(_dimension_values(table[dim], dim), sort=True)
+        columns[dim] = codes.tolist()
+        dictionaries[dim] = values.tolist()
+    columns[year_col] = table[year_col].astype(str).tolist()
+    for measure in measures:
+        values = table[measure]
+        if pd.api.types.is_float_dtype(values) and (values.dropna() % 1 == 0).all():
+            values = values.fillna(0).astype('int64')
+        columns[measure] = values.tolist()
+    return {
+        'dimensions': list(dims),
+        'measures': list(measures),
+        'rows': len(table),
+        'dictionaries': dictionaries,
+        'columns': columns
+    }
+
+def _dimension_values(values, dim):
+    """
+    Coded dimensions as plain integers, whether they were read as text (CSV) or as numbers
+    (Parquet), so their dictionaries and CUBE_VALUE_LABELS match in every mode.
+    """
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        values = values.astype(values.cat.categories.dtype)
+    if dim.startswith(CUBE_CODE_PREFIXES):
+        numbers = pd.to_numeric(values, errors='coerce')
+        if numbers.notna().all() and (numbers % 1 == 0).all():
+            return numbers.astype('int64')
+    return values
+
+def export_cube(tables, output_dir, measures, year_table=None, year_col='NU_ANO_CENSO', catalog=None):
+    """
+    Writes the cube as static files under output_dir: one compact JSON file per cuboid
+    (see _encode_cuboid) and a manifest.json listing dimensions, measures, years and cuboids,
+    so the frontend fetches only the cuboids a drill-down actually needs.
+    tables maps cuboid grouping names (see cube_groupings) to the merged wide tables;
+    year_table, when given, is written as the apex cuboid (no dimensions).
+    catalog (a DictionaryCatalog) supplies the descriptions of dimensions and measures.
+    Returns the manifest.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    for stale in glob.glob(os.path.join(output_dir, '*.json')):
+        os.remove(stale)
+
+    def describe(name):
+        return (catalog.describe(name) if catalog else None) or name
+
+    cuboids = []
+    dimensions = []
+    years = set()
+    if year_table is not None and not year_table.empty:
+        tables = {CUBE_PREFIX: year_table, **tables}
+    for name, table in tables.items():
+        if table is None or table.empty:
+            continue
+        dims = [d for d in name[len(CUBE_PREFIX):].split('+') if d]
+        present = [m for m in measures if m in table.columns]
+        file_name = ('__'.join(dims) or 'total') + '.json'
+        encoded = _encode_cuboid(table, dims, year_col, present)
+        with open(os.path.join(output_dir, file_name), 'w', encoding='utf-8') as f:
+            json.dump(encoded, f, ensure_ascii=False, separators=(',', ':'))
+
+        cuboids.append({'dimensions': dims, 'file': file_name, 'rows': len(table)})
+        years.update(encoded['columns'][year_col])
+        dimensions.extend(d for d in dims if d not in dimensions)
+
+    manifest = {
+        'year_col': year_col,
+        'years': sorted(years),
+        'dimensions': [{'name': d, 'label': describe(d), 'values': CUBE_VALUE_LABELS.get(d, {})}
+                       for d in dimensions],
+        'measures': [{'name': m, 'label': describe(m)} for m in measures],
+        'cuboids': cuboids
+    }
+    with open(os.path.join(output_dir, 'manifest.json'), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    print(f"Cube exported to {output_dir} ({len(cuboids)} cuboids)")
+    return manifest
@@ -0,0 +1,177 @@
+import os
+import pickle
+import shutil
+import tempfile
+import numpy as np
+import pandas as pd
+
+# Key bytes kept in memory before the partitions are spilled to disk
+DEDUP_MEMORY_BUDGET = 256 * 1024 * 1024
+
+# Hash partitions; finding the duplicates needs one partition in memory at a time
+DEDUP_PARTITIONS = 64
+
+# Duplicate rows kept as a sample in the report
+DEDUP_SAMPLE_SIZE = 100
+
+class DuplicateDetector:
+    """
+    Streaming duplicate detection on a set of key columns (e.g. CO_ENTIDADE, or a composite key).
+    Chunks are fed with add(); their key columns are hashed into partitions, so rows with the
+    same key always land in the same partition. Buffered partitions are appended to files in a
+    temporary spill directory whenever they exceed the memory budget. finish() then checks one
+    partition at a time, so memory is bounded by the budget and the largest partition rather
+    than by the number of rows. Keys are compared exactly; the hash only picks the partition.
+    """
+
+    def __init__(self, key_columns, memory_budget=DEDUP_MEMORY_BUDGET, partitions=DEDUP_PARTITIONS, spill_dir=None):
+        self.key_columns = list(key_columns)
+        self.memory_budget = memory_budget
+        self.partitions = partitions
+        self.spill_dir = spill_dir
+        self.rows = 0
+        self._buffers = [[] for _ in range(partitions)]
+        self._buffered_bytes = 0
+        self._spill_path = None
+
+    def add(self, chunk):
+        """
+        Adds the rows of a DataFrame chunk; only its key columns are kept.
+        Rows are numbered in the order they are added (0 based), like positions in the source.
+        """
+        if chunk.empty:
+            return
+        keys = chunk[self.key_columns].reset_index(drop=True)
+        hashes = pd.util.hash_pandas_object(keys, index=False).to_numpy()
+        keys['_row'] = np.arange(self.rows, self.rows + len(keys), dtype=np.int64)
+        self.rows += len(keys)
+
+        partition = (hashes % self.partitions).astype(np.intp)
+        order = np.argsort(partition, kind='stable')
+        bounds = np.searchsorted(partition[order], np.arange(self.partitions + 1))
+        for p in range(self.partitions):
+            lo, hi = bounds[p], bounds[p + 1]
+            if hi > lo:
+                self._buffers[p].append(keys.iloc[order[lo:hi]])
+
+        self._buffered_bytes += int(keys.memory_usage(index=False, deep=True).sum())
+        if self._buffered_bytes > self.memory_budget:
+            self._spill()
+
+    def finish(self, sample_size=DEDUP_SAMPLE_SIZE):
+        """
+        Returns the report as a dict:
+          rows             rows added
+          duplicate_rows   rows whose key appears more than once (df.duplicated(keep=False).sum())
+          duplicate_groups distinct keys that appear more than once
+          group_sizes      DataFrame of those keys with a 'count' column, largest groups first
+          sample           the first sample_size duplicate rows in input order (all of them with
+                           sample_size=None): key columns, '_row' (row number) and '_first'
+                           (first occurrence of its key, i.e. kept by drop_duplicates)
+        Spilled files are removed.
+        """
+        try:
+            duplicate_rows = 0
+            group_parts, sample_parts = [], []
+            for p in range(self.partitions):
+                frame = self._load_partition(p)
+                if frame.empty:
+                    continue
+                frame = frame.sort_values('_row', kind='stable')
+                mask = frame.duplicated(subset=self.key_columns, keep=False)
+                if not mask.any():
+                    continue
+
+                dups = frame[mask]
+                duplicate_rows += len(dups)
+                group_parts.append(dups.groupby(self.key_columns, dropna=False, observed=True, sort=False)
+                                   .size().reset_index(name='count'))
+                dups = dups.assign(_first=~dups.duplicated(subset=self.key_columns, keep='first'))
+                sample_parts.append(dups if sample_size is None else dups.head(sample_size))
+
+            empty = pd.DataFrame(columns=self.key_columns + ['count'])
+            group_sizes = pd.concat(group_parts, ignore_index=True) if group_parts else empty
+            group_sizes = group_sizes.sort_values('count', ascending=False, kind='stable').reset_index(drop=True)
+
+            sample = pd.concat(sample_parts, ignore_index=True) if sample_parts else pd.DataFrame(columns=self.key_columns + ['_row', '_first'])
+            sample = sample.sort_values('_row').reset_index(drop=True)
+            if sample_size is not None:
+                sample = sample.head(sample_size)
+
+            return {
+                'rows': self.rows,
+                'duplicate_rows': duplicate_rows,
+                'duplicate_groups': len(group_sizes),
+                'group_sizes': group_sizes,
+                'sample': sample
+            }
+        finally:
+            self.close()
+
+    def close(self):
+        """
+        Drops buffered keys and removes the spill directory.
+        """
+        self._buffers = [[] for _ in range(self.partitions)]
+        self._buffered_bytes = 0
+        if self._spill_path:
+            shutil.rmtree(self._spill_path, ignore_errors=True)
+            self._spill_path = None
+
+    def _partition_file(self, p):
+        return os.path.join(self._spill_path, f"partition-{p:04d}.pkl")
+
+    def _spill(self):
+        if self._spill_path is None:
+            if self.spill_dir:
+                os.makedirs(self.spill_dir, exist_ok=True)
+            self._spill_path = tempfile.mkdtemp(prefix='dedup-', dir=self.spill_dir)
+            print(f"Duplicate keys exceed {self.memory_budget} bytes, spilling partitions to {self._spill_path}")
+
+        for p, pieces in enumerate(self._buffers):
+            if pieces:
+                with open(self._partition_file(p), 'ab') as f:
+                    pickle.dump(pd.concat(pieces, ignore_index=True), f, protocol=pickle.HIGHEST_PROTOCOL)
+                self._buffers[p] = []
+        self._buffered_bytes = 0
+
+    def _load_partition(self, p):
+        pieces = []
+        if self._spill_path and os.path.exists(self._partition_file(p)):
+            with open(self._partition_file(p), 'rb') as f:
+                while True:
+                    try:
+                        pieces.append(pickle.load(f))
+                    except EOFError:
+                        break
+        pieces.extend(self._buffers[p])
+        self._buffers[p] = []
+        return pd.concat(pieces, ignore_index=True) if pieces else pd.DataFrame()
+
+def find_duplicates(chunks, key_columns, sample_size=DEDUP_SAMPLE_SIZE, **kwargs):
+    """
+    Runs a DuplicateDetector over an iterable of DataFrame chunks and returns its report.
+    """
+    detector = DuplicateDetector(key_columns, **kwargs)
+    for chunk in chunks:
+        detector.add(chunk)
+    return detector.finish(sample_size=sample_size)
+
+def fetch_rows(chunks, positions):
+    """
+    Second pass over an iterable of DataFrame chunks: returns the rows at the given 0 based
+    positions (e.g. the '_row' numbers of a DuplicateDetector sample) with all their columns,
+    in input order. Reading stops with the chunk holding the last position.
+    Returns None when there are no chunks.
+    """
+    positions = np.unique(np.asarray(positions, dtype=np.int64))
+    pieces = []
+    offset = 0
+    for chunk in chunks:
+        end = offset + len(chunk)
+        wanted = positions[(positions >= offset) & (positions < end)]
+        pieces.append(chunk.iloc[wanted - offset])
+        offset = end
+        if not len(positions) or offset > positions[-1]:
+            break
+    return pd.concat(pieces, ignore_index=True) if pieces else None
@@ -0,0 +1,169 @@
+import os
+import glob
+import numpy as np
+import pandas as pd
+
+class EntityCollector:
+    """
+    Collects the entity ids (CO_ENTIDADE) of one year and an attribute per entity (NO_UF)
+    while the year's file streams by, for EntityIndex.add_year.
+    Only two small arrays per chunk are kept.
+    """
+
+    def __init__(self, id_col='CO_ENTIDADE', attr_col='NO_UF'):
+        self.id_col = id_col
+        self.attr_col = attr_col
+        self._ids = []
+        self._attrs = []
+
+    def columns(self):
+        return [self.id_col, self.attr_col]
+
+    def add(self, chunk):
+        if self.id_col not in chunk.columns or chunk.empty:
+            return
+        ids = pd.to_numeric(chunk[self.id_col], errors='coerce')
+        valid = ids.notna()
+        self._ids.append(ids[valid].astype(np.int64).to_numpy())
+        if self.attr_col in chunk.columns:
+            self._attrs.append(chunk[self.attr_col][valid].astype(object).fillna('').to_numpy(dtype=object))
+        else:
+            self._attrs.append(np.full(int(valid.sum()), '', dtype=object))
+
+    def finish(self):
+        """
+        Returns (sorted unique ids, attribute of each id at its first occurrence).
+        """
+        if not self._ids:
+            return np.array([], dtype=np.int64), np.array([], dtype=object)
+        ids = np.concatenate(self._ids)
+        attrs = np.concatenate(self._attrs)
+        unique_ids, first = np.unique(ids, return_index=True)
+        return unique_ids, attrs[first]
+
+class EntityIndex:
+    """
+    Persistent cross-year index of entity ids (schools, CO_ENTIDADE).
+    Every year is stored as a sorted int64 array of ids plus one small-int attribute code
+    per id (the UF), in <index_dir>/entities_<year>.npz. Set questions across years
+    (new, closed, present every year, changed UF) are sorted-array set operations,
+    without loading any census file.
+    """
+
+    def __init__(self, index_dir=None):
+        self.index_dir = index_dir
+        self._ids = {}      # year -> sorted unique int64 ids
+        self._codes = {}    # year -> int16 attribute code per id
+        self._labels = {}   # year -> attribute labels, indexed by code
+
+    def add_year(self, year, ids, attrs=None):
+        """
+        Adds (or replaces) a year from sorted unique ids and their attributes
+        (see EntityCollector.finish).
+        """
+        year = str(year)
+        ids = np.asarray(ids, dtype=np.int64)
+        attrs = pd.Categorical(attrs if attrs is not None else np.full(len(ids), '', dtype=object))
+        self._ids[year] = ids
+        self._codes[year] = attrs.codes.astype(np.int16)
+        self._labels[year] = np.asarray(attrs.categories, dtype=object)
+
+    def save(self):
+        os.makedirs(self.index_dir, exist_ok=True)
+        for year in self.years():
+            path = os.path.join(self.index_dir, f"entities_{year}.npz")
+            np.savez_compressed(path, ids=self._ids[year], codes=self._codes[year],
+                                labels=self._labels[year].astype(str))
+        print(f"Entity index saved to {self.index_dir} ({len(self.years())} years)")
+
+    def load(self):
+        for path in sorted(glob.glob(os.path.join(self.index_dir, "entities_*.npz"))):
+            year = os.path.basename(path)[len("entities_"):-len(".npz")]
+            with np.load(path) as data:
+                self._ids[year] = data['ids']
+                self._codes[year] = data['codes']
+                self._labels[year] = data['labels'].astype(object)
+        return self
+
+    def years(self):
+        return sorted(self._ids.keys())
+
+    def ids(self, year):
+        return self._ids.get(str(year), np.array([], dtype=np.int64))
+
+    def attribute(self, year, ids):
+        """
+        Attribute (UF) of each id in a year; ids must be present in that year.
+        """
+        year = str(year)
+        positions = np.searchsorted(self._ids[year], ids)
+        return self._labels[year][self._codes[year][positions]]
+
+    def new_in(self, year, since=None):
+        """
+        Ids present in `year` but not in `since` (default: the previous indexed year).
+        """
+        since = since or self._previous(year)
+        if since is None:
+            return np.array([], dtype=np.int64)
+        return np.setdiff1d(self.ids(year), self.ids(since), assume_unique=True)
+
+    def closed_in(self, year, since=None):
+        """
+        Ids present in `since` (default: the previous indexed year) but gone in `year`.
+        """
+        since = since or self._previous(year)
+        if since is None:
+            return np.array([], dtype=np.int64)
+        return np.setdiff1d(self.ids(since), self.ids(year), assume_unique=True)
+
+    def present_in_all(self, years=None):
+        """
+        Ids present in every one of `years` (default: all indexed years).
+        """
+        years = [str(y) for y in (years or self.years())]
+        if not years:
+            return np.array([], dtype=np.int64)
+        result = self.ids(years[0])
+        for year in years[1:]:
+            result = np.intersect1d(result, self.ids(year), assume_unique=True)
+        return result
+
+    def changed_attribute(self, year, since=None):
+        """
+        Ids present in both years whose attribute (UF) differs.
+        """
+        since = since or self._previous(year)
+        if since is None:
+            return np.array([], dtype=np.int64)
+        common, now_pos, before_pos = np.intersect1d(self.ids(year), self.ids(since),
+                                                     assume_unique=True, return_indices=True)
+        now = self._labels[str(year)][self._codes[str(year)][now_pos]]
+        before = self._labels[str(since)][self._codes[str(since)][before_pos]]
+        return common[now != before]
+
+    def churn_summary(self):
+        """
+        One record per indexed year with the total of entities and, against the previous
+        year, how many are new, closed, retained and changed attribute.
+        """
+        records = []
+        for year in self.years():
+            previous = self._previous(year)
+            total = len(self.ids(year))
+            new = len(self.new_in(year)) if previous else 0
+            records.append({
+                'year': year,
+                'total': total,
+                'new': new,
+                'closed': len(self.closed_in(year)) if previous else 0,
+                'retained': total - new if previous else 0,
+                'changed_uf': len(self.changed_attribute(year)) if previous else 0
+            })
+        return records
+
+    def _previous(self, year):
+        years = self.years()
+        year = str(year)
+        earlier = [y for y in years if y < year]
+        return earlier[-1] if earlier else None
@@ -1,35 +1,377 @@
 import requests
 import os
+import json
+import time
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
 
-def download_file(url, dest_path, verify_ssl=True):
+CHUNK_SIZE = 1024 * 1024  # 1MB
+SEGMENT_CHUNK_SIZE = 256 * 1024  # smaller reads so range progress is recorded often
+SEGMENT_STATE_INTERVAL = 1.0  # seconds between saves of the range progress of a segmented download
+POOL_SIZE = 16  # keep-alive connections kept per host
+
+_session = None
+_session_lock = threading.Lock()
+
+def get_session(pool_size=POOL_SIZE):
+    """
+    Returns the shared requests.Session of the process.
+    Connections are pooled and kept alive, so HEAD probes, range requests and
+    consecutive files from the same host reuse the same TCP/TLS connections.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _session = session
+        return _session
+
+def print_progress(dest_name, downloaded, total_size):
+    """
+    Default progress hook: prints the percentage of a download on a single line.
+    """
+    if total_size:
+        percent = (downloaded / total_size) * 100
+        print(f"{dest_name} progress: {percent:.1f}% ({downloaded}/{total_size} bytes)", end='\r')
+
+def download_file(url, dest_path, verify_ssl=True, segments=1, retries=3, expected_size=None,
+                  expected_sha256=None, timeout=60, session=None, chunk_size=CHUNK_SIZE,
+                  revalidate=False, progress_hook=print_progress, metrics_hook=None):
     """
     Downloads a file from a URL to a destination path with a progress indicator.
+    Data is written to <dest_path>.part first: an interrupted download is kept and resumed
+    with an HTTP Range request (on retry or on the next run) instead of starting over.
+    With segments > 1 and a server that accepts ranges, the file is fetched as that many
+    parallel byte ranges. The final size (and sha256, when given) is checked before the
+    file is moved to dest_path.
+
+    The ETag/Last-Modified of every completed download are kept in <dest_path>.http.json.
+    An existing file is skipped, or with revalidate=True checked with a conditional GET
+    and only fetched again when the server reports a change.
+
+    progress_hook(dest_name, downloaded, total_size) is called while data arrives and
+    metrics_hook(dict) once per file with url, path, status, bytes and seconds.
     """
+    session = session or get_session()
+    started = time.perf_counter()
+    metrics = {'url': url, 'path': dest_path, 'status': 'failed', 'bytes': 0, 'seconds': 0.0}
+
+    def finish(status, ok):
+        metrics['status'] = status
+        metrics['seconds'] = round(time.perf_counter() - started, 3)
+        if metrics_hook:
+            metrics_hook(metrics)
+        return ok
+
     if os.path.exists(dest_path):
-        print(f"File {dest_path} already exists. Skipping download.")
-        return True
+        if not revalidate:
+            print(f"File {dest_path} already exists. Skipping download.")
+            return finish('skipped', True)
+        if _is_not_modified(session, url, dest_path, verify_ssl, timeout):
+            print(f"File {dest_path} is up to date. Skipping download.")
+            return finish('not_modified', True)
+
+    part_path = f"{dest_path}.part"
+    state_path = f"{dest_path}.part.json"
+    progress_hook = progress_hook or (lambda *args: None)
 
     print(f"Downloading {url} to {dest_path}...")
     try:
-        response = requests.get(url, stream=True, verify=verify_ssl)
-        response.raise_for_status()
-        
-        total_size = int(response.headers.get('content-length', 0))
-        block_size = 1024 * 1024  # 1MB
-        
-        with open(dest_path, 'wb') as f:
-            downloaded = 0
-            for data in response.iter_content(block_size):
-                f.write(data)
-                downloaded += len(data)
-                if total_size > 0:
-                    percent = (downloaded / total_size) * 100
-                    print(f"Progress: {percent:.1f}% ({downloaded}/{total_size} bytes)", end='\r')
-        
+        total_size, accepts_ranges, validators = _probe(session, url, verify_ssl, timeout)
+        if expected_size and total_size and expected_size != total_size:
+            print(f"Warning: server reports {total_size} bytes, expected {expected_size}.")
+        total_size = total_size or expected_size
+
+        if segments > 1 and accepts_ranges and total_size:
+            completed = _download_segmented(session, url, part_path, state_path, total_size, segments,
+                                            verify_ssl, retries, timeout, validators, progress_hook)
+        else:
+            _check_stream_part(url, part_path, state_path, validators)
+            completed = _download_stream(session, url, part_path, total_size, accepts_ranges,
+                                         verify_ssl, retries, timeout, validators, chunk_size, progress_hook)
+
+        if not completed:
+            print(f"\nFailed to download {url}. Partial data kept in {part_path}, the next run will resume it.")
+            return finish('failed', False)
+
+        if not _verify_download(part_path, expected_size or total_size, expected_sha256, chunk_size):
+            # Corrupt data cannot be resumed, start over next time
+            for path in (part_path, state_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            return finish('failed', False)
+
+        metrics['bytes'] = os.path.getsize(part_path)
+        os.replace(part_path, dest_path)
+        if os.path.exists(state_path):
+            os.remove(state_path)
+        _save_validators(dest_path, url, validators)
         print(f"\nDownload completed: {dest_path}")
-        return True
+        return finish('downloaded', True)
     except Exception as e:
         print(f"\nFailed to download {url}: {e}")
-        if os.path.exists(dest_path):
-            os.remove(dest_path)
+        return finish('failed', False)
+
+def download_files(downloads, max_workers=3, **kwargs):
+    """
+    Downloads several (url, dest_path) pairs concurrently with download_file.
+    Extra keyword arguments are passed to download_file.
+    Returns the list of results, in the same order as downloads.
+    """
+    if max_workers <= 1 or len(downloads) <= 1:
+        return [download_file(url, dest_path, **kwargs) for url, dest_path in downloads]
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(downloads))) as executor:
+        futures = [executor.submit(download_file, url, dest_path, **kwargs) for url, dest_path in downloads]
+        return [f.result() for f in futures]
+
+def _response_validators(response):
+    return {
+        'etag': response.headers.get('etag'),
+        'last_modified': response.headers.get('last-modified')
+    }
+
+def _validators_path(dest_path):
+    return f"{dest_path}.http.json"
+
+def _save_validators(dest_path, url, validators):
+    if not (validators.get('etag') or validators.get('last_modified')):
+        return
+    with open(_validators_path(dest_path), 'w', encoding='utf-8') as f:
+        json.dump({'url': url, **validators}, f)
+
+def _is_not_modified(session, url, dest_path, verify_ssl, timeout):
+    """
+    Conditional GET against the validators stored for dest_path.
+    Returns True on 304 Not Modified; without stored validators the file is kept as is.
+    """
+    try:
+        with open(_validators_path(dest_path), 'r', encoding='utf-8') as f:
+            stored = json.load(f)
+    except (OSError, ValueError):
+        print(f"No ETag/Last-Modified recorded for {dest_path}, keeping the existing file.")
+        return True
+    if stored.get('url') != url:
+        return False
+
+    headers = {}
+    if stored.get('etag'):
+        headers['If-None-Match'] = stored['etag']
+    if stored.get('last_modified'):
+        headers['If-Modified-Since'] = stored['last_modified']
+    try:
+        with session.get(url, headers=headers, stream=True, verify=verify_ssl, timeout=timeout) as response:
+            return response.status_code == 304
+    except requests.RequestException as e:
+        print(f"Could not revalidate {dest_path} ({e}), keeping the existing file.")
+        return True
+
+def _if_range(validators):
+    """
+    If-Range header for resumed requests: a changed file is sent whole (200) instead of a stale range.
+    """
+    value = validators.get('etag') or validators.get('last_modified')
+    return {'If-Range': value} if value else {}
+
+def _check_stream_part(url, part_path, state_path, validators):
+    """
+    Keeps the validators of the data in part_path in state_path. A part left by an earlier run
+    for another version of the file (different ETag/Last-Modified) cannot be resumed: If-Range
+    would carry the new validators and the server would append a range of the new version.
+    Such a part is dropped.
+    """
+    if os.path.exists(part_path) and os.path.exists(state_path):
+        try:
+            with open(state_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            if state.get('url') != url or state.get('validators', {}) != validators:
+                print(f"{url} changed since {os.path.basename(part_path)} was started, downloading it again.")
+                os.remove(part_path)
+        except (OSError, ValueError):
+            pass
+    with open(state_path, 'w', encoding='utf-8') as f:
+        json.dump({'url': url, 'validators': validators}, f)
+
+def _probe(session, url, verify_ssl, timeout):
+    """
+    Returns (total_size, accepts_ranges, validators) for a URL; total_size is None when unknown.
+    """
+    total_size, accepts_ranges, validators = None, False, {}
+    try:
+        response = session.head(url, allow_redirects=True, verify=verify_ssl, timeout=timeout)
+        if response.ok:
+            total_size = int(response.headers.get('content-length', 0)) or None
+            accepts_ranges = response.headers.get('accept-ranges', '').lower() == 'bytes'
+            validators = _response_validators(response)
+    except requests.RequestException:
+        pass
+
+    if not accepts_ranges:
+        # Some servers do not advertise Accept-Ranges (or reject HEAD) but honour ranges anyway
+        try:
+            with session.get(url, headers={'Range': 'bytes=0-0'}, stream=True, verify=verify_ssl, timeout=timeout) as response:
+                content_range = response.headers.get('content-range', '')
+                if response.status_code == 206 and '/' in content_range:
+                    accepts_ranges = True
+                    size = content_range.rsplit('/', 1)[1]
+                    total_size = int(size) if size.isdigit() else total_size
+                if not any(validators.values()):
+                    validators = _response_validators(response)
+        except requests.RequestException:
+            pass
+    return total_size, accepts_ranges, validators
+
+def _download_stream(session, url, part_path, total_size, accepts_ranges, verify_ssl, retries, timeout,
+                     validators, chunk_size, progress_hook):
+    """
+    Single connection download into part_path, resuming from its current size.
+    """
+    dest_name = os.path.basename(part_path)
+    for attempt in range(retries + 1):
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        if total_size and offset == total_size:
+            return True
+        if offset and (not accepts_ranges or (total_size and offset > total_size)):
+            offset = 0
+
+        headers = {'Range': f'bytes={offset}-', **_if_range(validators)} if offset else {}
+        try:
+            with session.get(url, headers=headers, stream=True, verify=verify_ssl, timeout=timeout) as response:
+                if offset and response.status_code == 416:
+                    # Nothing left to fetch
+                    return True
+                response.raise_for_status()
+                if offset and response.status_code != 206:
+                    print(f"\nServer ignored the range request, restarting {dest_name} from zero.")
+                    offset = 0
+                elif offset:
+                    print(f"Resuming {dest_name} at byte {offset}.")
+
+                with open(part_path, 'ab' if offset else 'wb') as f:
+                    downloaded = offset
+                    for data in response.iter_content(chunk_size):
+                        f.write(data)
+                        downloaded += len(data)
+                        progress_hook(dest_name, downloaded, total_size)
+
+            if not total_size or os.path.getsize(part_path) >= total_size:
+                return True
+            print(f"\nConnection closed early for {dest_name}.")
+        except requests.RequestException as e:
+            print(f"\nDownload of {dest_name} interrupted: {e}")
+
+        if attempt < retries:
+            print(f"Retrying ({attempt + 1}/{retries})...")
+    return False
+
+def _download_segmented(session, url, part_path, state_path, total_size, segments, verify_ssl, retries, timeout,
+                        validators, progress_hook):
+    """
+    Downloads total_size bytes as parallel byte ranges written in place into part_path.
+    Progress of every range is kept in state_path so an interrupted download resumes
+    each range where it stopped. The state is saved at most every SEGMENT_STATE_INTERVAL
+    seconds while data arrives, and once more when the ranges stop.
+    """
+    dest_name = os.path.basename(part_path)
+    state = None
+    if os.path.exists(state_path) and os.path.exists(part_path):
+        try:
+            with open(state_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            if state.get('url') != url or state.get('size') != total_size or state.get('validators', {}) != validators:
+                state = None
+        except (OSError, ValueError):
+            state = None
+
+    if state is None:
+        segment_size = -(-total_size // segments)
+        state = {
+            'url': url,
+            'size': total_size,
+            'validators': validators,
+            # [start, end (inclusive), bytes already written]
+            'segments': [[start, min(start + segment_size, total_size) - 1, 0]
+                         for start in range(0, total_size, segment_size)]
+        }
+        with open(part_path, 'wb') as f:
+            f.truncate(total_size)
+    else:
+        done = sum(s[2] for s in state['segments'])
+        print(f"Resuming {dest_name} at {done}/{total_size} bytes.")
+
+    lock = threading.Lock()
+    last_save = [0.0]
+
+    def save_state(throttle=False):
+        now = time.monotonic()
+        if throttle and now - last_save[0] < SEGMENT_STATE_INTERVAL:
+            return
+        last_save[0] = now
+        tmp_path = f"{state_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, state_path)
+
+    save_state()
+
+    def fetch(segment):
+        for attempt in range(retries + 1):
+            start, end, done = segment
+            if start + done > end:
+                return True
+            try:
+                headers = {'Range': f'bytes={start + done}-{end}', **_if_range(validators)}
+                with session.get(url, headers=headers, stream=True, verify=verify_ssl, timeout=timeout) as response:
+                    if response.status_code != 206:
+                        raise requests.RequestException(f"expected 206 for a range request, got {response.status_code}")
+                    with open(part_path, 'r+b') as f:
+                        f.seek(start + done)
+                        for data in response.iter_content(SEGMENT_CHUNK_SIZE):
+                            data = data[:end + 1 - (start + segment[2])]
+                            f.write(data)
+                            with lock:
+                                segment[2] += len(data)
+                                save_state(throttle=True)
+                                progress_hook(dest_name, sum(s[2] for s in state['segments']), total_size)
+                            if start + segment[2] > end:
+                                break
+                if start + segment[2] > end:
+                    return True
+            except requests.RequestException as e:
+                print(f"\nRange {start}-{end} of {dest_name} interrupted: {e}")
+            if attempt < retries:
+                print(f"Retrying range {start}-{end} ({attempt + 1}/{retries})...")
+        return False
+
+    try:
+        with ThreadPoolExecutor(max_workers=len(state['segments'])) as executor:
+            results = list(executor.map(fetch, state['segments']))
+    finally:
+        # Progress since the last throttled save, so the next run resumes exactly where this one stopped
+        with lock:
+            save_state()
+    return all(results)
+
+def _verify_download(part_path, expected_size, expected_sha256, chunk_size=CHUNK_SIZE):
+    """
+    Checks size and (optionally) sha256 of a finished download.
+    """
+    actual_size = os.path.getsize(part_path)
+    if expected_size and actual_size != expected_size:
+        print(f"\nSize mismatch for {part_path}: got {actual_size} bytes, expected {expected_size}.")
         return False
+
+    if expected_sha256:
+        sha = hashlib.sha256()
+        with open(part_path, 'rb') as f:
+            for block in iter(lambda: f.read(chunk_size), b''):
+                sha.update(block)
+        if sha.hexdigest().lower() != expected_sha256.lower():
+            print(f"\nChecksum mismatch for {part_path}.")
+            return False
+    return True
@@ -0,0 +1,106 @@
+import hashlib
+import os
+import pandas as pd
+
+from fzl_cache_utils import file_content_hash, load_cached_stage, save_cached_stage
+from fzl_opendata_utils import fzl_opendata_read_dictionary_fields
+
+class DictionaryCatalog:
+    """
+    Metadata catalog over the INEP dictionaries of several years.
+    Each workbook is parsed once; with a cache_dir the parsed table is also kept on disk,
+    keyed by the workbook content hash, so later runs skip openpyxl entirely.
+    Lookups by variable name are dict based and a cross-year index tells which
+    years contain each variable.
+    """
+
+    def __init__(self, cache_dir=None):
+        self.cache_dir = cache_dir
+        self._fields = {}          # year -> fields DataFrame
+        self._by_name = {}         # year -> {VARIABLE_NAME: field dict}
+        self._years_by_name = {}   # VARIABLE_NAME -> set of years
+
+    def load(self, year, excel_path):
+        """
+        Parses (or fetches from the disk cache) the dictionary workbook of a year.
+        excel_path may be a path or an in-memory buffer (see read_file_from_zip).
+        Returns the fields DataFrame (empty on failure).
+        """
+        content_hash = self._content_hash(excel_path)
+        df_fields = load_cached_stage(self.cache_dir, 'dictionary', str(year), content_hash)
+        if df_fields is None:
+            df_fields = fzl_opendata_read_dictionary_fields(excel_path)
+            if not df_fields.empty:
+                save_cached_stage(self.cache_dir, 'dictionary', str(year), content_hash, df_fields)
+
+        self.add(year, df_fields)
+        return df_fields
+
+    def add(self, year, df_fields):
+        """
+        Indexes an already parsed fields table (e.g. returned by a worker process).
+        """
+        year = str(year)
+        if df_fields is None or df_fields.empty:
+            return
+
+        by_name = {}
+        for field in df_fields.to_dict(orient='records'):
+            name = str(field['Nome da Variável']).strip().upper()
+            if name and name != 'NAN' and name not in by_name:
+                by_name[name] = field
+
+        self._fields[year] = df_fields
+        self._by_name[year] = by_name
+        for name in by_name:
+            self._years_by_name.setdefault(name, set()).add(year)
+
+    def years(self):
+        return sorted(self._fields.keys())
+
+    def fields(self, year):
+        return self._fields.get(str(year), pd.DataFrame())
+
+    def variable_names(self, year):
+        """
+        Variable names of a year, in dictionary order.
+        """
+        return list(self._by_name.get(str(year), {}).keys())
+
+    def get(self, name, year=None):
+        """
+        Returns the dictionary entry of a variable as a dict, or None.
+        Without a year, the first year that contains the variable is used.
+        """
+        name = str(name).strip().upper()
+        if year is None:
+            years = self.years_with(name)
+            if not years:
+                return None
+            year = years[0]
+        return self._by_name.get(str(year), {}).get(name)
+
+    def describe(self, name, year=None):
+        """
+        Returns the description of a variable, or None when it is not in the catalog.
+        """
+        field = self.get(name, year)
+        if not field:
+            return None
+        desc = field.get('Descrição da Variável')
+        return None if pd.isna(desc) else desc
+
+    def years_with(self, name):
+        """
+        Sorted list of years whose dictionary contains the variable.
+        """
+        return sorted(self._years_by_name.get(str(name).strip().upper(), ()))
+
+    def _content_hash(self, excel_path):
+        if not self.cache_dir:
+            return None
+        if hasattr(excel_path, 'getvalue'):
+            return hashlib.sha256(excel_path.getvalue()).hexdigest()
+        if isinstance(excel_path, str) and os.path.exists(excel_path):
+            return file_content_hash(excel_path, self.cache_dir)
+        return None
@@ -2,42 +2,419 @@ import pandas as pd
 import io
 import zipfile
 import os
+import pickle
+import shutil
+import tempfile
+from contextlib import closing, nullcontext
 
-def load_census_csv(file_handle_or_path, delimiter=';', encoding='latin1', columns=None):
+from fzl_shard_utils import map_csv_shards, open_shard
+
+# Low cardinality name columns stored as dictionary-encoded (categorical) columns in Parquet
+CENSUS_CATEGORICAL_COLUMNS = ['NO_REGIAO', 'NO_UF', 'SG_UF', 'NO_MUNICIPIO', 'NO_MESORREGIAO', 'NO_MICRORREGIAO']
+
+# Name/code columns worth a categorical even when the dictionary says 'Num' (codes, not quantities)
+CENSUS_CODE_COLUMNS = ['CO_REGIAO', 'CO_UF', 'CO_MESORREGIAO', 'CO_MICRORREGIAO']
+
+# Rows per chunk read by each worker of aggregate_csv_sharded
+SHARD_CHUNKSIZE = 200000
+
+# 'Char' columns with (almost) one value per school, where a categorical would not save memory
+CENSUS_HIGH_CARDINALITY_PREFIXES = ('NO_ENTIDADE', 'DS_', 'NU_')
+
+# Leading dictionary columns (year, region, state, municipality, ...) read besides the analysed ones,
+# so logged duplicate rows show where a school is; the other census columns are never parsed
+CONTEXT_COLUMNS = int(os.environ.get('CONTEXT_COLUMNS', '10'))
+
+def census_dtype_plan(df_fields):
+    """
+    Builds an explicit {column: dtype} map for read_csv from the dictionary fields table
+    (see fzl_opendata_utils.fzl_opendata_read_dictionary_fields):
+    QT_* counts become the smallest unsigned nullable int that fits 'Tamanho' digits,
+    IN_* flags nullable booleans, TP_* and region/UF codes categoricals, low cardinality
+    'Char' names (NO_UF, SG_UF, ...) categoricals and other identifiers compact ints.
+    """
+    plan = {}
+    if df_fields is None or df_fields.empty or 'Tipo' not in df_fields.columns:
+        return plan
+
+    for _, field in df_fields.iterrows():
+        name = str(field['Nome da Variável']).strip().upper()
+        kind = str(field['Tipo']).strip().lower()
+        digits = pd.to_numeric(field.get('Tamanho'), errors='coerce')
+
+        if kind == 'char':
+            plan[name] = 'str' if name.startswith(CENSUS_HIGH_CARDINALITY_PREFIXES) else 'category'
+        elif kind != 'num':
+            # Dates and unknown types are kept as text
+            plan[name] = 'str'
+        elif name.startswith('IN_'):
+            plan[name] = 'boolean'
+        elif name.startswith('TP_') or name in CENSUS_CODE_COLUMNS:
+            plan[name] = 'category'
+        elif pd.isna(digits):
+            plan[name] = 'UInt32' if name.startswith('QT_') else 'Int64'
+        elif digits <= 2:
+            plan[name] = 'UInt8'
+        elif digits <= 4:
+            plan[name] = 'UInt16'
+        elif digits <= 9:
+            plan[name] = 'UInt32'
+        else:
+            plan[name] = 'Int64'
+    return plan
+
+def load_census_csv(file_handle_or_path, delimiter=';', encoding='latin1', columns=None, chunksize=None, dtype=None):
     """
     Loads a census CSV file into a pandas DataFrame.
+    When chunksize is given, returns an iterator of DataFrames with at most chunksize rows
+    instead, so the file can be processed without holding it all in memory.
+    A path ending in .parquet (see convert_census_csv_to_parquet) is read column-wise:
+    only the requested columns are loaded.
+    dtype is an explicit {column: dtype} map (see census_dtype_plan) for the CSV reader.
     """
+    if isinstance(file_handle_or_path, str) and file_handle_or_path.endswith('.parquet'):
+        return _load_census_parquet(file_handle_or_path, columns=columns, chunksize=chunksize)
+
     try:
         # If it's a file handle (from zip), we need to handle it carefully
         # pandas can read from file-like objects
-        df = pd.read_csv(file_handle_or_path, delimiter=delimiter, encoding=encoding, usecols=columns, low_memory=False)
+        if dtype and columns is not None:
+            dtype = {c: t for c, t in dtype.items() if c in columns}
+        if chunksize:
+            return _read_csv_chunks(file_handle_or_path, dtype, delimiter=delimiter, encoding=encoding, usecols=columns,
+                                    chunksize=chunksize)
+        try:
+            df = pd.read_csv(file_handle_or_path, delimiter=delimiter, encoding=encoding, usecols=columns, low_memory=False, dtype=dtype)
+        except (ValueError, TypeError, OverflowError) as e:
+            if not dtype or not hasattr(file_handle_or_path, 'seek') and not isinstance(file_handle_or_path, str):
+                raise
+            print(f"dtype plan does not fit the data ({e}), retrying with inferred types...")
+            if hasattr(file_handle_or_path, 'seek'):
+                file_handle_or_path.seek(0)
+            df = pd.read_csv(file_handle_or_path, delimiter=delimiter, encoding=encoding, usecols=columns, low_memory=False)
         return df
     except Exception as e:
         print(f"Error loading census CSV: {e}")
         return pd.DataFrame()
 
-def aggregate_by_year(df, year_col='NU_ANO_CENSO', value_col='QT_MAT_ESP'):
+def _read_csv_chunks(file_handle_or_path, dtype, **read_options):
+    """
+    Chunks of read_csv(chunksize=...) parsed with the dtype plan. Like the retry of the
+    whole-file load, a chunk that does not fit the plan makes the source (a path or a
+    seekable handle) be read again from the start with inferred types; the rows already
+    returned are skipped, so every row is returned once.
+    """
+    done = 0
+    with pd.read_csv(file_handle_or_path, dtype=dtype, **read_options) as reader:
+        while True:
+            try:
+                chunk = next(reader)
+            except StopIteration:
+                return
+            except (ValueError, TypeError, OverflowError) as e:
+                if not dtype or not hasattr(file_handle_or_path, 'seek') and not isinstance(file_handle_or_path, str):
+                    raise
+                print(f"dtype plan does not fit the data ({e}), retrying with inferred types...")
+                break
+            # Outside the try, so errors of the consumer (or closing a partly read generator)
+            # are not taken for a dtype mismatch
+            yield chunk
+            done += len(chunk)
+
+    if hasattr(file_handle_or_path, 'seek'):
+        file_handle_or_path.seek(0)
+    skip = done
+    with pd.read_csv(file_handle_or_path, **read_options) as reader:
+        for chunk in reader:
+            if skip >= len(chunk):
+                skip -= len(chunk)
+                continue
+            yield chunk.iloc[skip:]
+            skip = 0
+
+def _load_census_parquet(parquet_path, columns=None, chunksize=None):
+    try:
+        import pyarrow.parquet as pq
+        parquet_file = pq.ParquetFile(parquet_path)
+        if columns is not None:
+            # Keep the file's column order, like read_csv(usecols=...) does
+            missing = [c for c in columns if c not in parquet_file.schema_arrow.names]
+            if missing:
+                raise ValueError(f"Columns not found in Parquet file: {missing}")
+            columns = [c for c in parquet_file.schema_arrow.names if c in columns]
+        # Nullable pandas ints, so columns with missing values are not widened to float64
+        # (same types as the CSV reader gets from census_dtype_plan)
+        import pyarrow as pa
+        nullable_ints = {
+            pa.uint8(): pd.UInt8Dtype(), pa.uint16(): pd.UInt16Dtype(), pa.uint32(): pd.UInt32Dtype(),
+            pa.int16(): pd.Int16Dtype(), pa.int32(): pd.Int32Dtype(), pa.int64(): pd.Int64Dtype()
+        }
+        if chunksize:
+            return (batch.to_pandas(types_mapper=nullable_ints.get)
+                    for batch in parquet_file.iter_batches(batch_size=chunksize, columns=columns))
+        return parquet_file.read(columns=columns).to_pandas(types_mapper=nullable_ints.get)
+    except Exception as e:
+        print(f"Error loading census Parquet: {e}")
+        return pd.DataFrame()
+
+def _census_arrow_type(pa, column):
+    """
+    Arrow type for a census column, based on the INEP naming convention (QT_ counts,
+    IN_ flags, TP_ codes, CO_ identifiers, NU_ numbers, NO_ names).
+    """
+    if column in CENSUS_CATEGORICAL_COLUMNS:
+        return pa.dictionary(pa.int32(), pa.string())
+    if column.startswith('QT_'):
+        return pa.uint32()
+    if column.startswith('IN_'):
+        return pa.uint8()
+    if column.startswith('TP_'):
+        return pa.int16()
+    if column.startswith(('CO_', 'NU_')):
+        return pa.int64()
+    return pa.string()
+
+def census_typed_codes(df):
+    """
+    Casts the numeric code columns of df (TP_, CO_, NU_, IN_ and QT_ columns that the CSV reader
+    keeps as categoricals, text or booleans) to nullable ints, the types of the Parquet copy
+    (see _census_arrow_type), so rows exported from either source are identical.
+    Columns with values that are not whole numbers are left as they are.
+    """
+    casts = {}
+    for column in df.columns:
+        if column in CENSUS_CATEGORICAL_COLUMNS or not column.startswith(('QT_', 'IN_', 'TP_', 'CO_', 'NU_')):
+            continue
+        values = df[column]
+        if pd.api.types.is_integer_dtype(values):
+            continue
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            values = values.astype(values.cat.categories.dtype)
+        if pd.api.types.is_bool_dtype(values):
+            casts[column] = values.astype('Int64')
+            continue
+        numbers = pd.to_numeric(values, errors='coerce')
+        if numbers.notna().sum() == values.notna().sum() and (numbers.dropna() % 1 == 0).all():
+            casts[column] = numbers.astype('Int64')
+    return df.assign(**casts) if casts else df
+
+def convert_census_csv_to_parquet(file_handle_or_path, parquet_path, delimiter=';', encoding='latin1', chunksize=200000):
+    """
+    Converts a census CSV into a typed, zstd-compressed Parquet file, one row group per chunk.
+    Names listed in CENSUS_CATEGORICAL_COLUMNS become categoricals and QT_* counts compact
+    unsigned ints, so later loads read only the requested columns without parsing text.
+    Requires pyarrow; returns False when it is not installed.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        print("pyarrow not installed. Skipping Parquet conversion.")
+        print("Please run: pip install pyarrow")
+        return False
+
+    print(f"Converting census CSV to Parquet: {parquet_path}")
+    tmp_path = f"{parquet_path}.{os.getpid()}.tmp"
+    writer = None
+    rows = 0
+    try:
+        os.makedirs(os.path.dirname(parquet_path), exist_ok=True)
+        chunks = pd.read_csv(file_handle_or_path, delimiter=delimiter, encoding=encoding, dtype=str,
+                             keep_default_na=False, na_values=[''], chunksize=chunksize)
+        for chunk in chunks:
+            if writer is None:
+                schema = pa.schema([(c, _census_arrow_type(pa, c)) for c in chunk.columns])
+                writer = pq.ParquetWriter(tmp_path, schema, compression='zstd')
+
+            arrays = []
+            for field in schema:
+                values = chunk[field.name]
+                if pa.types.is_integer(field.type):
+                    values = pd.to_numeric(values, errors='coerce')
+                    arrays.append(pa.array(values, type=pa.float64(), from_pandas=True).cast(field.type, safe=False))
+                elif pa.types.is_dictionary(field.type):
+                    arrays.append(pa.array(values, type=pa.string(), from_pandas=True).dictionary_encode())
+                else:
+                    arrays.append(pa.array(values, type=pa.string(), from_pandas=True))
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            rows += len(chunk)
+
+        if writer is None:
+            print("Empty CSV, nothing to convert.")
+            return False
+        writer.close()
+        writer = None
+        os.replace(tmp_path, parquet_path)
+        print(f"Parquet saved to {parquet_path} ({rows} rows)")
+        return True
+    except Exception as e:
+        print(f"Error converting census CSV to Parquet: {e}")
+        if writer is not None:
+            writer.close()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return False
+
+def aggregate_by_year(df, year_col='NU_ANO_CENSO', value_col='QT_MAT_ESP', group_cols=None):
     """
     Aggregates data by year, summing the values in value_col.
+    value_col may be a single column or a list of columns, which are all summed in one
+    groupby. group_cols are extra keys (e.g. ['NO_UF']) grouped before year_col.
+    Returns one wide table: group_cols + [year_col] + value columns.
     """
-    if df.empty or year_col not in df.columns or value_col not in df.columns:
+    value_cols = [value_col] if isinstance(value_col, str) else list(value_col)
+    keys = list(group_cols or []) + [year_col]
+    if df.empty or any(c not in df.columns for c in keys) or not any(c in df.columns for c in value_cols):
         return pd.DataFrame()
         
     try:
-        # Convert value_col to numeric just in case
-        df[value_col] = pd.to_numeric(df[value_col], errors='coerce').fillna(0)
-        grouped = df.groupby(year_col)[value_col].sum().reset_index()
-        return grouped
+        value_cols = [c for c in value_cols if c in df.columns]
+        # Convert value columns to numeric just in case (typed columns are summed as they are,
+        # missing values count as 0)
+        for c in value_cols:
+            if not pd.api.types.is_numeric_dtype(df[c]):
+                df[c] = pd.to_numeric(df[c], errors='coerce').fillna(0)
+        grouped = _summable(df[value_cols]).groupby([df[c] for c in keys], observed=True).sum().reset_index()
+        return _plain_group_keys(grouped, keys)
     except Exception as e:
         print(f"Error aggregating data: {e}")
         return pd.DataFrame()
 
+def aggregate_in_chunks(chunks, group_by_list, value_col='QT_MAT_ESP', on_chunk=None):
+    """
+    Folds an iterator of DataFrame chunks into running sums of value_col (a column or a
+    list of columns), one per grouping in group_by_list
+    (e.g. [['NU_ANO_CENSO'], ['NO_UF', 'NU_ANO_CENSO']]).
+    Peak memory depends on the number of groups, not on the file size.
+    on_chunk, when given, is called with every chunk before it is discarded.
+    Returns a list of DataFrames in the same order as group_by_list.
+    """
+    value_cols = [value_col] if isinstance(value_col, str) else list(value_col)
+    running = [None] * len(group_by_list)
+    rows = 0
+    # Errors (e.g. an unreadable file) propagate: empty tables would silently drop the year
+    for chunk in chunks:
+        rows += len(chunk)
+        if on_chunk:
+            on_chunk(chunk)
+        present = [c for c in value_cols if c in chunk.columns]
+        if not present:
+            continue
+        values = chunk[present]
+        untyped = [c for c in present if not pd.api.types.is_numeric_dtype(values[c])]
+        if untyped:
+            values = values.copy()
+            values[untyped] = values[untyped].apply(pd.to_numeric, errors='coerce').fillna(0)
+        values = _summable(values)
+        for i, group_cols in enumerate(group_by_list):
+            if not all(c in chunk.columns for c in group_cols):
+                continue
+            partial = values.groupby([chunk[c] for c in group_cols], observed=True).sum()
+            running[i] = partial if running[i] is None else running[i].add(partial, fill_value=0)
+    print(f"Aggregated {rows} rows in chunks.")
+
+    return [_plain_group_keys(r.reset_index(), group_cols) if r is not None else pd.DataFrame()
+            for r, group_cols in zip(running, group_by_list)]
+
+def _summable(values):
+    """
+    Widens integer value columns to Int64 before they are summed. The dtype plan reads QT_*
+    counts as UInt8/UInt16, which is fine for storage, but partial sums kept in those types
+    wrap around at 256/65536 when they are added up.
+    """
+    narrow = {c: 'Int64' for c in values.columns
+              if pd.api.types.is_integer_dtype(values[c]) and values[c].dtype != 'Int64'}
+    return values.astype(narrow) if narrow else values
+
+def _plain_group_keys(table, keys):
+    """
+    Turns categorical group keys back into plain values, sorted by value, so tables built
+    from categorical (Parquet) and text (CSV) sources merge and sort the same way.
+    """
+    for c in keys:
+        if isinstance(table[c].dtype, pd.CategoricalDtype):
+            table[c] = table[c].astype(table[c].cat.categories.dtype)
+    return table.sort_values(keys).reset_index(drop=True)
+
+def _aggregate_csv_shard(csv_path, header, start, end, group_by_list, value_col, columns, dtype, key_cols, chunksize,
+                         sketches, keys_dir):
+    # Every shard fills empty copies of the sketches, merged by the caller
+    sketches = {name: sketch.empty_copy() for name, sketch in (sketches or {}).items()}
+    # The key columns of every chunk are appended to a file in keys_dir instead of being kept in memory
+    keys_path = os.path.join(keys_dir, f"shard-{start:015d}.pkl") if key_cols else None
+
+    with open(keys_path, 'wb') if keys_path else nullcontext() as keys_file:
+        def on_chunk(chunk):
+            if keys_file:
+                pickle.dump(chunk[key_cols], keys_file, protocol=pickle.HIGHEST_PROTOCOL)
+            for sketch in sketches.values():
+                sketch.add(chunk)
+
+        with open_shard(csv_path, start, end, header) as shard, \
+                closing(load_census_csv(shard, columns=columns, chunksize=chunksize, dtype=dtype)) as chunks:
+            tables = aggregate_in_chunks(chunks, group_by_list, value_col=value_col,
+                                         on_chunk=on_chunk if key_cols or sketches else None)
+    return tables, keys_path, sketches
+
+def _read_key_chunks(keys_path):
+    with open(keys_path, 'rb') as f:
+        while True:
+            try:
+                yield pickle.load(f)
+            except EOFError:
+                return
+
+def aggregate_csv_sharded(csv_path, group_by_list, value_col='QT_MAT_ESP', workers=2, columns=None, dtype=None,
+                          key_cols=None, on_keys=None, chunksize=SHARD_CHUNKSIZE, sketches=None, spill_dir=None):
+    """
+    aggregate_in_chunks over a plain (extracted) CSV file on several cores: the file is split
+    at newline-aligned byte offsets, every worker process folds its shard into partial sums
+    and the partial tables are added together.
+    With key_cols, every worker also writes those columns of its rows (the duplicate keys) chunk
+    by chunk to a file in spill_dir, and on_keys is then called with each chunk of keys in file
+    order (e.g. DuplicateDetector.add), so no more than one chunk of keys is held at a time.
+    sketches ({name: GroupSketch}) are filled in the workers and the shard sketches merged into them.
+    Returns a list of DataFrames in the same order as group_by_list.
+    """
+    keys_dir = None
+    if key_cols:
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+        keys_dir = tempfile.mkdtemp(prefix='shard-keys-', dir=spill_dir)
+    try:
+        partials = map_csv_shards(csv_path, _aggregate_csv_shard, workers, group_by_list, value_col,
+                                  columns, dtype, key_cols, chunksize or SHARD_CHUNKSIZE, sketches, keys_dir)
+        if on_keys:
+            for _, keys_path, _ in partials:
+                for keys in _read_key_chunks(keys_path) if keys_path else []:
+                    if not keys.empty:
+                        on_keys(keys)
+    finally:
+        if keys_dir:
+            shutil.rmtree(keys_dir, ignore_errors=True)
+
+    tables = []
+    for i, group_cols in enumerate(group_by_list):
+        parts = [tables_part[i] for tables_part, _, _ in partials if not tables_part[i].empty]
+        if not parts:
+            tables.append(pd.DataFrame())
+            continue
+        merged = pd.concat(parts, ignore_index=True)
+        value_cols = [c for c in merged.columns if c not in group_cols]
+        merged[value_cols] = _summable(merged[value_cols])
+        merged = merged.groupby(group_cols, as_index=False, sort=False).sum()
+        tables.append(_plain_group_keys(merged, group_cols))
+
+    for _, _, shard_sketches in partials:
+        for name, sketch in shard_sketches.items():
+            sketches[name].merge(sketch)
+    return tables
+
 def find_dictionary_in_zip(zip_path):
     """
     Finds the path to the Excel dictionary inside the census zip.
     """
-    from .fzl_opendata_utils import find_files_in_zip
-    xlsx_files = find_files_in_zip(zip_path, '.xlsx')
-    # Usually the dictionary has 'dicionario' in the name
-    dict_files = [f for f in xlsx_files if 'dicionario' in f.lower()]
-    return dict_files[0] if dict_files else None
+    from fzl_opendata_utils import find_census_members_in_zip
+    # Usually the dictionary has 'dicionário' (or 'dicionario') in the name
+    _, dict_member = find_census_members_in_zip(zip_path)
+    return dict_member
@@ -1,6 +1,8 @@
 
 import pandas as pd
 
+from fzl_dedup_utils import find_duplicates
+
 def fzl_opendata_detect_duplicate_records(df, subset_columns, update_original_df=True):
     """
     Detects duplicate records in a DataFrame based on a subset of columns.
@@ -13,18 +15,18 @@ def fzl_opendata_detect_duplicate_records(df, subset_columns, update_original_df
     try:
 
         # detect and write duplicated records in a logfile
-        duplicates = df[df.duplicated(subset=subset_columns, keep=False)]
+        report = find_duplicates([df], subset_columns, sample_size=None)
+        rows = report['sample']
+        duplicates = df.iloc[rows['_row'].to_numpy()]
         print(f"Found {len(duplicates)} duplicate records based on columns: {subset_columns}")
         
-        # remove duplicated records if update_original_df is True
-        if update_original_df:
-            df.drop_duplicates(subset=subset_columns, keep='first', inplace=True)
+        # remove duplicated records if update_original_df is True (first occurrence is kept)
+        if update_original_df and not rows.empty:
+            if df.index.is_unique:
+                df.drop(index=df.index[rows.loc[~rows['_first'], '_row'].to_numpy()], inplace=True)
+            else:
+                df.drop_duplicates(subset=subset_columns, keep='first', inplace=True)
 
-        
-        
-        
-        
-        
         return duplicates
     except Exception as e:
         print(f"Error detecting duplicates: {e}")
@@ -1,8 +1,16 @@
 import zipfile
 import os
+import io
+import re
+import json
+import unicodedata
+from contextlib import contextmanager
 import pandas as pd
 import numpy as np
 
+from fzl_dedup_utils import DuplicateDetector, DEDUP_SAMPLE_SIZE
+from fzl_statistics_utils import export_paged_json
+
 def extract_zip(zip_path, extract_to):
     """
     Extracts a zip file to a specific directory.
@@ -31,12 +39,54 @@ def find_files_in_zip(zip_path, pattern):
         print(f"Error listing zip contents: {e}")
         return []
 
-def fzl_opendata_list_fields_in_dictionary_excel_file(excel_path, output_html_path):
+def find_census_members_in_zip(zip_path, csv_pattern='microdados_ed_basica', dictionary_pattern='dicion'):
+    """
+    Locates the school microdata CSV and the dictionary XLSX inside a census zip by name.
+    Returns a (csv_member, dictionary_member) tuple; missing members are None.
+    """
+    if not os.path.exists(zip_path):
+        print(f"Zip file not found: {zip_path}")
+        return None, None
+
+    csv_members = [f for f in find_files_in_zip(zip_path, '.csv') if csv_pattern in f.lower()]
+    dict_members = [f for f in find_files_in_zip(zip_path, '.xlsx') if dictionary_pattern in os.path.basename(f).lower()]
+
+    csv_member = csv_members[0] if csv_members else None
+    dict_member = dict_members[0] if dict_members else None
+    print(f"Found in {os.path.basename(zip_path)}: csv={csv_member}, dictionary={dict_member}")
+    return csv_member, dict_member
+
+@contextmanager
+def open_file_in_zip(zip_path, member):
+    """
+    Opens a member of a zip file as a binary stream without extracting it to disk.
+    """
+    with zipfile.ZipFile(zip_path, 'r') as z:
+        with z.open(member) as f:
+            yield f
+
+def read_file_from_zip(zip_path, member):
     """
-    Open excel file extracted from zip and create a html table listing all fields in the dictionary.
+    Reads a (small) member of a zip file fully into an in-memory buffer.
+    Useful for formats that need random access, like XLSX.
+    """
+    try:
+        with open_file_in_zip(zip_path, member) as f:
+            buffer = io.BytesIO(f.read())
+            buffer.name = member
+            return buffer
+    except Exception as e:
+        print(f"Error reading {member} from zip: {e}")
+        return None
+
+def fzl_opendata_read_dictionary_fields(excel_path):
+    """
+    Parses the fields table of an INEP dictionary excel into a DataFrame with the columns
+    'Nome da Variável', 'Descrição da Variável', 'Tipo', 'Categoria' (and 'Tamanho' when present).
     The excel has labels on line 7 (header=6) and data starting on line 10.
+    Returns an empty DataFrame on failure.
     """
-    print(f"Reading dictionary from {excel_path}...")
+    print(f"Reading dictionary from {getattr(excel_path, 'name', excel_path)}...")
     try:
         # Read with header at line 7 (index 6)
         # Use first sheet as requested
@@ -51,7 +101,8 @@ def fzl_opendata_list_fields_in_dictionary_excel_file(excel_path, output_html_pa
             'Nome da Variável': next((c for c in cols if 'nome' in str(c).lower() and 'vari' in str(c).lower()), None),
             'Descrição da Variável': next((c for c in cols if 'desc' in str(c).lower() and 'vari' in str(c).lower()), None),
             'Tipo': next((c for c in cols if 'tipo' in str(c).lower()), None),
-            'Categoria': next((c for c in cols if 'categ' in str(c).lower()), None)
+            'Categoria': next((c for c in cols if 'categ' in str(c).lower()), None),
+            'Tamanho': next((c for c in cols if 'tamanho' in str(c).lower()), None)
         }
 
         # Filter out keys that weren't found
@@ -59,7 +110,7 @@ def fzl_opendata_list_fields_in_dictionary_excel_file(excel_path, output_html_pa
         
         if not found_mapping.get('Nome da Variável'):
             print("Could not find 'Nome da Variável' column.")
-            return []
+            return pd.DataFrame()
 
         # Start from what was line 10. 
         # Header was line 7 (row index 6).
@@ -76,12 +127,31 @@ def fzl_opendata_list_fields_in_dictionary_excel_file(excel_path, output_html_pa
             # Filter rows where N is a number
             df_data = df_data[df_data[n_col].notnull()]
 
+        field_cols = ['Nome da Variável', 'Descrição da Variável', 'Tipo', 'Categoria', 'Tamanho']
+        actual_cols = [found_mapping[c] for c in field_cols if c in found_mapping]
+        
+        df_fields = df_data[actual_cols].copy()
+        df_fields.columns = [c for c in field_cols if c in found_mapping]
+        return df_fields
+        
+    except Exception as e:
+        print(f"Error processing dictionary excel: {e}")
+        import traceback
+        traceback.print_exc()
+        return pd.DataFrame()
+
+def fzl_opendata_write_dictionary_html(df_fields, output_html_path):
+    """
+    Writes the dictionary fields parsed by fzl_opendata_read_dictionary_fields as an html table
+    and returns the (stripped, upper case) variable names.
+    """
+    if df_fields.empty:
+        return []
+
+    try:
         # Prepare final display DataFrame
         display_cols = ['Nome da Variável', 'Descrição da Variável', 'Tipo', 'Categoria']
-        actual_cols = [found_mapping[c] for c in display_cols if c in found_mapping]
-        
-        df_display = df_data[actual_cols].copy()
-        df_display.columns = [c for c in display_cols if c in found_mapping]
+        df_display = df_fields[[c for c in display_cols if c in df_fields.columns]]
         
         # Clean up variable names for the return list
         variable_names = df_display['Nome da Variável'].dropna().apply(lambda x: str(x).strip().upper()).tolist()
@@ -94,48 +164,117 @@ def fzl_opendata_list_fields_in_dictionary_excel_file(excel_path, output_html_pa
         return variable_names
         
     except Exception as e:
-        print(f"Error processing dictionary excel: {e}")
-        import traceback
-        traceback.print_exc()
+        print(f"Error writing dictionary html: {e}")
         return []
 
-def fzl_opendata_get_field_description(excel_path, field_name):
+def fzl_opendata_write_dictionary_json(df_fields, output_dir):
     """
-    Searches for a specific field description in the INEP dictionary excel.
+    Like fzl_opendata_write_dictionary_html, but writes the fields as paged JSON
+    (see export_paged_json) for the lazily loaded dictionary view.
     """
+    if df_fields.empty:
+        return []
+
     try:
-        # Read with header at line 7 (index 6)
-        df_raw = pd.read_excel(excel_path, sheet_name=0, header=6)
-        
-        cols = df_raw.columns.tolist()
-        
-        name_col = next((c for c in cols if 'nome' in str(c).lower() and 'vari' in str(c).lower()), None)
-        desc_col = next((c for c in cols if 'desc' in str(c).lower() and 'vari' in str(c).lower()), None)
-        
-        if not name_col or not desc_col:
-            return None
+        display_cols = ['Nome da Variável', 'Descrição da Variável', 'Tipo', 'Categoria']
+        df_display = df_fields[[c for c in display_cols if c in df_fields.columns]]
+        variable_names = df_display['Nome da Variável'].dropna().apply(lambda x: str(x).strip().upper()).tolist()
+
+        export_paged_json(df_display, output_dir)
+        print(f"Dictionary fields saved to {output_dir} ({len(df_display)} fields)")
+        return variable_names
 
-        # Start from data rows (skip 3 rows after header)
-        df_data = df_raw.iloc[3:].copy()
-        
-        # Clean and search
-        # Create a temporary normalized column for searching
-        search_series = df_data[name_col].astype(str).str.strip().str.upper()
-        target_name = str(field_name).strip().upper()
-        
-        match = df_data.loc[search_series == target_name]
-        
-        if not match.empty:
-            return match.iloc[0][desc_col]
-            
-        return None
     except Exception as e:
-        print(f"Error searching dictionary description: {e}")
-        return None
+        print(f"Error writing dictionary json: {e}")
+        return []
+
+# Words left out of the dictionary search index (accent folded)
+SEARCH_STOPWORDS = {'a', 'o', 'as', 'os', 'e', 'de', 'da', 'do', 'das', 'dos', 'em', 'na', 'no', 'nas', 'nos',
+                    'para', 'por', 'com', 'ou', 'um', 'uma', 'que', 'se', 'ao', 'aos', 'pela', 'pelo'}
+
+def fold_search_text(text):
+    """
+    Lower case, accent folded text (e.g. 'Educação' -> 'educacao'), as used by the search index.
+    """
+    text = unicodedata.normalize('NFKD', str(text))
+    return ''.join(ch for ch in text if not unicodedata.combining(ch)).lower()
+
+def tokenize_search_text(text):
+    """
+    Accent folded alphanumeric tokens of a text, without stopwords.
+    """
+    return [t for t in re.findall(r'[a-z0-9]+', fold_search_text(text)) if t not in SEARCH_STOPWORDS]
+
+def fzl_opendata_build_dictionary_search_index(fields_by_year):
+    """
+    Builds an inverted index over the dictionaries of several years ({year: fields DataFrame},
+    see fzl_opendata_read_dictionary_fields). Every variable is one document, with the
+    description of the latest year that has it and the list of its years; it is indexed by
+    its name, the parts of its name (QT_MAT_ESP -> qt, mat, esp) and its description tokens.
+    Returns a JSON-ready dict:
+      years  sorted years
+      docs   [[name, description, [year index, ...]], ...] sorted by name
+      terms  sorted list of tokens, for prefix search by binary search
+      postings  postings[i] = sorted doc ids containing terms[i]
+    """
+    fields_by_year = {str(year): df_fields for year, df_fields in fields_by_year.items()}
+    years = sorted(fields_by_year)
+    variables = {}
+    for year_index, year in enumerate(years):
+        df_fields = fields_by_year[year]
+        if df_fields is None or df_fields.empty:
+            continue
+        descriptions = df_fields['Descrição da Variável'] if 'Descrição da Variável' in df_fields.columns else [None] * len(df_fields)
+        for name, desc in zip(df_fields['Nome da Variável'], descriptions):
+            name = str(name).strip().upper()
+            if not name or name == 'NAN':
+                continue
+            entry = variables.setdefault(name, {'description': '', 'years': []})
+            if entry['years'] and entry['years'][-1] == year_index:
+                continue
+            entry['years'].append(year_index)
+            if not pd.isna(desc) and str(desc).strip():
+                entry['description'] = ' '.join(str(desc).split())
 
-def fzl_opendata_detect_duplicate_records(df, fields_to_check, output_html_path, year_label):
+    docs = []
+    index = {}
+    for doc_id, name in enumerate(sorted(variables)):
+        entry = variables[name]
+        docs.append([name, entry['description'], entry['years']])
+        tokens = {fold_search_text(name)} | set(tokenize_search_text(name)) | set(tokenize_search_text(entry['description']))
+        for token in tokens:
+            index.setdefault(token, []).append(doc_id)
+
+    terms = sorted(index)
+    return {
+        'years': years,
+        'docs': docs,
+        'terms': terms,
+        'postings': [index[t] for t in terms]
+    }
+
+def fzl_opendata_write_dictionary_search_index(fields_by_year, output_path):
+    """
+    Builds the dictionary search index (see fzl_opendata_build_dictionary_search_index)
+    and writes it as compact JSON. Returns the number of indexed variables.
+    """
+    try:
+        search_index = fzl_opendata_build_dictionary_search_index(fields_by_year)
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        with open(output_path, 'w', encoding='utf-8') as f:
+            json.dump(search_index, f, ensure_ascii=False, separators=(',', ':'))
+        print(f"Dictionary search index saved to {output_path} ({len(search_index['docs'])} variables, "
+              f"{len(search_index['terms'])} terms)")
+        return len(search_index['docs'])
+    except Exception as e:
+        print(f"Error writing dictionary search index: {e}")
+        return 0
+
+def fzl_opendata_detect_duplicate_records(df, fields_to_check, output_html_path, year_label, spill_dir=None):
     """
     Detect duplicate records based on a list of fields and log them in an html table.
+    The check runs on the hash-partitioned DuplicateDetector (see fzl_dedup_utils), so only
+    the key columns are copied; the first DEDUP_SAMPLE_SIZE duplicates are logged with all columns.
     """
     print(f"Checking for duplicates in {year_label} data...")
     try:
@@ -145,23 +284,68 @@ def fzl_opendata_detect_duplicate_records(df, fields_to_check, output_html_path,
             print("No valid fields found for duplicate check.")
             return False
 
-        # Detect duplicates
-        duplicates = df[df.duplicated(subset=valid_fields, keep=False)]
-        
-        if not duplicates.empty:
-            print(f"Found {len(duplicates)} duplicate records.")
-            # Save first 100 duplicates to HTML to avoid massive files
-            report_df = duplicates.head(100)
-            os.makedirs(os.path.dirname(output_html_path), exist_ok=True)
-            report_df.to_html(output_html_path, index=False, classes='table table-danger table-striped')
-            print(f"Duplicate records log saved to {output_html_path}")
-            return True
-        else:
-            print("No duplicates detected.")
-            # Save empty placeholder
-            with open(output_html_path, 'w', encoding='utf-8') as f:
-                f.write(f"<p>No duplicates detected for {year_label}.</p>")
-            return False
+        report, sample_df = fzl_opendata_duplicates_report(df, valid_fields, spill_dir=spill_dir)
+        return fzl_opendata_write_duplicates_html(report, output_html_path, year_label, sample_df)
     except Exception as e:
         print(f"Error detecting duplicates: {e}")
         return False
+
+def fzl_opendata_duplicates_report(df, fields_to_check, spill_dir=None, sample_size=DEDUP_SAMPLE_SIZE):
+    """
+    Runs the DuplicateDetector over an in-memory DataFrame.
+    Returns (report, sample_df): the detector report and its sampled rows with all columns.
+    """
+    detector = DuplicateDetector(fields_to_check, spill_dir=spill_dir)
+    detector.add(df)
+    report = detector.finish(sample_size=sample_size)
+    return report, df.iloc[report['sample']['_row'].to_numpy()]
+
+def fzl_opendata_write_duplicates_html(report, output_html_path, year_label, sample_df=None):
+    """
+    Writes a DuplicateDetector report to html: a summary line and the sample of duplicate
+    rows (sample_df, when the full rows are at hand, otherwise the sampled keys).
+    Returns True when duplicates were found.
+    """
+    os.makedirs(os.path.dirname(output_html_path) or '.', exist_ok=True)
+    if not report['duplicate_rows']:
+        print("No duplicates detected.")
+        # Save empty placeholder
+        with open(output_html_path, 'w', encoding='utf-8') as f:
+            f.write(f"<p>No duplicates detected for {year_label}.</p>")
+        return False
+
+    print(f"Found {report['duplicate_rows']} duplicate records in {report['duplicate_groups']} keys.")
+    if sample_df is None:
+        sample_df = report['sample'].drop(columns=['_row', '_first'])
+    largest = int(report['group_sizes']['count'].iloc[0])
+    summary = (f"<p>{report['duplicate_rows']} duplicate records in {report['duplicate_groups']} keys "
+               f"(largest group: {largest} records). Showing the first {len(sample_df)}.</p>\n")
+    # Only the sample goes to HTML to avoid massive files
+    with open(output_html_path, 'w', encoding='utf-8') as f:
+        f.write(summary)
+        sample_df.to_html(f, index=False, classes='table table-danger table-striped')
+    print(f"Duplicate records log saved to {output_html_path}")
+    return True
+
+def fzl_opendata_write_duplicates_json(report, output_dir, year_label, sample_df=None):
+    """
+    Like fzl_opendata_write_duplicates_html, but writes the logged duplicate rows as paged JSON
+    (see export_paged_json), with the report summary in the manifest.
+    Returns True when duplicates were found.
+    """
+    if sample_df is None:
+        sample_df = report['sample'].drop(columns=['_row', '_first'])
+    if report['duplicate_rows']:
+        print(f"Found {report['duplicate_rows']} duplicate records in {report['duplicate_groups']} keys.")
+    else:
+        print("No duplicates detected.")
+    largest = int(report['group_sizes']['count'].iloc[0]) if report['duplicate_groups'] else 0
+    export_paged_json(sample_df, output_dir, meta={
+        'year': str(year_label),
+        'checked_rows': int(report['rows']),
+        'duplicate_rows': int(report['duplicate_rows']),
+        'duplicate_groups': int(report['duplicate_groups']),
+        'largest_group': largest
+    })
+    print(f"Duplicate records log saved to {output_dir}")
+    return bool(report['duplicate_rows'])
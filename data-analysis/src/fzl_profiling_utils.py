@@ -0,0 +1,195 @@
+import os
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+# Statuses of a stage that did no work for a year
+STAGE_IDLE_STATUSES = ('cached', 'skipped')
+
+def _cpu_seconds():
+    # Includes reaped child processes (e.g. the scan workers of aggregate_csv_sharded)
+    t = os.times()
+    return t.user + t.system + t.children_user + t.children_system
+
+def _bytes_read():
+    """
+    Bytes read by this process through read syscalls (files, zip members and sockets), or None
+    when /proc is not available.
+    """
+    try:
+        with open('/proc/self/io', 'r') as f:
+            for line in f:
+                if line.startswith('rchar:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+def _peak_rss():
+    """
+    Peak resident set size in bytes since the last _reset_peak_rss (or since the process started).
+    """
+    try:
+        with open('/proc/self/status', 'r') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if os.uname().sysname == 'Darwin' else peak * 1024
+
+def _reset_peak_rss():
+    # Linux only; elsewhere the peak is the process-wide peak so far
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        pass
+
+class StageRun:
+    """
+    Handle of a running stage: callers add the rows it handled and may override its status.
+    """
+
+    def __init__(self):
+        self.rows = None
+        self.status = 'completed'
+
+    def add_rows(self, count):
+        self.rows = (self.rows or 0) + int(count)
+
+class StageProfiler:
+    """
+    Records wall time, CPU time, peak RSS, bytes read and rows of pipeline stages, per stage
+    and year (year None for the stages that run once for all years).
+    Stages can nest; a stage reports its own time and bytes only (without the nested stages),
+    so e.g. the dedup work done for every chunk of the CSV scan is not counted twice.
+    Repeated runs of the same stage and year (one per chunk) add up into one record.
+    Records are plain dicts, so profiles of worker processes can be returned and merged.
+    """
+
+    def __init__(self):
+        self.records = []
+        self._index = {}
+        self._stack = []
+
+    def record(self, stage, year=None):
+        key = (stage, year)
+        if key not in self._index:
+            self._index[key] = len(self.records)
+            self.records.append({'stage': stage, 'year': year, 'status': None, 'calls': 0, 'wall_s': 0.0,
+                                 'cpu_s': 0.0, 'peak_rss_bytes': None, 'bytes_read': None, 'rows': None})
+        return self.records[self._index[key]]
+
+    def mark(self, stage, year=None, status='cached'):
+        """
+        Records a stage that did not run, e.g. because it was served from the stage cache.
+        """
+        record = self.record(stage, year)
+        if record['status'] is None or record['status'] in STAGE_IDLE_STATUSES:
+            record['status'] = status
+
+    @contextmanager
+    def stage(self, stage, year=None):
+        if self._stack:
+            parent = self._stack[-1]
+            parent['peak'] = _max(parent['peak'], _peak_rss())
+        _reset_peak_rss()
+        frame = {'peak': None, 'child_wall': 0.0, 'child_cpu': 0.0, 'child_bytes': 0}
+        self._stack.append(frame)
+        run = StageRun()
+        wall, cpu, read = time.perf_counter(), _cpu_seconds(), _bytes_read()
+        try:
+            yield run
+        except BaseException:
+            run.status = 'error'
+            raise
+        finally:
+            wall, cpu = time.perf_counter() - wall, _cpu_seconds() - cpu
+            read = _bytes_read() - read if read is not None else None
+            self._stack.pop()
+            frame['peak'] = _max(frame['peak'], _peak_rss())
+            if self._stack:
+                parent = self._stack[-1]
+                parent['child_wall'] += wall
+                parent['child_cpu'] += cpu
+                parent['child_bytes'] += read or 0
+                parent['peak'] = _max(parent['peak'], frame['peak'])
+
+            record = self.record(stage, year)
+            record['calls'] += 1
+            record['wall_s'] += max(wall - frame['child_wall'], 0.0)
+            record['cpu_s'] += max(cpu - frame['child_cpu'], 0.0)
+            record['peak_rss_bytes'] = _max(record['peak_rss_bytes'], frame['peak'])
+            if read is not None:
+                record['bytes_read'] = (record['bytes_read'] or 0) + max(read - frame['child_bytes'], 0)
+            if run.rows is not None:
+                record['rows'] = (record['rows'] or 0) + run.rows
+            if record['status'] != 'error':
+                record['status'] = run.status
+
+    def merge(self, records):
+        """
+        Adds records of another profiler (e.g. returned by a worker process).
+        """
+        for other in records or []:
+            record = self.record(other['stage'], other['year'])
+            if record['status'] in (None, *STAGE_IDLE_STATUSES) or other['status'] == 'error':
+                record['status'] = other['status']
+            for field in ('calls', 'wall_s', 'cpu_s'):
+                record[field] += other[field]
+            for field in ('bytes_read', 'rows'):
+                if other[field] is not None:
+                    record[field] = (record[field] or 0) + other[field]
+            record['peak_rss_bytes'] = _max(record['peak_rss_bytes'], other['peak_rss_bytes'])
+        return self
+
+    def pipeline_graph(self, steps):
+        """
+        Returns the pipeline steps ({id, label, status}) extended with the totals of their
+        records, a 'years' list with one entry per year and a 'bottleneck' flag on the step
+        that took the most wall time.
+        """
+        graph = []
+        for step in steps:
+            records = [r for r in self.records if r['stage'] == step['id']]
+            node = dict(step)
+            node.update(_metrics(records))
+            node['years'] = [dict(year=r['year'], status=r['status'], **_metrics([r]))
+                             for r in sorted((r for r in records if r['year'] is not None), key=lambda r: r['year'])]
+            graph.append(node)
+
+        slowest = max(graph, key=lambda node: node['wall_s'], default=None)
+        for node in graph:
+            node['bottleneck'] = node is slowest and node['wall_s'] > 0
+        return graph
+
+def _metrics(records):
+    wall = sum(r['wall_s'] for r in records)
+    rows = _sum(r['rows'] for r in records)
+    peaks = [r['peak_rss_bytes'] for r in records if r['peak_rss_bytes'] is not None]
+    return {
+        'wall_s': round(wall, 3),
+        'cpu_s': round(sum(r['cpu_s'] for r in records), 3),
+        'peak_rss_bytes': max(peaks) if peaks else None,
+        'bytes_read': _sum(r['bytes_read'] for r in records),
+        'rows': rows,
+        'rows_per_s': round(rows / wall, 1) if rows and wall > 0 else None
+    }
+
+def _sum(values):
+    values = [v for v in values if v is not None]
+    return sum(values) if values else None
+
+def _max(a, b):
+    if a is None:
+        return b
+    return a if b is None else max(a, b)
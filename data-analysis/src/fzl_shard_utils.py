@@ -0,0 +1,115 @@
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+# Shards smaller than this are not worth a worker process
+MIN_SHARD_SIZE = 8 * 1024 * 1024
+
+# Default number of worker processes scanning the shards of one CSV (1 = single core),
+# shared by main.py and process_census.py
+SCAN_WORKERS = int(os.environ.get('SCAN_WORKERS', '1'))
+
+def read_csv_header(csv_path):
+    """
+    Returns the header line of a CSV file as raw bytes, line ending included.
+    """
+    with open(csv_path, 'rb') as f:
+        return f.readline()
+
+def csv_shard_offsets(csv_path, shards, min_shard_size=None):
+    """
+    Splits the data part of a CSV file (after the header) into at most `shards`
+    byte ranges [start, end) that begin and end on line boundaries.
+    """
+    min_shard_size = min_shard_size or MIN_SHARD_SIZE
+    header = read_csv_header(csv_path)
+    size = os.path.getsize(csv_path)
+    data_start = len(header)
+    shards = max(1, min(shards, (size - data_start) // min_shard_size or 1))
+    step = (size - data_start) // shards
+
+    offsets = [data_start]
+    with open(csv_path, 'rb') as f:
+        for i in range(1, shards):
+            # Move the cut to just after the next newline
+            f.seek(max(data_start + i * step, offsets[-1]))
+            f.readline()
+            cut = f.tell()
+            if cut < size and cut > offsets[-1]:
+                offsets.append(cut)
+    offsets.append(size)
+    return list(zip(offsets[:-1], offsets[1:]))
+
+class _ShardReader(io.RawIOBase):
+    """
+    Raw stream over the header followed by the bytes [start, end) of a file.
+    It can be rewound to its start (seek(0)), e.g. to parse the shard again.
+    """
+
+    def __init__(self, path, header, start, end):
+        self._file = open(path, 'rb')
+        self._start, self._end, self._full_header = start, end, header
+        self.seek(0)
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR and offset == 0:
+            return self._pos
+        if whence != io.SEEK_SET or offset != 0:
+            raise io.UnsupportedOperation("a shard can only be rewound to its start")
+        self._file.seek(self._start)
+        self._header = memoryview(self._full_header)
+        self._remaining = self._end - self._start
+        self._pos = 0
+        return 0
+
+    def tell(self):
+        return self._pos
+
+    def readinto(self, buffer):
+        if self._header:
+            n = min(len(buffer), len(self._header))
+            buffer[:n] = self._header[:n]
+            self._header = self._header[n:]
+            self._pos += n
+            return n
+        if self._remaining <= 0:
+            return 0
+        view = memoryview(buffer)[:min(len(buffer), self._remaining)]
+        n = self._file.readinto(view)
+        self._remaining -= n
+        self._pos += n
+        return n
+
+    def close(self):
+        self._file.close()
+        super().close()
+
+def open_shard(csv_path, start, end, header=None):
+    """
+    Opens a shard as a binary file object that reads like a standalone CSV file:
+    the header line first, then the rows between the two offsets.
+    """
+    header = header if header is not None else read_csv_header(csv_path)
+    return io.BufferedReader(_ShardReader(csv_path, header, start, end), buffer_size=1024 * 1024)
+
+def map_csv_shards(csv_path, worker, workers, *args):
+    """
+    Runs worker(csv_path, header, start, end, *args) on newline-aligned shards of a CSV file
+    in a pool of `workers` processes (worker must be a module-level function).
+    Returns the partial results in file order, ready to be merged by the caller.
+    """
+    header = read_csv_header(csv_path)
+    shards = csv_shard_offsets(csv_path, workers)
+    if workers <= 1 or len(shards) == 1:
+        return [worker(csv_path, header, start, end, *args) for start, end in shards]
+
+    print(f"Scanning {os.path.basename(csv_path)} in {len(shards)} shards...")
+    with ProcessPoolExecutor(max_workers=min(workers, len(shards))) as executor:
+        futures = [executor.submit(worker, csv_path, header, start, end, *args) for start, end in shards]
+        return [f.result() for f in futures]
@@ -0,0 +1,214 @@
+import math
+import numpy as np
+import pandas as pd
+
+# Relative error of the quantile estimates (DDSketch-style logarithmic buckets)
+SKETCH_RELATIVE_ACCURACY = 0.01
+
+# Entities kept per group by the top-k lists
+SKETCH_TOP_K = 50
+
+# Quantiles written to the exported JSON
+SKETCH_QUANTILES = [0.1, 0.25, 0.5, 0.75, 0.9, 0.99]
+
+# Bucket of zero (and negative) values, below every logarithmic bucket
+_ZERO_BUCKET = np.iinfo(np.int32).min
+
+class GroupSketch:
+    """
+    Per-group summaries of one measure over the entities (schools) of a census file,
+    built while it streams: count, sum, min and max, a bounded top-k list of entities
+    and a mergeable quantile sketch.
+    The quantile sketch counts values in logarithmic buckets (bucket i holds
+    (gamma^(i-1), gamma^i], gamma = (1 + a) / (1 - a)), so every estimate is within a
+    relative error a of a true value. Buckets of two sketches are merged by adding their
+    counts, and top-k lists by keeping the k largest of both; partial sketches of chunks,
+    shards and years therefore merge exactly like the running sums of aggregate_in_chunks.
+    Groups are group_cols plus year_col, so sketches of different years are disjoint.
+    """
+
+    def __init__(self, group_cols, value_col, year_col='NU_ANO_CENSO', id_col='CO_ENTIDADE',
+                 label_col='NO_ENTIDADE', top_k=SKETCH_TOP_K, relative_accuracy=SKETCH_RELATIVE_ACCURACY):
+        self.group_cols = list(group_cols)
+        self.value_col = value_col
+        self.year_col = year_col
+        self.id_col = id_col
+        self.label_col = label_col
+        self.top_k = top_k
+        self.relative_accuracy = relative_accuracy
+        self._log_gamma = math.log((1 + relative_accuracy) / (1 - relative_accuracy))
+        self._keys = self.group_cols + [year_col]
+        self._stats = None      # count, sum, min, max per group
+        self._buckets = None    # value count per (group, bucket)
+        self._top = None        # at most top_k rows per group
+        self._integral = True
+
+    def columns(self):
+        return self._keys + [self.id_col, self.label_col, self.value_col]
+
+    @property
+    def empty(self):
+        return self._stats is None
+
+    def empty_copy(self):
+        return GroupSketch(self.group_cols, self.value_col, self.year_col, self.id_col, self.label_col,
+                           self.top_k, self.relative_accuracy)
+
+    def add(self, chunk):
+        """
+        Adds the rows of a DataFrame chunk; rows without a value are skipped.
+        """
+        needed = self._keys + [self.id_col, self.value_col]
+        if chunk.empty or any(c not in chunk.columns for c in needed):
+            return
+        frame = chunk[needed].copy()
+        frame[self.label_col] = chunk[self.label_col] if self.label_col in chunk.columns else ''
+        frame[self.value_col] = pd.to_numeric(frame[self.value_col], errors='coerce').astype('float64')
+        frame = frame[frame[self.value_col].notna()]
+        for c in self._keys:
+            if isinstance(frame[c].dtype, pd.CategoricalDtype):
+                frame[c] = frame[c].astype(frame[c].cat.categories.dtype)
+        if frame.empty:
+            return
+
+        values = frame[self.value_col].to_numpy()
+        self._integral = self._integral and bool((values % 1 == 0).all())
+        grouped = frame.groupby(self._keys, observed=True, sort=False)[self.value_col]
+        stats = grouped.agg(['count', 'sum', 'min', 'max'])
+        buckets = frame.groupby(self._keys + [self._bucket_of(values)], observed=True, sort=False).size()
+        top = self._trim(frame)
+
+        self._merge_parts(stats, buckets, top)
+
+    def merge(self, other):
+        """
+        Adds another sketch of the same grouping and measure (another chunk, shard or year).
+        """
+        if other is None or other.empty:
+            return self
+        self._integral = self._integral and other._integral
+        self._merge_parts(other._stats, other._buckets, other._top)
+        return self
+
+    def quantiles(self, quantiles=SKETCH_QUANTILES):
+        """
+        Returns a DataFrame with one row per group and a column per quantile (e.g. 'p50').
+        """
+        if self.empty:
+            return pd.DataFrame(columns=self._keys)
+        buckets = self._buckets.sort_index(level=-1)
+        records = []
+        for group, counts in buckets.groupby(level=list(range(len(self._keys))), sort=False):
+            group = group if isinstance(group, tuple) else (group,)
+            # Groups of the year alone (no group_cols) are a plain index, not a MultiIndex
+            stats = self._stats.loc[group if len(group) > 1 else group[0]]
+            bucket_ids = counts.index.get_level_values(-1).to_numpy()
+            cumulative = np.cumsum(counts.to_numpy())
+            record = dict(zip(self._keys, group))
+            for q in quantiles:
+                rank = q * (cumulative[-1] - 1)
+                bucket = bucket_ids[np.searchsorted(cumulative, rank, side='right')]
+                estimate = self._value_of(bucket)
+                record[f"p{round(q * 100):d}"] = min(max(estimate, stats['min']), stats['max'])
+            records.append(record)
+        return pd.DataFrame(records)
+
+    def to_records(self, quantiles=SKETCH_QUANTILES):
+        """
+        One JSON-ready record per group: keys, count, sum, min, max, quantiles, the sketch
+        buckets ({'zero': n, 'bins': {index: n}}, so clients can merge groups or years)
+        and the top-k entities as [{id, name, value}] in decreasing order.
+        """
+        if self.empty:
+            return []
+        stats = self._stats.reset_index()
+        table = stats.merge(self.quantiles(quantiles), on=self._keys, how='left')
+        table = table.sort_values(self._keys).reset_index(drop=True)
+
+        bins = {}
+        for (*group, bucket), n in self._buckets.items():
+            entry = bins.setdefault(tuple(group), {'zero': 0, 'bins': {}})
+            if bucket == _ZERO_BUCKET:
+                entry['zero'] += int(n)
+            else:
+                entry['bins'][str(int(bucket))] = int(n)
+
+        top = {}
+        for group, rows in self._top.groupby(self._keys, observed=True, sort=False):
+            top[group if isinstance(group, tuple) else (group,)] = [
+                {'id': self._plain(i), 'name': self._plain(n), 'value': self._number(v)}
+                for i, n, v in zip(rows[self.id_col], rows[self.label_col], rows[self.value_col])
+            ]
+
+        quantile_cols = [f"p{round(q * 100):d}" for q in quantiles]
+        records = []
+        for row in table.to_dict(orient='records'):
+            group = tuple(row[c] for c in self._keys)
+            record = {c: self._plain(row[c]) for c in self._keys}
+            record.update({
+                'count': int(row['count']),
+                'sum': self._number(row['sum']),
+                'min': self._number(row['min']),
+                'max': self._number(row['max']),
+                'quantiles': {c: self._number(row[c]) for c in quantile_cols},
+                'sketch': bins.get(group, {'zero': 0, 'bins': {}}),
+                'top': top.get(group, [])
+            })
+            records.append(record)
+        return records
+
+    def to_json(self, quantiles=SKETCH_QUANTILES):
+        """
+        Export document: the sketch parameters plus to_records().
+        """
+        return {
+            'measure': self.value_col,
+            'group_by': self._keys,
+            'top_k': self.top_k,
+            'relative_accuracy': self.relative_accuracy,
+            'gamma': (1 + self.relative_accuracy) / (1 - self.relative_accuracy),
+            'groups': self.to_records(quantiles)
+        }
+
+    def _merge_parts(self, stats, buckets, top):
+        if self._stats is None:
+            self._stats, self._buckets, self._top = stats, buckets, top
+            return
+        # count and sum add up, min and max are combined on the aligned groups
+        combined = self._stats.align(stats, join='outer')
+        merged = combined[0][['count', 'sum']].add(combined[1][['count', 'sum']], fill_value=0)
+        merged['min'] = np.fmin(combined[0]['min'], combined[1]['min'])
+        merged['max'] = np.fmax(combined[0]['max'], combined[1]['max'])
+        self._stats = merged
+        self._buckets = self._buckets.add(buckets, fill_value=0)
+        self._top = self._trim(pd.concat([self._top, top], ignore_index=True))
+
+    def _trim(self, frame):
+        """
+        Keeps the top_k rows of each group, by value and then by id so ties do not depend on input order.
+        """
+        frame = frame.sort_values([self.value_col, self.id_col], ascending=[False, True], kind='stable')
+        return frame.groupby(self._keys, observed=True, sort=False).head(self.top_k).reset_index(drop=True)
+
+    def _bucket_of(self, values):
+        positive = values > 0
+        buckets = np.full(len(values), _ZERO_BUCKET, dtype=np.int64)
+        buckets[positive] = np.ceil(np.log(values[positive]) / self._log_gamma)
+        return buckets
+
+    def _value_of(self, bucket):
+        if bucket == _ZERO_BUCKET:
+            return 0.0
+        gamma = math.exp(self._log_gamma)
+        # Middle of the bucket in relative terms; exact integers for counts below ~1/a
+        estimate = 2 * gamma ** bucket / (gamma + 1)
+        return float(round(estimate)) if self._integral else estimate
+
+    def _number(self, value):
+        if value is None or pd.isna(value):
+            return None
+        return int(value) if self._integral or float(value).is_integer() else float(value)
+
+    @staticmethod
+    def _plain(value):
+        return value.item() if isinstance(value, np.generic) else value
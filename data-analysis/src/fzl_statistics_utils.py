@@ -1,12 +1,32 @@
+import numpy as np
 import pandas as pd
-import plotly.graph_objects as go
-import plotly.utils
 import json
 import os
+import glob
+import gzip
+import hashlib
+import shutil
 
-def generate_interactive_dashboard(data_views, title, output_html):
+try:
+    import brotli
+except ImportError:  # optional, only gzip copies are written without it
+    brotli = None
+
+# Rows per page of the paged JSON artifacts (see export_paged_json)
+PAGE_SIZE = 500
+
+# Folder (inside the assets dir) with the content-hashed copies, and the manifest that maps to them
+HASHED_ASSETS_DIR = 'blobs'
+ASSET_MANIFEST = 'data-manifest.json'
+
+# Precompressed copies written next to every page ('gzip', 'br'), only useful behind servers with
+# gzip_static/brotli_static style support. Off by default: GitHub Pages never serves them.
+PAGE_COMPRESSION = tuple(e for e in os.environ.get('PAGE_COMPRESSION', '').split(',') if e)
+
+def generate_interactive_dashboard(data_views, title, output_json):
     """
-    Generates an interactive HTML dashboard. 
+    Writes the data of an interactive dashboard as compact columnar JSON, rendered by the
+    shared chart component of the Angular app (one bar chart and table per view).
     Supports simple bar charts and clustered bar charts.
     
     Args:
@@ -19,6 +39,12 @@ def generate_interactive_dashboard(data_views, title, output_html):
                 'x_label': str,
                 'cluster_col': str (Optional - triggers clustered chart)
             }
+
+    Output:
+        {"title": str, "views": [{"name", "x_label", "y_label", "clustered",
+                                  "x": [...], "series": [{"name", "y": [...]}]}]}
+        Every series has one value per x (null where the cluster has no value for that x).
+        Numbers are written raw; formatting is left to the frontend.
     """
     if not data_views:
         print("No data views provided.")
@@ -27,7 +53,7 @@ def generate_interactive_dashboard(data_views, title, output_html):
     print(f"Generating interactive dashboard: {title}")
     
     try:
-        js_data = {}
+        views = []
         
         for view_name, view_data in data_views.items():
             df = view_data['df']
@@ -35,36 +61,24 @@ def generate_interactive_dashboard(data_views, title, output_html):
             y_col = view_data['y_col']
             cluster_col = view_data.get('cluster_col') # New parameter
             
-            traces = []
-            table_html = ""
+            series = []
 
             if cluster_col and cluster_col in df.columns:
                 # --- CLUSTERED LOGIC ---
                 
-                # Sort: usually alphabetical for X, chronological for Cluster
-                df = df.sort_values(by=[x_col, cluster_col])
-                
-                # Get unique clusters (e.g., Years)
-                clusters = sorted(df[cluster_col].unique())
+                # One sorted groupby into an X by Cluster grid: alphabetical X rows,
+                # chronological Cluster columns (e.g., Years), NaN where a pair is missing
+                grid = df.groupby([x_col, cluster_col], sort=True, observed=True)[y_col].sum(min_count=1).unstack(cluster_col)
+                x_values = grid.index
                 
-                for cluster_val in clusters:
-                    cluster_df = df[df[cluster_col] == cluster_val]
-                    traces.append({
-                        'x': cluster_df[x_col].tolist(),
-                        'y': cluster_df[y_col].tolist(),
+                # Every series comes out of the grid in one conversion
+                columns = _json_values(grid.to_numpy().T.ravel()) if grid.size else []
+                for i, cluster_val in enumerate(grid.columns):
+                    series.append({
                         'name': str(cluster_val),
-                        'type': 'bar'
+                        'y': columns[i * len(grid):(i + 1) * len(grid)]
                     })
 
-                # Generate Pivot Table for cleaner display (X vs Cluster)
-                pivot_df = df.pivot(index=x_col, columns=cluster_col, values=y_col).fillna(0)
-                # Format numbers
-                for c in pivot_df.columns:
-                    pivot_df[c] = pivot_df[c].apply(lambda x: f"{int(x):,}".replace(",", "."))
-                
-                pivot_df.index.name = view_data.get('x_label', x_col)
-                table_html = pivot_df.reset_index().to_html(classes='table table-striped', index=False, border=0)
-
             else:
                 # --- SINGLE SERIES LOGIC ---
                 
@@ -74,154 +88,26 @@ def generate_interactive_dashboard(data_views, title, output_html):
                 if x_col == 'NU_ANO_CENSO':
                     df = df.sort_values(by=x_col, ascending=True)
 
-                traces.append({
-                    'x': df[x_col].tolist(),
-                    'y': df[y_col].tolist(),
-                    'type': 'bar',
-                    'marker': {'color': '#1976d2'},
-                    'name': 'Total'
+                x_values = df[x_col]
+                series.append({
+                    'name': 'Total',
+                    'y': _json_values(df[y_col])
                 })
-
-                # Standard Table
-                formatted_df = df.copy()
-                if pd.api.types.is_numeric_dtype(formatted_df[y_col]):
-                    formatted_df[y_col] = formatted_df[y_col].apply(lambda x: f"{int(x):,}".replace(",", "."))
-                
-                formatted_df = formatted_df.rename(columns={x_col: view_data.get('x_label', x_col), y_col: 'Quantidade'})
-                table_html = formatted_df.to_html(classes='table table-striped', index=False, border=0)
             
-            js_data[view_name] = {
-                'traces': traces,
-                'table': table_html,
+            views.append({
+                'name': view_name,
                 'x_label': view_data.get('x_label', x_col),
-                'is_clustered': bool(cluster_col)
-            }
+                'y_label': 'Quantidade',
+                'clustered': bool(cluster_col),
+                'x': _json_values(x_values),
+                'series': series
+            })
 
-        js_json = json.dumps(js_data)
-
-        full_html_content = f"""<!DOCTYPE html>
-<html>
-<head>
-    <meta charset="utf-8">
-    <title>{title}</title>
-    <script src="https://cdn.plot.ly/plotly-latest.min.js"></script>
-    <style>
-        body {{
-            font-family: 'Roboto', sans-serif;
-            margin: 0;
-            padding: 20px;
-            background-color: #fff;
-        }}
-        .controls {{
-            text-align: center;
-            margin-bottom: 20px;
-            padding: 15px;
-            background: #f8f9fa;
-            border-radius: 8px;
-        }}
-        select {{
-            padding: 8px 16px;
-            font-size: 16px;
-            border-radius: 4px;
-            border: 1px solid #ccc;
-        }}
-        .chart-container {{
-            margin-bottom: 30px;
-            height: 500px;
-        }}
-        .table-container {{
-            width: 100%;
-            max-width: 1000px;
-            margin: 0 auto;
-            border: 1px solid #eee;
-            border-radius: 8px;
-            overflow-x: auto; /* Allow scroll for wide pivot tables */
-            box-shadow: 0 2px 4px rgba(0,0,0,0.05);
-        }}
-        h3 {{
-            text-align: center;
-            color: #333;
-            margin-top: 0;
-            padding-top: 20px;
-        }}
-        table.table {{
-            width: 100%;
-            border-collapse: collapse;
-            text-align: center;
-            white-space: nowrap; /* Prevent wrapping in pivot tables */
-        }}
-        table.table th, table.table td {{
-            padding: 12px 15px;
-            border-bottom: 1px solid #eee;
-        }}
-        table.table th {{
-            background-color: #f8f9fa;
-            font-weight: 600;
-            color: #555;
-        }}
-        table.table tr:nth-child(even) {{
-            background-color: #f9f9f9;
-        }}
-        table.table tr:hover {{
-            background-color: #f1f1f1;
-        }}
-    </style>
-</head>
-<body>
-    <div class="controls">
-        <label for="viewSelector">Visualizar por: </label>
-        <select id="viewSelector" onchange="updateView()">
-            {''.join([f'<option value="{k}">{k}</option>' for k in data_views.keys()])}
-        </select>
-    </div>
-
-    <div id="chartDiv" class="chart-container"></div>
-    
-    <div class="table-container">
-        <h3>Tabela de Frequência</h3>
-        <div id="tableDiv"></div>
-    </div>
-
-    <script>
-        const dashboardData = {js_json};
-        
-        function updateView() {{
-            const key = document.getElementById('viewSelector').value;
-            const data = dashboardData[key];
-            
-            const layout = {{
-                title: '{title}',
-                xaxis: {{ type: 'category', title: data.x_label, automargin: true }},
-                yaxis: {{ title: 'Quantidade' }},
-                template: 'plotly_white',
-                margin: {{ t: 40, b: 100, l: 60, r: 20 }},
-                barmode: data.is_clustered ? 'group' : 'relative',
-                autosize: true,
-                legend: {{ orientation: 'h', y: 1.1 }}
-            }};
-            
-            const config = {{ responsive: true, displayModeBar: false }};
-            
-            // Use newPlot to handle changing number of traces cleanly
-            Plotly.newPlot('chartDiv', data.traces, layout, config);
-            document.getElementById('tableDiv').innerHTML = data.table;
-        }}
-
-        // Initialize
-        updateView();
-        
-        window.onresize = function() {{
-            Plotly.Plots.resize('chartDiv');
-        }};
-    </script>
-</body>
-</html>"""
-
-        os.makedirs(os.path.dirname(output_html), exist_ok=True)
-        with open(output_html, 'w', encoding='utf-8') as f:
-            f.write(full_html_content)
+        os.makedirs(os.path.dirname(output_json), exist_ok=True)
+        with open(output_json, 'w', encoding='utf-8') as f:
+            json.dump({'title': title, 'views': views}, f, ensure_ascii=False, separators=(',', ':'))
             
-        print(f"Interactive dashboard saved to {output_html}")
+        print(f"Interactive dashboard data saved to {output_json}")
         return True
     except Exception as e:
         print(f"Error generating dashboard: {e}")
@@ -229,6 +115,25 @@ def generate_interactive_dashboard(data_views, title, output_html):
         traceback.print_exc()
         return False
 
+def _json_values(values):
+    """
+    Plain Python values of a Series, Index or array for json.dump, converted in bulk:
+    missing values become None and numbers are ints when they are all whole.
+    """
+    values = pd.Series(values)
+    if not pd.api.types.is_numeric_dtype(values) or pd.api.types.is_bool_dtype(values):
+        return values.astype(object).where(values.notna(), None).tolist()
+
+    array = values.to_numpy(dtype='float64', na_value=np.nan)
+    missing = np.isnan(array)
+    if np.all(array[~missing] % 1 == 0):
+        result = np.where(missing, 0, array).astype(np.int64).tolist()
+    else:
+        result = array.tolist()
+    for i in np.flatnonzero(missing):
+        result[i] = None
+    return result
+
 def export_to_json(data, output_json):
     """
     Exports data (list or dict) to a JSON file.
@@ -242,4 +147,132 @@ def export_to_json(data, output_json):
         return True
     except Exception as e:
         print(f"Error exporting JSON: {e}")
-        return False
\ No newline at end of file
+        return False
+
+def export_paged_json(df, output_dir, page_size=PAGE_SIZE, compress=PAGE_COMPRESSION, meta=None):
+    """
+    Exports a DataFrame as paged, compact JSON for lazy loading:
+    output_dir/manifest.json  {"columns", "rows", "page_size", "pages", "encodings", ...meta}
+    output_dir/page-NNNN.json one JSON array of row arrays (values in column order) per page,
+                              plus .gz/.br precompressed copies for the encodings in compress,
+                              if any (see PAGE_COMPRESSION; 'br' needs the optional brotli package).
+    Earlier pages in output_dir are removed. Returns the manifest.
+    """
+    print(f"Exporting {len(df)} rows to {output_dir} in pages of {page_size}...")
+    os.makedirs(output_dir, exist_ok=True)
+    for stale in glob.glob(os.path.join(output_dir, 'page-*')):
+        os.remove(stale)
+
+    encodings = [e for e in compress if e == 'gzip' or (e == 'br' and brotli is not None)]
+    pages = []
+    for start in range(0, len(df), page_size):
+        name = f"page-{len(pages):04d}.json"
+        data = df.iloc[start:start + page_size].to_json(orient='values', force_ascii=False).encode('utf-8')
+        with open(os.path.join(output_dir, name), 'wb') as f:
+            f.write(data)
+        if 'gzip' in encodings:
+            with open(os.path.join(output_dir, name + '.gz'), 'wb') as f:
+                f.write(gzip.compress(data, compresslevel=9, mtime=0))
+        if 'br' in encodings:
+            with open(os.path.join(output_dir, name + '.br'), 'wb') as f:
+                f.write(brotli.compress(data))
+        pages.append(name)
+
+    manifest = {
+        'columns': [str(c) for c in df.columns],
+        'rows': len(df),
+        'page_size': page_size,
+        'pages': pages,
+        'encodings': encodings,
+        **(meta or {})
+    }
+    with open(os.path.join(output_dir, 'manifest.json'), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, separators=(',', ':'))
+    return manifest
+
+def _load_asset_manifest(assets_dir):
+    try:
+        with open(os.path.join(assets_dir, ASSET_MANIFEST), 'r', encoding='utf-8') as f:
+            return json.load(f).get('files', {})
+    except (OSError, ValueError):
+        return {}
+
+def published_asset_path(assets_dir, logical):
+    """
+    Path of the data file written to assets_dir under the logical path (relative to assets_dir):
+    the file itself until it is published, then its content-hashed copy listed in ASSET_MANIFEST.
+    Returns None when neither exists.
+    """
+    path = os.path.join(assets_dir, logical)
+    if os.path.exists(path):
+        return path
+    hashed = _load_asset_manifest(assets_dir).get(logical)
+    path = os.path.join(assets_dir, hashed) if hashed else None
+    return path if path and os.path.exists(path) else None
+
+def publish_content_hashed_assets(assets_dir):
+    """
+    Moves every data file under assets_dir (JSON written by export_to_json, the dashboard,
+    cube and paged writers, ...) to HASHED_ASSETS_DIR/<name>.<content hash><ext>, together with
+    its precompressed .gz/.br copies, and writes ASSET_MANIFEST, mapping each logical path
+    (relative to assets_dir) to its hashed file. The frontend resolves its requests through the
+    manifest, so hashed files can be cached forever, only the small manifest has to be
+    revalidated, and every file is deployed once.
+    A single pass over the folder also covers files written by worker processes. Files of cached
+    years that were not rewritten in this run keep their earlier entries, unless their folder got
+    new files (writers replace whole folders). Hashed files that are no longer referenced are removed.
+    Returns the manifest.
+    """
+    hashed_dir = os.path.join(assets_dir, HASHED_ASSETS_DIR)
+    os.makedirs(hashed_dir, exist_ok=True)
+    previous = _load_asset_manifest(assets_dir)
+    files = {}
+    compressed = []
+    for root, dirs, names in os.walk(assets_dir):
+        dirs[:] = sorted(d for d in dirs if os.path.join(root, d) != hashed_dir)
+        for name in sorted(names):
+            path = os.path.join(root, name)
+            logical = os.path.relpath(path, assets_dir).replace(os.sep, '/')
+            if logical == ASSET_MANIFEST:
+                continue
+            if name.endswith(('.gz', '.br')):
+                compressed.append(path)
+                continue
+            with open(path, 'rb') as f:
+                digest = hashlib.sha256(f.read()).hexdigest()[:16]
+            stem, ext = os.path.splitext(name)
+            hashed_name = f"{stem}.{digest}{ext}"
+            os.replace(path, os.path.join(hashed_dir, hashed_name))
+            files[logical] = f"{HASHED_ASSETS_DIR}/{hashed_name}"
+
+    # Precompressed copies follow their file, so servers with gzip_static find them next to the hashed name
+    for path in compressed:
+        logical = os.path.relpath(path[:-3], assets_dir).replace(os.sep, '/')
+        if logical in files:
+            os.replace(path, os.path.join(assets_dir, files[logical] + path[-3:]))
+        else:
+            os.remove(path)
+
+    rewritten = {os.path.dirname(logical) for logical in files}
+    for logical, hashed in previous.items():
+        if (logical not in files and os.path.dirname(logical) not in rewritten
+                and os.path.exists(os.path.join(assets_dir, hashed))):
+            files[logical] = hashed
+
+    referenced = {os.path.basename(h) for h in files.values()}
+    for stale in os.listdir(hashed_dir):
+        if stale not in referenced and stale[:-3] not in referenced:
+            os.remove(os.path.join(hashed_dir, stale))
+    for root, dirs, names in os.walk(assets_dir, topdown=False):
+        if root not in (assets_dir, hashed_dir) and not os.listdir(root):
+            os.rmdir(root)
+
+    files = dict(sorted(files.items()))
+    manifest = {
+        'version': hashlib.sha256(json.dumps(files, sort_keys=True).encode('utf-8')).hexdigest()[:16],
+        'files': files
+    }
+    with open(os.path.join(assets_dir, ASSET_MANIFEST), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, separators=(',', ':'))
+    print(f"Published {len(files)} content-hashed data files (manifest version {manifest['version']})")
+    return manifest
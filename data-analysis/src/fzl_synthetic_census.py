@@ -0,0 +1,265 @@
+import io
+import time
+import zipfile
+import numpy as np
+import pandas as pd
+
+# (NO_UF, SG_UF, CO_UF, NO_REGIAO, CO_REGIAO, approximate number of schools, municipalities)
+CENSUS_UFS = [
+    ('Rondônia', 'RO', 11, 'Norte', 1, 1200, 52),
+    ('Acre', 'AC', 12, 'Norte', 1, 1600, 22),
+    ('Amazonas', 'AM', 13, 'Norte', 1, 5500, 62),
+    ('Roraima', 'RR', 14, 'Norte', 1, 800, 15),
+    ('Pará', 'PA', 15, 'Norte', 1, 11000, 144),
+    ('Amapá', 'AP', 16, 'Norte', 1, 900, 16),
+    ('Tocantins', 'TO', 17, 'Norte', 1, 1700, 139),
+    ('Maranhão', 'MA', 21, 'Nordeste', 2, 12000, 217),
+    ('Piauí', 'PI', 22, 'Nordeste', 2, 5500, 224),
+    ('Ceará', 'CE', 23, 'Nordeste', 2, 8500, 184),
+    ('Rio Grande do Norte', 'RN', 24, 'Nordeste', 2, 3500, 167),
+    ('Paraíba', 'PB', 25, 'Nordeste', 2, 5000, 223),
+    ('Pernambuco', 'PE', 26, 'Nordeste', 2, 9000, 185),
+    ('Alagoas', 'AL', 27, 'Nordeste', 2, 3000, 102),
+    ('Sergipe', 'SE', 28, 'Nordeste', 2, 2000, 75),
+    ('Bahia', 'BA', 29, 'Nordeste', 2, 17000, 417),
+    ('Minas Gerais', 'MG', 31, 'Sudeste', 3, 16500, 853),
+    ('Espírito Santo', 'ES', 32, 'Sudeste', 3, 3300, 78),
+    ('Rio de Janeiro', 'RJ', 33, 'Sudeste', 3, 10000, 92),
+    ('São Paulo', 'SP', 35, 'Sudeste', 3, 30000, 645),
+    ('Paraná', 'PR', 41, 'Sul', 4, 9500, 399),
+    ('Santa Catarina', 'SC', 42, 'Sul', 4, 6500, 295),
+    ('Rio Grande do Sul', 'RS', 43, 'Sul', 4, 10000, 497),
+    ('Mato Grosso do Sul', 'MS', 50, 'Centro-Oeste', 5, 1900, 79),
+    ('Mato Grosso', 'MT', 51, 'Centro-Oeste', 5, 2800, 141),
+    ('Goiás', 'GO', 52, 'Centro-Oeste', 5, 5000, 246),
+    ('Distrito Federal', 'DF', 53, 'Centro-Oeste', 5, 1400, 1)
+]
+
+# Identification columns at the start of microdados_ed_basica: (name, description, type, size)
+_HEAD_FIELDS = [
+    ('NU_ANO_CENSO', 'Ano do Censo', 'Num', 4),
+    ('NO_REGIAO', 'Nome da Região Geográfica', 'Char', 100),
+    ('CO_REGIAO', 'Código da Região Geográfica', 'Num', 1),
+    ('NO_UF', 'Nome da Unidade da Federação', 'Char', 100),
+    ('SG_UF', 'Sigla da Unidade da Federação', 'Char', 2),
+    ('CO_UF', 'Código da Unidade da Federação', 'Num', 2),
+    ('NO_MUNICIPIO', 'Nome do Município', 'Char', 150),
+    ('CO_MUNICIPIO', 'Código do Município', 'Num', 7),
+    ('NO_MESORREGIAO', 'Nome da Mesorregião', 'Char', 100),
+    ('CO_MESORREGIAO', 'Código da Mesorregião', 'Num', 4),
+    ('NO_MICRORREGIAO', 'Nome da Microrregião', 'Char', 100),
+    ('CO_MICRORREGIAO', 'Código da Microrregião', 'Num', 5),
+    ('NO_ENTIDADE', 'Nome da Escola', 'Char', 100),
+    ('CO_ENTIDADE', 'Código da Escola', 'Num', 8),
+    ('TP_DEPENDENCIA', 'Dependência Administrativa', 'Num', 1),
+    ('TP_CATEGORIA_ESCOLA_PRIVADA', 'Categoria da escola privada', 'Num', 1),
+    ('TP_LOCALIZACAO', 'Localização', 'Num', 1),
+    ('TP_LOCALIZACAO_DIFERENCIADA', 'Localização diferenciada da escola', 'Num', 1),
+    ('DS_ENDERECO', 'Endereço da escola', 'Char', 100),
+    ('NU_ENDERECO', 'Número do endereço', 'Char', 10),
+    ('DS_COMPLEMENTO', 'Complemento do endereço', 'Char', 100),
+    ('NO_BAIRRO', 'Bairro', 'Char', 50),
+    ('CO_CEP', 'CEP', 'Num', 8),
+    ('NU_DDD', 'DDD', 'Num', 2),
+    ('NU_TELEFONE', 'Telefone', 'Num', 9),
+    ('TP_SITUACAO_FUNCIONAMENTO', 'Situação de funcionamento', 'Num', 1),
+    ('DT_ANO_LETIVO_INICIO', 'Data de início do ano letivo', 'Data', 10),
+    ('DT_ANO_LETIVO_TERMINO', 'Data de término do ano letivo', 'Data', 10)
+]
+
+# Infrastructure flags (IN_*), before the generated ones that complete the column count
+_FLAG_NAMES = [
+    'AGUA_POTAVEL', 'AGUA_REDE_PUBLICA', 'AGUA_POCO_ARTESIANO', 'ENERGIA_REDE_PUBLICA', 'ENERGIA_GERADOR_FOSSIL',
+    'ESGOTO_REDE_PUBLICA', 'ESGOTO_FOSSA', 'LIXO_SERVICO_COLETA', 'LIXO_QUEIMA', 'TRATAMENTO_LIXO_RECICLAGEM',
+    'ALMOXARIFADO', 'AREA_VERDE', 'AUDITORIO', 'BANHEIRO', 'BANHEIRO_PNE', 'BIBLIOTECA', 'BIBLIOTECA_SALA_LEITURA',
+    'COZINHA', 'DESPENSA', 'DORMITORIO_ALUNO', 'LABORATORIO_CIENCIAS', 'LABORATORIO_INFORMATICA', 'PATIO_COBERTO',
+    'PARQUE_INFANTIL', 'PISCINA', 'QUADRA_ESPORTES', 'QUADRA_ESPORTES_COBERTA', 'REFEITORIO', 'SALA_ATENDIMENTO_ESPECIAL',
+    'SALA_DIRETORIA', 'SALA_PROFESSOR', 'SECRETARIA', 'ACESSIBILIDADE_RAMPAS', 'ACESSIBILIDADE_CORRIMAO',
+    'INTERNET', 'INTERNET_ALUNOS', 'INTERNET_APRENDIZAGEM', 'BANDA_LARGA', 'ALIMENTACAO', 'ESP_EXCLUSIVA',
+    'REGULAR', 'EJA', 'PROFISSIONALIZANTE', 'LOCAL_FUNC_PREDIO_ESCOLAR', 'LOCAL_FUNC_GALPAO'
+]
+
+# Teaching stages; the census has enrollments (MAT), teachers (DOC) and classes (TUR) per stage
+_STAGES = [
+    'BAS', 'INF', 'INF_CRE', 'INF_PRE', 'FUND', 'FUND_AI', 'FUND_AF', 'MED', 'MED_PROP', 'MED_CT', 'MED_NM',
+    'PROF', 'PROF_TEC', 'EJA', 'EJA_FUND', 'EJA_MED', 'ESP', 'ESP_CC', 'ESP_CE'
+]
+
+# Breakdowns of the basic education enrollments
+_ENROLLMENT_BREAKDOWNS = [
+    'FEM', 'MASC', 'ND', 'BRANCA', 'PRETA', 'PARDA', 'AMARELA', 'INDIGENA', '0_3', '4_5', '6_10', '11_14',
+    '15_17', '18_MAIS', 'D', 'N'
+]
+
+# Fraction of rows that repeat the CO_ENTIDADE of an earlier row (duplicates to detect)
+SYNTHETIC_DUPLICATE_RATE = 0.001
+
+# Rows generated and written per block
+SYNTHETIC_BLOCK_ROWS = 50000
+
+def synthetic_census_fields(columns=400):
+    """
+    Returns the fields table of a synthetic census with the given number of columns, in the
+    format of fzl_opendata_utils.fzl_opendata_read_dictionary_fields ('Nome da Variável',
+    'Descrição da Variável', 'Tipo', 'Categoria', 'Tamanho').
+    The identification columns come first, then IN_* flags and QT_* counts as in the real files;
+    generated IN_RECURSO_* / QT_RECURSO_* columns fill up to the requested count.
+    """
+    fields = [(name, desc, kind, size) for name, desc, kind, size in _HEAD_FIELDS]
+    fields += [(f'IN_{name}', f'Dependência ou recurso: {name.lower()}', 'Num', 1) for name in _FLAG_NAMES]
+    fields += [(f'QT_{kind}_{stage}', f'Número de {label} - {stage}', 'Num', 4)
+               for kind, label in (('MAT', 'Matrículas'), ('DOC', 'Docentes'), ('TUR', 'Turmas')) for stage in _STAGES]
+    fields += [(f'QT_MAT_BAS_{b}', f'Número de Matrículas da Educação Básica - {b}', 'Num', 4) for b in _ENROLLMENT_BREAKDOWNS]
+
+    extra = 0
+    while len(fields) < columns:
+        extra += 1
+        if extra % 2:
+            fields.append((f'IN_RECURSO_{extra:03d}', f'Recurso {extra}', 'Num', 1))
+        else:
+            fields.append((f'QT_RECURSO_{extra:03d}', f'Quantidade do recurso {extra}', 'Num', 4))
+    fields = fields[:max(columns, len(_HEAD_FIELDS))]
+
+    return pd.DataFrame([
+        {'Nome da Variável': name, 'Descrição da Variável': desc, 'Tipo': kind,
+         'Categoria': '1 - Sim; 0 - Não' if name.startswith('IN_') else None, 'Tamanho': size}
+        for name, desc, kind, size in fields
+    ])
+
+def synthetic_census_block(fields, year, start, rows, rng, duplicate_rate=SYNTHETIC_DUPLICATE_RATE):
+    """
+    Generates rows [start, start + rows) of a synthetic census as a DataFrame with the columns of fields.
+    UFs follow their real share of schools; municipalities, meso and microregions are drawn inside
+    the UF. Enrollments follow a log-normal school size with stages that are not offered left
+    blank, as in the real files; QT_MAT_ESP is zero-inflated. Flags are 0/1 with a few blanks.
+    """
+    ufs = pd.DataFrame(CENSUS_UFS, columns=['NO_UF', 'SG_UF', 'CO_UF', 'NO_REGIAO', 'CO_REGIAO', 'SCHOOLS', 'MUNICIPIOS'])
+    uf = rng.choice(len(ufs), size=rows, p=(ufs['SCHOOLS'] / ufs['SCHOOLS'].sum()).to_numpy())
+    municipio = (rng.random(rows) ** 2 * ufs['MUNICIPIOS'].to_numpy()[uf]).astype(np.int64)
+    co_uf = ufs['CO_UF'].to_numpy()[uf]
+    school = np.arange(start, start + rows, dtype=np.int64)
+    entity = 11000000 + school
+    repeated = np.flatnonzero(rng.random(rows) < duplicate_rate)
+    entity[repeated] = 11000000 + rng.integers(0, start + repeated + 1)
+    size = rng.lognormal(mean=4.5, sigma=1.0, size=rows)
+    dependencia = rng.choice([1, 2, 3, 4], size=rows, p=[0.01, 0.17, 0.59, 0.23])
+
+    data = {}
+    for name in fields['Nome da Variável']:
+        if name == 'NU_ANO_CENSO':
+            data[name] = np.full(rows, int(year))
+        elif name in ('NO_UF', 'SG_UF', 'CO_UF', 'NO_REGIAO', 'CO_REGIAO'):
+            data[name] = ufs[name].to_numpy()[uf]
+        elif name == 'NO_MUNICIPIO':
+            data[name] = pd.Series(ufs['SG_UF'].to_numpy()[uf]).radd('Município ').str.cat(municipio.astype(str), sep=' ')
+        elif name == 'CO_MUNICIPIO':
+            data[name] = co_uf * 100000 + municipio
+        elif name in ('NO_MESORREGIAO', 'CO_MESORREGIAO'):
+            meso = municipio % 6
+            data[name] = co_uf * 100 + meso if name.startswith('CO_') else pd.Series(meso.astype(str)).radd('Mesorregião ')
+        elif name in ('NO_MICRORREGIAO', 'CO_MICRORREGIAO'):
+            micro = municipio % 30
+            data[name] = co_uf * 1000 + micro if name.startswith('CO_') else pd.Series(micro.astype(str)).radd('Microrregião ')
+        elif name == 'NO_ENTIDADE':
+            prefix = np.array(['ESCOLA MUNICIPAL', 'ESCOLA ESTADUAL', 'COLÉGIO', 'CENTRO DE EDUCAÇÃO INFANTIL', 'E.M.E.F.'])
+            data[name] = pd.Series(prefix[rng.integers(0, len(prefix), rows)]).str.cat(entity.astype(str), sep=' JOSÉ DE ASSUNÇÃO ')
+        elif name == 'CO_ENTIDADE':
+            data[name] = entity
+        elif name == 'TP_DEPENDENCIA':
+            data[name] = dependencia
+        elif name == 'TP_CATEGORIA_ESCOLA_PRIVADA':
+            data[name] = pd.array(np.where(dependencia == 4, rng.integers(1, 5, rows), 0), dtype='Int64')
+            data[name][dependencia != 4] = pd.NA
+        elif name == 'TP_LOCALIZACAO':
+            data[name] = rng.choice([1, 2], size=rows, p=[0.7, 0.3])
+        elif name.startswith('TP_'):
+            data[name] = rng.integers(0, 4, rows)
+        elif name == 'DS_ENDERECO':
+            data[name] = pd.Series(school.astype(str)).radd('RUA DA CONCEIÇÃO ')
+        elif name.startswith('DT_'):
+            data[name] = f"{'01/02' if name.endswith('INICIO') else '20/12'}/{year}"
+        elif name.startswith(('DS_', 'NO_')):
+            data[name] = np.where(rng.random(rows) < 0.5, '', 'CENTRO')
+        elif name.startswith('IN_'):
+            values = pd.array((rng.random(rows) < rng.uniform(0.1, 0.9)).astype(np.int64), dtype='Int64')
+            values[rng.random(rows) < 0.03] = pd.NA
+            data[name] = values
+        elif name.startswith('QT_'):
+            data[name] = _synthetic_counts(name, size, rng)
+        else:
+            data[name] = rng.integers(0, 10 ** 8, rows)
+    return pd.DataFrame(data)
+
+def _synthetic_counts(name, size, rng):
+    rows = len(size)
+    if name.startswith('QT_MAT_ESP'):
+        # Most schools have no special education enrollments
+        values = np.where(rng.random(rows) < 0.7, 0, rng.poisson(np.maximum(size * 0.03, 1)))
+        offered = rng.random(rows) < 0.9
+    elif name.startswith('QT_MAT_BAS'):
+        values = size * (rng.uniform(0.3, 0.6) if name != 'QT_MAT_BAS' else 1.0)
+        offered = np.ones(rows, dtype=bool)
+    elif name.startswith(('QT_MAT_', 'QT_DOC_', 'QT_TUR_')):
+        per_unit = 1 if name.startswith('QT_MAT_') else (18 if name.startswith('QT_DOC_') else 25)
+        values = size * rng.uniform(0.2, 0.6) * rng.lognormal(0, 0.3, rows) / per_unit
+        offered = rng.random(rows) < 0.45
+    else:
+        values = rng.poisson(rng.uniform(0.5, 10), rows)
+        offered = rng.random(rows) < 0.95
+    counts = pd.array(np.clip(np.rint(values), 0, 9999).astype(np.int64), dtype='Int64')
+    counts[~offered] = pd.NA
+    return counts
+
+def write_synthetic_census_csv(binary_handle, year, rows, fields, seed=0, duplicate_rate=SYNTHETIC_DUPLICATE_RATE,
+                               block_rows=SYNTHETIC_BLOCK_ROWS):
+    """
+    Writes a synthetic microdados_ed_basica CSV (latin1, ';' delimited) to a binary stream,
+    generated block by block so memory does not grow with rows.
+    """
+    rng = np.random.default_rng(seed)
+    text = io.TextIOWrapper(binary_handle, encoding='latin1', newline='')
+    try:
+        for start in range(0, max(rows, 1), block_rows):
+            block = synthetic_census_block(fields, year, start, min(block_rows, rows - start), rng, duplicate_rate)
+            block.to_csv(text, sep=';', index=False, header=start == 0, lineterminator='\n')
+        text.flush()
+    finally:
+        text.detach()
+
+def write_synthetic_dictionary_xlsx(fields, output):
+    """
+    Writes fields as an INEP dictionary workbook (labels on line 7, variables from line 10),
+    readable by fzl_opendata_read_dictionary_fields. output is a path or a binary buffer.
+    """
+    header = ['N', 'Nome da Variável', 'Descrição da Variável', 'Tipo', 'Tamanho', 'Categoria']
+    sheet = [[None] * len(header) for _ in range(6)]
+    sheet[0][0] = 'DICIONÁRIO DE DADOS DO CENSO ESCOLAR - SINTÉTICO'
+    sheet.append(header)
+    sheet += [[None] * len(header) for _ in range(2)]
+    sheet.append(['IDENTIFICAÇÃO'] + [None] * (len(header) - 1))
+    for n, field in enumerate(fields.to_dict(orient='records'), 1):
+        sheet.append([n, field['Nome da Variável'], field['Descrição da Variável'], field['Tipo'], field['Tamanho'],
+                      field['Categoria']])
+    pd.DataFrame(sheet).to_excel(output, header=False, index=False)
+
+def make_synthetic_census_zip(zip_path, year, rows, columns=400, seed=0, duplicate_rate=SYNTHETIC_DUPLICATE_RATE):
+    """
+    Packages a synthetic census year like the INEP download: the microdados_ed_basica CSV and a
+    supplement CSV under dados/, and the dictionary workbook under Anexos/.
+    Returns {'csv_member', 'dictionary_member', 'rows', 'columns'}.
+    """
+    fields = synthetic_census_fields(columns)
+    root = f'microdados_censo_escolar_{year}'
+    csv_member = f'{root}/dados/microdados_ed_basica_{year}.csv'
+    dict_member = f'{root}/Anexos/ANEXO I - Dicionário de Dados/dicionário_dados_educação_básica.xlsx'
+
+    workbook = io.BytesIO()
+    write_synthetic_dictionary_xlsx(fields, workbook)
+    with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as z:
+        csv_info = zipfile.ZipInfo(csv_member, date_time=time.localtime()[:6])
+        csv_info.compress_type = zipfile.ZIP_DEFLATED
+        with z.open(csv_info, 'w', force_zip64=True) as f:
+            write_synthetic_census_csv(f, year, rows, fields, seed=seed, duplicate_rate=duplicate_rate)
+        z.writestr(f'{root}/dados/suplemento_cursos_tecnicos_{year}.csv', 'NU_ANO_CENSO;CO_CURSO;QT_MAT\n'.encode('latin1'))
+        z.writestr(dict_member, workbook.getvalue())
+    return {'csv_member': csv_member, 'dictionary_member': dict_member, 'rows': rows, 'columns': len(fields)}
@@ -1,27 +1,47 @@
 import os
 import sys
+import argparse
+import glob
+import shutil
+from functools import partial
+from contextlib import closing, nullcontext
 import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
 
 # Add current directory to path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 
-from fzl_http_utils import download_file
+from fzl_http_utils import download_files
 from fzl_opendata_utils import (
-    extract_zip, 
-    fzl_opendata_list_fields_in_dictionary_excel_file,
-    fzl_opendata_detect_duplicate_records,
-    fzl_opendata_get_field_description
+    find_census_members_in_zip,
+    open_file_in_zip,
+    read_file_from_zip,
+    fzl_opendata_write_dictionary_json,
+    fzl_opendata_write_dictionary_search_index,
+    fzl_opendata_duplicates_report,
+    fzl_opendata_write_duplicates_json
+)
+from fzl_dedup_utils import DuplicateDetector, fetch_rows
+from fzl_entity_index import EntityCollector, EntityIndex
+from fzl_cache_utils import file_content_hash, stage_cache_key, load_cached_stage, save_cached_stage
+from fzl_opendata_catalog import DictionaryCatalog
+from fzl_statistics_utils import (generate_interactive_dashboard, export_to_json, publish_content_hashed_assets,
+                                  published_asset_path)
+from fzl_sketch_utils import GroupSketch
+from fzl_cube_utils import CUBE_DIMENSIONS, CUBE_MAX_DEPTH, cube_groupings, is_cuboid, export_cube
+from fzl_profiling_utils import StageProfiler
+from fzl_shard_utils import SCAN_WORKERS
+from fzl_opendata_censoeducacaoinep import (
+    load_census_csv, aggregate_by_year, aggregate_in_chunks, aggregate_csv_sharded,
+    convert_census_csv_to_parquet, census_dtype_plan, census_typed_codes, SHARD_CHUNKSIZE, CONTEXT_COLUMNS
 )
-from fzl_excel_utils import read_excel_dictionary, find_field_description
-from fzl_statistics_utils import generate_interactive_dashboard, export_to_json
-from fzl_opendata_censoeducacaoinep import load_census_csv, aggregate_by_year
 
 
 # Configuration
 DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data')
 ANGULAR_ASSETS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '../../angular-app/src/assets/data_analysis')
-TEMP_EXTRACT_DIR = os.path.join(DATA_DIR, 'extracted')
+CACHE_DIR = os.path.join(DATA_DIR, 'cache')
 
 #https://www.gov.br/inep/pt-br/acesso-a-informacao/dados-abertos/microdados/censo-escolar
 DOWNLOAD_URLS = {
@@ -35,14 +55,381 @@ DOWNLOAD_URLS = {
 
 FIELD_TO_ANALYZE = 'QT_MAT_ESP' #NÃºmero de MatrÃ­culas da EducaÃ§Ã£o Especial
 
+# All metrics summed in the same scan of each year's CSV (the first one drives the chart)
+FIELDS_TO_ANALYZE = [FIELD_TO_ANALYZE]
+
+# Extra keys for the detailed wide table, grouped after NO_UF (e.g. ['TP_DEPENDENCIA'])
+GROUP_BY_EXTRA = []
+
+# Dimensions of the drill-down cube, summed in the same pass (empty = no cube)
+CUBE_DIMENSIONS_ENABLED = [d for d in os.environ.get('CUBE_DIMENSIONS', ','.join(CUBE_DIMENSIONS)).split(',') if d]
+
+# Per-school distributions of the first metric: {name: (group keys, top-k size)}, exported as
+# school_stats_by_<name>.json (count, sum, quantiles, mergeable sketch and top-k schools per group and year)
+SCHOOL_SKETCHES = {
+    'uf': (['NO_UF'], 50),
+    'municipio': (['NO_UF', 'NO_MUNICIPIO'], 10)
+}
+
+# Duplicate rows logged per year in the paged duplicates artifact
+DUPLICATES_LOG_ROWS = 10000
+
+# Bump when stage logic changes so cached per-year results are recomputed
+PIPELINE_CODE_VERSION = '10'
+
+# Number of worker processes for per-year processing (1 = sequential)
+PIPELINE_WORKERS = int(os.environ.get('PIPELINE_WORKERS', '1'))
+
+# Rows per chunk when streaming the census CSV (0 = load the whole file at once, which needs
+# several GB for a recent year); bounded by default so the pipeline fits small runners
+CSV_CHUNKSIZE = int(os.environ.get('CSV_CHUNKSIZE', '200000'))
+
+# Convert each year's CSV once to a typed Parquet file in the cache and read columns from it
+USE_PARQUET_CACHE = os.environ.get('PARQUET_CACHE', '1') != '0'
+
+# Zips downloaded at the same time, and parallel byte ranges per zip (1 = single connection)
+DOWNLOAD_WORKERS = int(os.environ.get('DOWNLOAD_WORKERS', '3'))
+DOWNLOAD_SEGMENTS = int(os.environ.get('DOWNLOAD_SEGMENTS', '4'))
+
+# Check already downloaded zips with a conditional GET (ETag/Last-Modified) and refetch changed ones
+REFRESH_DOWNLOADS = os.environ.get('REFRESH_DOWNLOADS', '0') == '1'
+
+
+def build_groupings(group_by=None, cube_dimensions=None, cube_depth=CUBE_MAX_DEPTH):
+    """
+    Returns the wide tables produced per year as {name: keys}; NU_ANO_CENSO is always the last key.
+    With cube_dimensions, the cuboids of the drill-down cube (see cube_groupings) are added.
+    """
+    groupings = {
+        'year': ['NU_ANO_CENSO'],
+        'state': ['NO_UF', 'NU_ANO_CENSO']
+    }
+    if group_by:
+        groupings['detail'] = ['NO_UF'] + list(group_by) + ['NU_ANO_CENSO']
+    if cube_dimensions:
+        groupings.update(cube_groupings(cube_dimensions, cube_depth))
+    return groupings
+
+def build_school_sketches(value_col, columns):
+    """
+    Returns the SCHOOL_SKETCHES whose keys are all in columns as {name: GroupSketch} of value_col.
+    """
+    return {name: GroupSketch(keys, value_col, top_k=top_k)
+            for name, (keys, top_k) in SCHOOL_SKETCHES.items()
+            if all(c in columns for c in keys)}
+
+def ensure_parquet(zip_path, csv_member, cache_dir, year, zip_hash):
+    """
+    Returns the path of the Parquet copy of this year's CSV, converting it on first use.
+    The file name carries the zip hash, so a new zip produces a new conversion.
+    Returns None when the conversion is not possible (e.g. pyarrow is missing).
+    """
+    parquet_path = os.path.join(cache_dir, str(year), f"microdados_ed_basica-{zip_hash[:16]}.parquet")
+    if os.path.exists(parquet_path):
+        print(f"Using Parquet cache {parquet_path}")
+        return parquet_path
+
+    for stale in glob.glob(os.path.join(cache_dir, str(year), "microdados_ed_basica-*.parquet")):
+        os.remove(stale)
+    with open_file_in_zip(zip_path, csv_member) as csv_file:
+        if convert_census_csv_to_parquet(csv_file, parquet_path):
+            return parquet_path
+    return None
+
+def ensure_extracted_csv(zip_path, csv_member, cache_dir, year, zip_hash):
+    """
+    Returns the path of an extracted copy of this year's CSV in the cache, extracting it on first use.
+    Like ensure_parquet, the file name carries the zip hash.
+    """
+    csv_path = os.path.join(cache_dir, str(year), f"microdados_ed_basica-{zip_hash[:16]}.csv")
+    if os.path.exists(csv_path):
+        print(f"Using extracted CSV {csv_path}")
+        return csv_path
+
+    for stale in glob.glob(os.path.join(cache_dir, str(year), "microdados_ed_basica-*.csv")):
+        os.remove(stale)
+    os.makedirs(os.path.dirname(csv_path), exist_ok=True)
+    print(f"Extracting {csv_member} to {csv_path}...")
+    tmp_path = f"{csv_path}.{os.getpid()}.tmp"
+    with open_file_in_zip(zip_path, csv_member) as src, open(tmp_path, 'wb') as dst:
+        shutil.copyfileobj(src, dst, 1024 * 1024)
+    os.replace(tmp_path, csv_path)
+    return csv_path
+
+def process_year(year, zip_path, output_dir, *, cache_dir=None, chunksize=None, fields=None, group_by=None, use_parquet=False,
+                 scan_workers=1, cube_dimensions=None, cube_depth=CUBE_MAX_DEPTH, context_columns=CONTEXT_COLUMNS):
+    """
+    Runs the per-year stages (locate, dictionary, sanitize, process) for one census zip.
+    Years are independent, so this can run in a worker process. Per-year artifacts (paged
+    JSON under dictionary/<year> and duplicates/<year>) are written to output_dir; only the
+    small aggregated frames are returned.
+    When cache_dir is given, stages whose inputs (zip content hash + config) are
+    unchanged are served from the on-disk stage cache instead of being recomputed.
+    When chunksize is given, the CSV is streamed in chunks of that many rows and folded
+    into running sums, so peak memory no longer grows with the file size.
+    All metrics in fields are summed in that single scan, one wide table per grouping.
+    With use_parquet (requires cache_dir), the CSV is converted once to a typed Parquet
+    file and later runs read only the needed columns from it.
+    Otherwise, with scan_workers > 1 (requires cache_dir), the CSV is extracted once and
+    scanned in newline-aligned shards by that many processes, whose partial sums and
+    duplicate keys are merged.
+    Cube dimensions missing from a year's dictionary are skipped, and so are the cuboids using them.
+    Besides the columns these need, only the first context_columns dictionary columns are read.
+    Every stage is profiled (wall and CPU time, peak RSS, bytes read, rows); the records are
+    returned in result['profile'].
+    """
+    print(f"########## Processing Year: {year} ##########")
+    fields = list(fields or FIELDS_TO_ANALYZE)
+    groupings = build_groupings(group_by, cube_dimensions, cube_depth)
+    result = {
+        'year': year,
+        'aggregates': {},
+        'dictionary_fields': None,
+        'dictionary_json': None,
+        'duplicates_json': None,
+        'entities': None,
+        'sketches': None,
+        'cached_stages': [],
+        'profile': None
+    }
+    profiler = StageProfiler()
+    result['profile'] = profiler.records
+
+    # 2) Locate CSV and dictionary inside the zip (streamed, nothing is extracted to disk)
+    print(f">>>>>>>>>> 2) Locating Zip Members Year {year} <<<<<<<<<<")
+    with profiler.stage('extract', year):
+        zip_hash = file_content_hash(zip_path, cache_dir) if cache_dir else None
+        csv_member, dict_member = find_census_members_in_zip(zip_path)
+
+    # 3) Dictionary Metadata Listing
+    print(f">>>>>>>>>> 3) Search Dictionary Year {year} <<<<<<<<<<")
+    catalog = DictionaryCatalog(cache_dir)
+    with profiler.stage('dictionary', year) as run:
+        dict_file = read_file_from_zip(zip_path, dict_member) if dict_member else None
+        if dict_file:
+            dict_fields = catalog.load(year, dict_file)
+            run.add_rows(len(dict_fields))
+            dict_json_dir = os.path.join(output_dir, 'dictionary', str(year))
+            if fzl_opendata_write_dictionary_json(dict_fields, dict_json_dir):
+                result['dictionary_json'] = dict_json_dir
+            # Returned so the main process can build the cross-year catalog
+            result['dictionary_fields'] = dict_fields
+        else:
+            run.status = 'skipped'
+
+    variable_names = catalog.variable_names(year)
+    # Explicit column types for the CSV reader, derived from the 'Tipo' column
+    dtype_plan = census_dtype_plan(catalog.fields(year))
+
+    # 4) Sanitize (Duplicate Detection)
+    print(f">>>>>>>>>> 4) Sanitizing Year {year} <<<<<<<<<<")
+    if csv_member:
+        # Clean variables from dictionary to match CSV headers
+        clean_vars = [v.strip().upper() for v in variable_names]
+        cols_to_use = clean_vars[:max(context_columns, 0)]
+        
+        # Ensure Essential Columns
+        required_cols = ['NU_ANO_CENSO', 'NO_UF'] + list(group_by or []) + fields
+        for c in required_cols:
+            if c not in cols_to_use: cols_to_use.append(c)
+
+        # Cube dimensions are only read when the year's file has them
+        for c in cube_dimensions or []:
+            if c in clean_vars and c not in cols_to_use: cols_to_use.append(c)
+        
+        # Use 'CO_ENTIDADE' for deduplication if possible
+        if 'CO_ENTIDADE' in clean_vars and 'CO_ENTIDADE' not in cols_to_use:
+            cols_to_use.append('CO_ENTIDADE')
+
+        # Keys and school names of the per-school sketches
+        for c in [c for keys, _ in SCHOOL_SKETCHES.values() for c in keys] + ['NO_ENTIDADE']:
+            if c in clean_vars and c not in cols_to_use: cols_to_use.append(c)
+
+        dup_json_dir = os.path.join(output_dir, 'duplicates', str(year))
+        sanitize_key = stage_cache_key(zip_hash, csv_member, cols_to_use, DUPLICATES_LOG_ROWS, PIPELINE_CODE_VERSION) if zip_hash else None
+        process_key = stage_cache_key(zip_hash, csv_member, fields, groupings, PIPELINE_CODE_VERSION) if zip_hash else None
+        # School ids of this year for the cross-year entity index (only when the file has CO_ENTIDADE)
+        track_entities = 'CO_ENTIDADE' in cols_to_use
+        entities_key = stage_cache_key(zip_hash, csv_member, 'entities', PIPELINE_CODE_VERSION) if zip_hash and track_entities else None
+        # Top-k schools and quantile sketches per group, also keyed by school id
+        sketches = build_school_sketches(fields[0], cols_to_use) if track_entities else {}
+        sketches_key = stage_cache_key(zip_hash, csv_member, 'sketches', fields[0], SCHOOL_SKETCHES, PIPELINE_CODE_VERSION) if zip_hash and sketches else None
+
+        sanitize_cached = None
+        # Earlier duplicate pages may already be published under their content-hashed names
+        if published_asset_path(output_dir, f'duplicates/{year}/manifest.json'):
+            sanitize_cached = load_cached_stage(cache_dir, year, 'sanitize', sanitize_key)
+        process_cached = load_cached_stage(cache_dir, year, 'process', process_key)
+        entities_cached = load_cached_stage(cache_dir, year, 'entities', entities_key) if track_entities else None
+        sketches_cached = load_cached_stage(cache_dir, year, 'sketches', sketches_key) if sketches else None
+
+        if sanitize_cached is not None:
+            result['duplicates_json'] = dup_json_dir
+            result['cached_stages'].append('sanitize')
+            profiler.mark('sanitize', year)
+        if process_cached is not None:
+            result['aggregates'] = process_cached['aggregates']
+            result['cached_stages'].append('process')
+            profiler.mark('process', year)
+        if entities_cached is not None:
+            result['entities'] = entities_cached
+            result['cached_stages'].append('entities')
+        if sketches_cached is not None:
+            result['sketches'] = sketches_cached
+            result['cached_stages'].append('sketches')
+            sketches = {}
+
+        if (sanitize_cached is not None and process_cached is not None and (entities_cached is not None or not track_entities)
+                and (sketches_cached is not None or not sketches)):
+            # Nothing changed for this year, the CSV does not even need to be parsed
+            return result
+
+        with profiler.stage('extract', year):
+            parquet_path = ensure_parquet(zip_path, csv_member, cache_dir, year, zip_hash) if use_parquet and zip_hash else None
+            csv_path = ensure_extracted_csv(zip_path, csv_member, cache_dir, year, zip_hash) if scan_workers > 1 and zip_hash and not parquet_path else None
+
+        def open_source():
+            return nullcontext(parquet_path) if parquet_path else open_file_in_zip(zip_path, csv_member)
+
+        check_fields = ['CO_ENTIDADE'] if 'CO_ENTIDADE' in cols_to_use else cols_to_use[:3]
+        aggregates = {}
+        df = pd.DataFrame()
+        streamed = bool(chunksize or csv_path)
+        # Streamed modes feed the dedup keys to the out-of-core detector instead of keeping them
+        detector = DuplicateDetector(check_fields, spill_dir=cache_dir) if streamed and sanitize_cached is None else None
+        # Collects the school ids in the same pass over the file
+        collector = EntityCollector() if track_entities and entities_cached is None else None
+        consumers = [c for c in (detector, collector) if c]
+
+        # The scan (parsing, running sums and the consumers) is profiled as the process stage,
+        # except the dedup work, which is timed per chunk as the sanitize stage
+        with profiler.stage('process', year) as scan:
+            def on_chunk(chunk):
+                scan.add_rows(len(chunk))
+                for consumer in consumers:
+                    if consumer is detector:
+                        with profiler.stage('sanitize', year):
+                            consumer.add(chunk)
+                    else:
+                        consumer.add(chunk)
+
+            if csv_path:
+                # Sharded mode: partial sums come back from each worker, dedup keys through spill files
+                print(f">>>>>>>>>> 5) Process CSV Year {year} ({scan_workers} scan workers) <<<<<<<<<<")
+                key_cols = list(dict.fromkeys((detector.key_columns if detector else []) + (collector.columns() if collector else [])))
+                tables = aggregate_csv_sharded(csv_path, list(groupings.values()), value_col=fields, workers=scan_workers,
+                                               columns=cols_to_use, dtype=dtype_plan, key_cols=key_cols or None,
+                                               on_keys=on_chunk if consumers else None, chunksize=chunksize,
+                                               sketches=sketches or None, spill_dir=cache_dir)
+                aggregates = dict(zip(groupings.keys(), tables))
+            elif chunksize:
+                # Streaming mode: only running sums (and spillable dedup keys) are kept in memory
+                print(f">>>>>>>>>> 5) Process CSV Year {year} (chunks of {chunksize} rows) <<<<<<<<<<")
+                consumers.extend(sketches.values())
+                with open_source() as csv_file, \
+                        closing(load_census_csv(csv_file, columns=cols_to_use, chunksize=chunksize, dtype=dtype_plan)) as chunks:
+                    tables = aggregate_in_chunks(chunks, list(groupings.values()), value_col=fields,
+                                                 on_chunk=on_chunk)
+                    aggregates = dict(zip(groupings.keys(), tables))
+            else:
+                with open_source() as csv_file:
+                    df = load_census_csv(csv_file, columns=cols_to_use, dtype=dtype_plan)
+                scan.add_rows(len(df))
+                for consumer in [collector, *sketches.values()]:
+                    if consumer:
+                        consumer.add(df)
+
+        if collector:
+            ids, ufs = collector.finish()
+            if len(ids):
+                result['entities'] = {'ids': ids, 'uf': ufs}
+                save_cached_stage(cache_dir, year, 'entities', entities_key, result['entities'])
+
+        sketches = {name: sketch for name, sketch in sketches.items() if not sketch.empty}
+        if sketches:
+            result['sketches'] = sketches
+            save_cached_stage(cache_dir, year, 'sketches', sketches_key, sketches)
+
+        if sanitize_cached is None and (not df.empty or (detector and detector.rows)):
+            print(f"Checking for duplicates in {year} data...")
+            with profiler.stage('sanitize', year) as run:
+                if detector:
+                    run.add_rows(detector.rows)
+                    report = detector.finish(sample_size=DUPLICATES_LOG_ROWS)
+                    # The detector only kept the keys: a second pass reads the full rows of the
+                    # logged duplicates (up to DUPLICATES_LOG_ROWS), stopping at the last one
+                    # (the chunks are closed while the source is still open)
+                    with nullcontext(csv_path) if csv_path else open_source() as source, \
+                            closing(load_census_csv(source, columns=cols_to_use, chunksize=chunksize or SHARD_CHUNKSIZE,
+                                                    dtype=dtype_plan)) as chunks:
+                        sample_df = fetch_rows(chunks, report['sample']['_row'])
+                    if sample_df is not None:
+                        sample_df = census_typed_codes(sample_df)
+                else:
+                    run.add_rows(len(df))
+                    report, sample_df = fzl_opendata_duplicates_report(df, [c for c in check_fields if c in df.columns],
+                                                                       spill_dir=cache_dir, sample_size=DUPLICATES_LOG_ROWS)
+                    # Same column types as the rows read from the Parquet copy
+                    sample_df = census_typed_codes(sample_df)
+                has_duplicates = fzl_opendata_write_duplicates_json(report, dup_json_dir, year, sample_df)
+            result['duplicates_json'] = dup_json_dir
+            save_cached_stage(cache_dir, year, 'sanitize', sanitize_key, {'has_duplicates': has_duplicates})
+        elif detector:
+            detector.close()
+        
+        if process_cached is None:
+            if not streamed and not df.empty:
+                # 5) Process (Aggregation)
+                print(f">>>>>>>>>> 5) Process CSV Year {year} <<<<<<<<<<")
+                
+                # One wide table per grouping (by year, by state and year, ...)
+                with profiler.stage('process', year):
+                    for name, keys in groupings.items():
+                        aggregates[name] = aggregate_by_year(df, year_col=keys[-1], value_col=fields, group_cols=keys[:-1])
+
+            aggregates = {name: table for name, table in aggregates.items() if not table.empty}
+            if 'year' in aggregates:
+                result['aggregates'] = aggregates
+                save_cached_stage(cache_dir, year, 'process', process_key, {'aggregates': aggregates})
+    else:
+        profiler.mark('sanitize', year, 'skipped')
+        profiler.mark('process', year, 'skipped')
+
+    return result
+
+def run_years(years, workers=1, use_cache=True, chunksize=None, fields=None, group_by=None, use_parquet=False, scan_workers=1,
+              cube_dimensions=None, cube_depth=CUBE_MAX_DEPTH, context_columns=CONTEXT_COLUMNS):
+    """
+    Processes each year, in a process pool when workers > 1.
+    Results are returned in the order of `years` regardless of completion order,
+    so the merge step stays deterministic.
+    """
+    cache_dir = CACHE_DIR if use_cache else None
+    # Options are bound by keyword (process_year only takes them by keyword), so the same
+    # picklable task runs in the worker processes
+    task = partial(process_year, output_dir=ANGULAR_ASSETS_DIR, cache_dir=cache_dir, chunksize=chunksize, fields=fields,
+                   group_by=group_by, use_parquet=use_parquet, scan_workers=scan_workers, cube_dimensions=cube_dimensions,
+                   cube_depth=cube_depth, context_columns=context_columns)
+    args = [(year, os.path.join(DATA_DIR, f"microdados_censo_escolar_{year}.zip")) for year in years]
+    
+    if workers <= 1 or len(args) <= 1:
+        return [task(year, zip_path) for year, zip_path in args]
+    
+    print(f"Processing {len(args)} years with {workers} worker processes...")
+    with ProcessPoolExecutor(max_workers=min(workers, len(args))) as executor:
+        futures = [executor.submit(task, year, zip_path) for year, zip_path in args]
+        return [f.result() for f in futures]
 
-def main():
+
+def main(workers=PIPELINE_WORKERS, use_cache=True, chunksize=CSV_CHUNKSIZE, fields=None, group_by=None, use_parquet=USE_PARQUET_CACHE,
+         download_workers=DOWNLOAD_WORKERS, download_segments=DOWNLOAD_SEGMENTS, refresh_downloads=REFRESH_DOWNLOADS,
+         scan_workers=SCAN_WORKERS, cube_dimensions=None, cube_depth=CUBE_MAX_DEPTH, context_columns=CONTEXT_COLUMNS):
     print("########## Starting Data Analysis Pipeline ##########")
     print("########## for data from INEP School Census ##########")
     
     pipeline_steps = [
         {"id": "download", "label": "Download Datasets", "status": "pending"},
-        {"id": "extract", "label": "Extract Zip Files", "status": "pending"},
+        {"id": "extract", "label": "Locate Zip Members", "status": "pending"},
         {"id": "dictionary", "label": "Search Metadata", "status": "pending"},
         {"id": "sanitize", "label": "Sanitize Data", "status": "pending"},
         {"id": "process", "label": "Process CSVs", "status": "pending"},
@@ -53,112 +440,83 @@ def main():
     if not os.path.exists(DATA_DIR):
         os.makedirs(DATA_DIR)
     
-    all_years_data = []
-    all_states_data = []
-    field_description_text = None
+    fields = list(fields or FIELDS_TO_ANALYZE)
+    group_by = list(group_by if group_by is not None else GROUP_BY_EXTRA)
+    cube_dimensions = list(cube_dimensions if cube_dimensions is not None else CUBE_DIMENSIONS_ENABLED)
+    primary_field = fields[0]
+    groupings = build_groupings(group_by, cube_dimensions, cube_depth)
+    all_aggregates = {name: [] for name in groupings}
+    all_sketches = {}
+    catalog = DictionaryCatalog()
+    entity_index = EntityIndex(os.path.join(CACHE_DIR, 'entities')).load()
+    # Wall/CPU time, peak RSS, bytes read and rows per stage and year, exported in pipeline_graph.json
+    profiler = StageProfiler()
 
     # Step 1: Download
     print(f">>>>>>>>>> 1) Download data <<<<<<<<<<")
-    success_download = True
-    for year, url in DOWNLOAD_URLS.items():
-        zip_path = os.path.join(DATA_DIR, f"microdados_censo_escolar_{year}.zip")
-        if not download_file(url, zip_path, verify_ssl=False):
-            success_download = False
-    pipeline_steps[0]["status"] = "completed" if success_download else "error"
-
-    for year in DOWNLOAD_URLS.keys():
-        print(f"########## Processing Year: {year} ##########")
-        zip_path = os.path.join(DATA_DIR, f"microdados_censo_escolar_{year}.zip")
-        extract_path = os.path.join(TEMP_EXTRACT_DIR, year)
-        
-        # 2) Extract
-        print(f">>>>>>>>>> 2) Extracting Year {year} <<<<<<<<<<")
-        if not os.path.exists(extract_path):
-            extract_zip(zip_path, extract_path)
-        pipeline_steps[1]["status"] = "completed"
-
-        # 3) Dictionary Metadata Listing
-        print(f">>>>>>>>>> 3) Search Dictionary Year {year} <<<<<<<<<<")
-        xlsx_files = []
-        for root, dirs, files in os.walk(extract_path):
-            for file in files:
-                if file.endswith('.xlsx') and 'dicion' in file.lower():
-                    xlsx_files.append(os.path.join(root, file))
-        
-        variable_names = []
-        if xlsx_files:
-            dict_html_path = os.path.join(ANGULAR_ASSETS_DIR, f'dictionary_{year}.html')
-            variable_names = fzl_opendata_list_fields_in_dictionary_excel_file(xlsx_files[0], dict_html_path)
-            
-            # Attempt to fetch description for the analyzed field (if not already found)
-            if not field_description_text:
-                desc = fzl_opendata_get_field_description(xlsx_files[0], FIELD_TO_ANALYZE)
-                if desc:
-                    field_description_text = desc
-                    print(f"Found description for {FIELD_TO_ANALYZE}: {field_description_text}")
-
-        pipeline_steps[2]["status"] = "completed"
-
-        # 4) Sanitize (Duplicate Detection)
-        print(f">>>>>>>>>> 4) Sanitizing Year {year} <<<<<<<<<<")
-        csv_files = []
-        for root, dirs, files in os.walk(extract_path):
-            for file in files:
-                if file.lower().endswith('.csv') and 'microdados_ed_basica' in file.lower():
-                    csv_files.append(os.path.join(root, file))
-        
-        if csv_files:
-            # Clean variables from dictionary to match CSV headers
-            clean_vars = [v.strip().upper() for v in variable_names]
-            cols_to_use = clean_vars[:10] if clean_vars else []
-            
-            # Ensure Essential Columns
-            required_cols = ['NU_ANO_CENSO', 'NO_UF', FIELD_TO_ANALYZE]
-            for c in required_cols:
-                if c not in cols_to_use: cols_to_use.append(c)
-            
-            # Use 'CO_ENTIDADE' for deduplication if possible
-            if 'CO_ENTIDADE' in clean_vars and 'CO_ENTIDADE' not in cols_to_use:
-                cols_to_use.append('CO_ENTIDADE')
-
-            df = load_census_csv(csv_files[0], columns=cols_to_use)
-            if not df.empty:
-                dup_html_path = os.path.join(ANGULAR_ASSETS_DIR, f'duplicates_{year}.html')
-                check_fields = ['CO_ENTIDADE'] if 'CO_ENTIDADE' in df.columns else cols_to_use[:3]
-                fzl_opendata_detect_duplicate_records(df, check_fields, dup_html_path, year)
-                
-                # 5) Process (Aggregation)
-                print(f">>>>>>>>>> 5) Process CSV Year {year} <<<<<<<<<<")
-                
-                # By Year
-                agg_year = aggregate_by_year(df, value_col=FIELD_TO_ANALYZE)
-                all_years_data.append(agg_year)
-                
-                # By State (NO_UF)
-                if 'NO_UF' in df.columns:
-                    # Convert to numeric first to ensure sum works
-                    df[FIELD_TO_ANALYZE] = pd.to_numeric(df[FIELD_TO_ANALYZE], errors='coerce').fillna(0)
-                    # Group by both UF and Year to allow clustering
-                    agg_state = df.groupby(['NO_UF', 'NU_ANO_CENSO'])[FIELD_TO_ANALYZE].sum().reset_index()
-                    all_states_data.append(agg_state)
-        
-        pipeline_steps[3]["status"] = "completed"
-        pipeline_steps[4]["status"] = "completed"
+    downloads = [(url, os.path.join(DATA_DIR, f"microdados_censo_escolar_{year}.zip"))
+                 for year, url in DOWNLOAD_URLS.items()]
+    with profiler.stage('download') as run:
+        results = download_files(downloads, max_workers=download_workers, segments=download_segments, verify_ssl=False,
+                                 revalidate=refresh_downloads)
+        run.status = "completed" if all(results) else "error"
+    pipeline_steps[0]["status"] = run.status
 
-    if all_years_data:
-        # Final Aggregation
-        final_df_year = pd.concat(all_years_data).groupby('NU_ANO_CENSO')[FIELD_TO_ANALYZE].sum().reset_index()
+    years = sorted(DOWNLOAD_URLS.keys())
+    for result in run_years(years, workers=workers, use_cache=use_cache, chunksize=chunksize, fields=fields, group_by=group_by, use_parquet=use_parquet, scan_workers=scan_workers,
+                            cube_dimensions=cube_dimensions, cube_depth=cube_depth, context_columns=context_columns):
+        for name, table in result['aggregates'].items():
+            all_aggregates[name].append(table)
+        catalog.add(result['year'], result['dictionary_fields'])
+        for name, sketch in (result.get('sketches') or {}).items():
+            # Groups include the year, so merging years keeps one entry per group and year
+            all_sketches.setdefault(name, sketch.empty_copy()).merge(sketch)
+        if result.get('entities'):
+            entity_index.add_year(result['year'], result['entities']['ids'], result['entities']['uf'])
+        profiler.merge(result['profile'])
+
+    # Search index over the variables of every year's dictionary
+    if catalog.years():
+        with profiler.stage('dictionary'):
+            fzl_opendata_write_dictionary_search_index({year: catalog.fields(year) for year in catalog.years()},
+                                                       os.path.join(ANGULAR_ASSETS_DIR, 'dictionary', 'search_index.json'))
+
+    # Persist the cross-year school index (years processed in earlier runs stay in it)
+    with profiler.stage('process'):
+        if entity_index.years():
+            entity_index.save()
+        school_churn = entity_index.churn_summary()
+
+    # Description of the analyzed field, from the first year whose dictionary has it
+    field_description_text = catalog.describe(primary_field)
+    if field_description_text:
+        print(f"Found description for {primary_field}: {field_description_text}")
+
+    for step in pipeline_steps[1:5]:
+        step["status"] = "completed"
+
+    if all_aggregates['year']:
+        # Final Aggregation: one wide table (all metrics) per grouping
+        final_tables = {}
+        with profiler.stage('process'):
+            for name, tables in all_aggregates.items():
+                if tables:
+                    merged = pd.concat(tables)
+                    metric_cols = [f for f in fields if f in merged.columns]
+                    final_tables[name] = merged.groupby(groupings[name])[metric_cols].sum().reset_index()
+
+        final_df_year = final_tables['year'][['NU_ANO_CENSO', primary_field]]
         
         final_df_state = pd.DataFrame()
-        if all_states_data:
-            # Aggregate again just in case, keeping Year for clustering
-            final_df_state = pd.concat(all_states_data).groupby(['NO_UF', 'NU_ANO_CENSO'])[FIELD_TO_ANALYZE].sum().reset_index()
+        if 'state' in final_tables:
+            # Keeping Year for clustering
+            final_df_state = final_tables['state'][['NO_UF', 'NU_ANO_CENSO', primary_field]]
         
         # 6) Visualize
         print(f">>>>>>>>>> 6) Generate Visualization <<<<<<<<<<")
-        chart_output = os.path.join(ANGULAR_ASSETS_DIR, 'student_count_by_year.html')
+        chart_output = os.path.join(ANGULAR_ASSETS_DIR, 'dashboard.json')
         
-        chart_title = f"Total Students: {FIELD_TO_ANALYZE}"
+        chart_title = f"Total Students: {primary_field}"
         if field_description_text:
             chart_title += f" - {field_description_text}"
         chart_title += " (INEP Census)"
@@ -168,7 +526,7 @@ def main():
             'Por Ano': {
                 'df': final_df_year,
                 'x_col': 'NU_ANO_CENSO',
-                'y_col': FIELD_TO_ANALYZE,
+                'y_col': primary_field,
                 'x_label': 'Ano do Censo'
             }
         }
@@ -177,33 +535,116 @@ def main():
             data_views['Por Estado'] = {
                 'df': final_df_state,
                 'x_col': 'NO_UF',
-                'y_col': FIELD_TO_ANALYZE,
+                'y_col': primary_field,
                 'x_label': 'Unidade da FederaÃ§Ã£o',
                 'cluster_col': 'NU_ANO_CENSO' # Trigger clustered chart
             }
 
-        generate_interactive_dashboard(data_views, chart_title, chart_output)
+        if len(school_churn) > 1:
+            # Schools that appeared, disappeared or changed UF since the previous census
+            movements = {'new': 'Novas', 'closed': 'Encerradas', 'changed_uf': 'Mudaram de UF'}
+            churn_df = pd.DataFrame([
+                {'NU_ANO_CENSO': r['year'], 'Movimento': label, 'Escolas': r[key]}
+                for r in school_churn[1:] for key, label in movements.items()
+            ])
+            data_views['Escolas: Entradas e Saídas'] = {
+                'df': churn_df,
+                'x_col': 'NU_ANO_CENSO',
+                'y_col': 'Escolas',
+                'x_label': 'Ano do Censo',
+                'cluster_col': 'Movimento'
+            }
+
+        with profiler.stage('visualize'):
+            generate_interactive_dashboard(data_views, chart_title, chart_output)
         pipeline_steps[5]["status"] = "completed"
         
         # 7) Export
         print(f">>>>>>>>>> 7) Export JSON <<<<<<<<<<")
-        json_output = os.path.join(ANGULAR_ASSETS_DIR, 'summary_stats.json')
-        json_data = final_df_year.rename(columns={'NU_ANO_CENSO': 'year', FIELD_TO_ANALYZE: 'student_count'}).to_dict(orient='records')
-        export_to_json(json_data, json_output)
-        
-        graph_output = os.path.join(ANGULAR_ASSETS_DIR, 'pipeline_graph.json')
-        export_to_json(pipeline_steps, graph_output)
+        with profiler.stage('export'):
+            json_output = os.path.join(ANGULAR_ASSETS_DIR, 'summary_stats.json')
+            json_data = final_df_year.rename(columns={'NU_ANO_CENSO': 'year', primary_field: 'student_count'}).to_dict(orient='records')
+            export_to_json(json_data, json_output)
+
+            # Wide tables with every analyzed metric, one file per grouping
+            for name, table in final_tables.items():
+                if not is_cuboid(name):
+                    export_to_json(table.to_dict(orient='records'), os.path.join(ANGULAR_ASSETS_DIR, f'indicators_by_{name}.json'))
+
+            # Drill-down cube: one static file per cuboid, fetched on demand by the frontend
+            if cube_dimensions:
+                cuboids = {name: table for name, table in final_tables.items() if is_cuboid(name)}
+                export_cube(cuboids, os.path.join(ANGULAR_ASSETS_DIR, 'cube'), fields, year_table=final_tables['year'],
+                            catalog=catalog)
+
+            # Per-school distributions and top schools, one file per sketch grouping
+            for name, sketch in all_sketches.items():
+                export_to_json(sketch.to_json(), os.path.join(ANGULAR_ASSETS_DIR, f'school_stats_by_{name}.json'))
+
+            if school_churn:
+                export_to_json(school_churn, os.path.join(ANGULAR_ASSETS_DIR, 'school_churn.json'))
+
+            # Export available years for frontend dropdowns
+            years_output = os.path.join(ANGULAR_ASSETS_DIR, 'available_years.json')
+            # Use sorted keys from processed years
+            processed_years = sorted(list(DOWNLOAD_URLS.keys()))
+            export_to_json(processed_years, years_output)
         pipeline_steps[6]["status"] = "completed"
-        
-        # Export available years for frontend dropdowns
-        years_output = os.path.join(ANGULAR_ASSETS_DIR, 'available_years.json')
-        # Use sorted keys from processed years
-        processed_years = sorted(list(DOWNLOAD_URLS.keys()))
-        export_to_json(processed_years, years_output)
+
+        # Steps extended with the stage profile: totals, one entry per year and the bottleneck
+        graph_output = os.path.join(ANGULAR_ASSETS_DIR, 'pipeline_graph.json')
+        export_to_json(profiler.pipeline_graph(pipeline_steps), graph_output)
+
+        # Content-hashed copies of every data file plus the manifest the frontend resolves them with
+        publish_content_hashed_assets(ANGULAR_ASSETS_DIR)
         
         print("--- Pipeline Completed Successfully ---")
     else:
+        # A failed run must not look successful to CI, which would publish an empty dashboard
         print("No data was processed.")
+        sys.exit(1)
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="INEP School Census data analysis pipeline")
+    parser.add_argument('--workers', type=int, default=PIPELINE_WORKERS,
+                        help="worker processes for per-year processing (default: %(default)s)")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="ignore the per-year stage cache and recompute every stage")
+    parser.add_argument('--chunksize', type=int, default=CSV_CHUNKSIZE,
+                        help="stream the census CSV in chunks of this many rows, 0 to load the whole file (default: %(default)s)")
+    parser.add_argument('--fields', default=','.join(FIELDS_TO_ANALYZE),
+                        help="comma separated QT_* metrics to sum in one pass (first one is charted)")
+    parser.add_argument('--group-by', default=','.join(GROUP_BY_EXTRA),
+                        help="comma separated extra keys for the detailed table (e.g. TP_DEPENDENCIA)")
+    parser.add_argument('--cube-dimensions', default=','.join(CUBE_DIMENSIONS_ENABLED),
+                        help="comma separated dimensions of the drill-down cube, empty to skip it (default: %(default)s)")
+    parser.add_argument('--cube-depth', type=int, default=CUBE_MAX_DEPTH,
+                        help="largest number of dimensions combined in one cuboid (default: %(default)s)")
+    parser.add_argument('--no-parquet', action='store_true',
+                        help="always parse the CSV from the zip instead of the Parquet cache")
+    parser.add_argument('--scan-workers', type=int, default=SCAN_WORKERS,
+                        help="processes scanning shards of one year's extracted CSV, used with --no-parquet (default: %(default)s)")
+    parser.add_argument('--context-columns', type=int, default=CONTEXT_COLUMNS,
+                        help="leading dictionary columns read for context in the duplicates log (default: %(default)s)")
+    parser.add_argument('--download-workers', type=int, default=DOWNLOAD_WORKERS,
+                        help="zips downloaded concurrently (default: %(default)s)")
+    parser.add_argument('--download-segments', type=int, default=DOWNLOAD_SEGMENTS,
+                        help="parallel byte ranges per zip, 1 = single connection (default: %(default)s)")
+    parser.add_argument('--refresh-downloads', action='store_true', default=REFRESH_DOWNLOADS,
+                        help="revalidate existing zips with the server and refetch the ones that changed")
+    args = parser.parse_args()
+    main(
+        workers=args.workers,
+        use_cache=not args.no_cache,
+        chunksize=args.chunksize,
+        fields=[f.strip().upper() for f in args.fields.split(',') if f.strip()],
+        group_by=[g.strip().upper() for g in args.group_by.split(',') if g.strip()],
+        use_parquet=not args.no_parquet,
+        download_workers=args.download_workers,
+        download_segments=args.download_segments,
+        refresh_downloads=args.refresh_downloads,
+        scan_workers=args.scan_workers,
+        cube_dimensions=[d.strip().upper() for d in args.cube_dimensions.split(',') if d.strip()],
+        cube_depth=args.cube_depth,
+        context_columns=args.context_columns
+    )
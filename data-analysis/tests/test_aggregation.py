@@ -0,0 +1,50 @@
+import io
+import pandas as pd
+import pytest
+
+from fzl_opendata_censoeducacaoinep import aggregate_by_year, aggregate_in_chunks, load_census_csv
+
+# QT_* counts as the dictionary plan reads them (Tamanho 4 -> UInt16)
+NARROW_PLAN = {'NU_ANO_CENSO': 'UInt16', 'NO_UF': 'category', 'QT_MAT_ESP': 'UInt16'}
+
+def census_csv(rows_per_year, years=(2022, 2023), value=30):
+    lines = ['NU_ANO_CENSO;NO_UF;QT_MAT_ESP']
+    for year in years:
+        lines += [f"{year};{'SP' if i % 3 else 'RJ'};{value if i % 10 else ''}" for i in range(rows_per_year)]
+    return ('\n'.join(lines) + '\n').encode('latin1')
+
+def test_chunked_sums_match_full_load_above_uint16_range():
+    data = census_csv(60000)
+    full = load_census_csv(io.BytesIO(data), dtype=NARROW_PLAN)
+    assert str(full['QT_MAT_ESP'].dtype) == 'UInt16'
+
+    groupings = [['NU_ANO_CENSO'], ['NO_UF', 'NU_ANO_CENSO']]
+    chunks = load_census_csv(io.BytesIO(data), dtype=NARROW_PLAN, chunksize=7000)
+    chunked = aggregate_in_chunks(chunks, groupings)
+
+    expected = 30 * 54000
+    assert chunked[0]['QT_MAT_ESP'].tolist() == [expected, expected]
+    for table, keys in zip(chunked, groupings):
+        loaded = aggregate_by_year(full, year_col=keys[-1], group_cols=keys[:-1])
+        pd.testing.assert_frame_equal(table, loaded, check_dtype=False)
+        assert table['QT_MAT_ESP'].max() > 65535
+
+def test_aggregate_by_year_does_not_wrap_narrow_counts():
+    df = pd.DataFrame({'NU_ANO_CENSO': [2023] * 3, 'QT_MAT_ESP': pd.array([60000, 60000, 1], dtype='UInt16')})
+    assert aggregate_by_year(df)['QT_MAT_ESP'].tolist() == [120001]
+
+def test_chunked_load_falls_back_when_a_later_chunk_does_not_fit_the_plan():
+    # A fractional count only shows up after the first chunks were already summed
+    data = census_csv(5000, value=30) + b'2023;SP;2.5\n'
+    chunks = load_census_csv(io.BytesIO(data), dtype=NARROW_PLAN, chunksize=1000)
+    by_year = aggregate_in_chunks(chunks, [['NU_ANO_CENSO']])[0]
+
+    assert by_year['QT_MAT_ESP'].tolist() == [30 * 4500, 30 * 4500 + 2.5]
+
+def test_aggregate_in_chunks_propagates_read_errors():
+    def failing_chunks():
+        yield pd.DataFrame({'NU_ANO_CENSO': [2023], 'QT_MAT_ESP': [1]})
+        raise OSError("truncated zip member")
+
+    with pytest.raises(OSError):
+        aggregate_in_chunks(failing_chunks(), [['NU_ANO_CENSO']])
@@ -0,0 +1,44 @@
+import hashlib
+import json
+import os
+import pandas as pd
+
+from fzl_statistics_utils import (ASSET_MANIFEST, HASHED_ASSETS_DIR, export_paged_json, export_to_json,
+                                  publish_content_hashed_assets, published_asset_path)
+
+def _files(assets_dir):
+    return sorted(os.path.relpath(os.path.join(root, name), assets_dir).replace(os.sep, '/')
+                  for root, _, names in os.walk(assets_dir) for name in names)
+
+def test_files_are_moved_to_content_hashed_names(tmp_path):
+    export_to_json([{'year': 2023}], str(tmp_path / 'summary_stats.json'))
+    export_paged_json(pd.DataFrame({'a': range(3)}), str(tmp_path / 'duplicates' / '2023'), page_size=2, compress=('gzip',))
+
+    files = publish_content_hashed_assets(str(tmp_path))['files']
+
+    assert sorted(files) == ['duplicates/2023/manifest.json', 'duplicates/2023/page-0000.json',
+                             'duplicates/2023/page-0001.json', 'summary_stats.json']
+    for logical, hashed in files.items():
+        content = (tmp_path / hashed).read_bytes()
+        stem, ext = os.path.splitext(os.path.basename(logical))
+        assert hashed == f"{HASHED_ASSETS_DIR}/{stem}.{hashlib.sha256(content).hexdigest()[:16]}{ext}"
+    # Only the manifest keeps a logical name; precompressed copies follow their page
+    assert [f for f in _files(tmp_path) if not f.startswith(HASHED_ASSETS_DIR + '/')] == [ASSET_MANIFEST]
+    assert (tmp_path / (files['duplicates/2023/page-0000.json'] + '.gz')).exists()
+
+def test_untouched_folders_keep_their_entries_and_rewritten_ones_drop_stale_files(tmp_path):
+    export_paged_json(pd.DataFrame({'a': range(3)}), str(tmp_path / 'duplicates' / '2022'), page_size=2)
+    export_paged_json(pd.DataFrame({'a': range(3)}), str(tmp_path / 'duplicates' / '2023'), page_size=2)
+    first = publish_content_hashed_assets(str(tmp_path))['files']
+    assert published_asset_path(str(tmp_path), 'duplicates/2022/manifest.json') == str(tmp_path / first['duplicates/2022/manifest.json'])
+
+    # Next run: 2022 comes from the stage cache, 2023 is rewritten with a single page
+    export_paged_json(pd.DataFrame({'a': [7]}), str(tmp_path / 'duplicates' / '2023'), page_size=2)
+    second = publish_content_hashed_assets(str(tmp_path))['files']
+
+    assert {k: v for k, v in second.items() if '/2022/' in k} == {k: v for k, v in first.items() if '/2022/' in k}
+    assert 'duplicates/2023/page-0001.json' not in second
+    assert sorted(os.listdir(tmp_path / HASHED_ASSETS_DIR)) == sorted({os.path.basename(h) for h in second.values()})
+    with open(tmp_path / ASSET_MANIFEST, encoding='utf-8') as f:
+        assert json.load(f)['files'] == second
+    assert published_asset_path(str(tmp_path), 'duplicates/2023/page-0001.json') is None
@@ -0,0 +1,35 @@
+import json
+
+import benchmark
+
+def test_benchmarks_run_on_a_small_synthetic_census(tmp_path):
+    output = tmp_path / 'results.json'
+    report, regressions = benchmark.main(rows=2000, repeat=1, work_dir=str(tmp_path / 'work'), output=str(output))
+
+    assert regressions == {}
+    assert json.loads(output.read_text()) == report
+    assert set(report['benchmarks']) == set(benchmark.BENCHMARKS)
+    for name, result in report['benchmarks'].items():
+        assert len(result['runs_s']) == 1, name
+        # The dashboard benchmark counts the rows of the aggregated views instead
+        if name != 'generate_interactive_dashboard':
+            assert result['rows'] == 2000, name
+    assert report['params']['rows'] == 2000
+
+    # A second run reuses the generated zip and compares against the first one
+    rerun, _ = benchmark.main(rows=2000, repeat=1, names=['dedup'], work_dir=str(tmp_path / 'work'),
+                              output=str(tmp_path / 'rerun.json'), baseline=str(output), tolerance=1000)
+    assert rerun['input_bytes'] == report['input_bytes']
+    assert 'baseline_ratio' in rerun['benchmarks']['dedup']
+
+def test_compare_with_baseline_flags_slower_benchmarks():
+    params = {'rows': 10}
+    baseline = {'params': params, 'benchmarks': {'dedup': {'best_s': 1.0}, 'aggregate_by_year': {'best_s': 1.0}}}
+    report = {'params': params, 'benchmarks': {'dedup': {'best_s': 1.2}, 'aggregate_by_year': {'best_s': 1.5},
+                                               'load_census_csv': {'best_s': 9.0}}}
+
+    regressions = benchmark.compare_with_baseline(report, baseline, tolerance=0.25)
+
+    assert regressions == {'aggregate_by_year': {'baseline_s': 1.0, 'best_s': 1.5, 'ratio': 1.5}}
+    assert report['benchmarks']['dedup']['baseline_ratio'] == 1.2
+    assert 'baseline_ratio' not in report['benchmarks']['load_census_csv']
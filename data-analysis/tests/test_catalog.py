@@ -0,0 +1,42 @@
+import io
+import pandas as pd
+
+import fzl_opendata_catalog
+from fzl_opendata_catalog import DictionaryCatalog
+from fzl_synthetic_census import write_synthetic_dictionary_xlsx
+
+def _fields(*rows):
+    return pd.DataFrame([{'Nome da Variável': name, 'Descrição da Variável': desc, 'Tipo': 'Num', 'Categoria': None,
+                          'Tamanho': 4} for name, desc in rows])
+
+def test_get_and_years_with_across_years():
+    catalog = DictionaryCatalog()
+    catalog.add(2022, _fields(('QT_MAT_ESP', 'Matrículas (2022)'), ('IN_AGUA', 'Água')))
+    catalog.add('2023', _fields((' qt_mat_esp ', 'Matrículas (2023)'), ('QT_DOC_ESP', None)))
+
+    assert catalog.years() == ['2022', '2023']
+    assert catalog.years_with('qt_mat_esp') == ['2022', '2023']
+    assert catalog.years_with('QT_DOC_ESP') == ['2023']
+    assert catalog.years_with('QT_INEXISTENTE') == []
+
+    # Without a year the first year that has the variable answers
+    assert catalog.get('QT_MAT_ESP')['Descrição da Variável'] == 'Matrículas (2022)'
+    assert catalog.get('QT_MAT_ESP', 2023)['Descrição da Variável'] == 'Matrículas (2023)'
+    assert catalog.get('IN_AGUA', '2023') is None
+    assert catalog.get('QT_INEXISTENTE') is None
+    assert catalog.describe('QT_DOC_ESP') is None
+    assert catalog.variable_names(2023) == ['QT_MAT_ESP', 'QT_DOC_ESP']
+
+def test_parsed_workbooks_come_from_the_disk_cache(tmp_path, monkeypatch):
+    workbook = io.BytesIO()
+    write_synthetic_dictionary_xlsx(_fields(('QT_MAT_ESP', 'Matrículas'), ('IN_AGUA', 'Água')), workbook)
+    first = DictionaryCatalog(str(tmp_path)).load(2023, workbook)
+
+    calls = []
+    read = fzl_opendata_catalog.fzl_opendata_read_dictionary_fields
+    monkeypatch.setattr(fzl_opendata_catalog, 'fzl_opendata_read_dictionary_fields',
+                        lambda path: calls.append(path) or read(path))
+    catalog = DictionaryCatalog(str(tmp_path))
+    pd.testing.assert_frame_equal(catalog.load(2023, workbook), first)
+    assert calls == []
+    assert catalog.describe('IN_AGUA') == 'Água'
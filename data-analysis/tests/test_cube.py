@@ -0,0 +1,25 @@
+import json
+
+import pandas as pd
+
+from fzl_cube_utils import cube_groupings, export_cube
+
+def test_municipality_cuboids_are_keyed_by_state():
+    groupings = cube_groupings()
+    for name, keys in groupings.items():
+        if 'NO_MUNICIPIO' in keys:
+            assert keys.index('NO_UF') < keys.index('NO_MUNICIPIO'), name
+    assert 'cube:NO_MUNICIPIO' not in groupings
+
+def test_coded_dimensions_match_between_text_and_integer_input(tmp_path):
+    rows = {'TP_DEPENDENCIA': ['2', '1', '4'], 'NU_ANO_CENSO': [2023] * 3, 'QT_MAT_ESP': [5, 7, 9]}
+    as_text = pd.DataFrame(rows).astype({'TP_DEPENDENCIA': 'category'})
+    as_int = pd.DataFrame(rows).astype({'TP_DEPENDENCIA': 'UInt8'})
+
+    exported = []
+    for mode, table in (('csv', as_text), ('parquet', as_int)):
+        export_cube({'cube:TP_DEPENDENCIA': table}, tmp_path / mode, ['QT_MAT_ESP'])
+        exported.append(json.loads((tmp_path / mode / 'TP_DEPENDENCIA.json').read_text()))
+
+    assert exported[0] == exported[1]
+    assert exported[0]['dictionaries']['TP_DEPENDENCIA'] == [1, 2, 4]
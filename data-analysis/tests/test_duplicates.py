@@ -0,0 +1,43 @@
+import json
+
+import pandas as pd
+
+from fzl_dedup_utils import DuplicateDetector, fetch_rows
+from fzl_opendata_censoeducacaoinep import census_typed_codes
+from fzl_opendata_utils import fzl_opendata_duplicates_report
+
+def test_csv_codes_are_exported_as_parquet_ints():
+    csv_rows = pd.DataFrame({
+        'NO_UF': pd.Series(['Bahia', 'Pará'], dtype='category'),
+        'CO_REGIAO': pd.Series(['2', '1'], dtype='category'),
+        'TP_DEPENDENCIA': pd.Series(['3', None], dtype='category'),
+        'IN_AGUA_POTAVEL': pd.Series([True, False], dtype='boolean'),
+        'CO_ENTIDADE': pd.Series([10049, 10049], dtype='UInt32'),
+        'NU_TELEFONE': ['3333-0000', None]
+    })
+    typed = census_typed_codes(csv_rows)
+
+    assert json.loads(typed.to_json(orient='values')) == [
+        ['Bahia', 2, 3, 1, 10049, '3333-0000'],
+        ['Pará', 1, None, 0, 10049, None]
+    ]
+
+def test_streamed_duplicates_log_the_same_rows_as_a_full_load():
+    schools = pd.DataFrame({
+        'CO_ENTIDADE': [i if i < 700 else i - 300 for i in range(1000)],
+        'NO_ENTIDADE': [f'Escola {i}' for i in range(1000)],
+        'QT_MAT_ESP': range(1000)
+    })
+    _, expected = fzl_opendata_duplicates_report(schools, ['CO_ENTIDADE'], sample_size=50)
+
+    chunks = [schools.iloc[start:start + 128] for start in range(0, len(schools), 128)]
+    detector = DuplicateDetector(['CO_ENTIDADE'])
+    for chunk in chunks:
+        detector.add(chunk)
+    report = detector.finish(sample_size=50)
+    read = []
+    logged = fetch_rows((read.append(chunk) or chunk for chunk in chunks), report['sample']['_row'])
+
+    pd.testing.assert_frame_equal(logged, expected.reset_index(drop=True))
+    # Rows 400-449 are the first 50 duplicates, so the pass stops with the chunk of rows 384-511
+    assert len(read) == 4
@@ -0,0 +1,35 @@
+import numpy as np
+import pandas as pd
+
+from fzl_entity_index import EntityCollector, EntityIndex
+
+def _collect(*chunks):
+    collector = EntityCollector()
+    for chunk in chunks:
+        collector.add(pd.DataFrame(chunk))
+    return collector.finish()
+
+def test_churn_summary_against_the_previous_year(tmp_path):
+    index = EntityIndex(str(tmp_path))
+    # 2021: schools 1-4; 2022: 3 closed, 5 opened, 2 moved from SP to RJ; 2023: same schools as 2022
+    index.add_year(2021, *_collect({'CO_ENTIDADE': [4, 1, 2], 'NO_UF': ['SP', 'SP', 'SP']},
+                                   {'CO_ENTIDADE': [3, 1], 'NO_UF': ['RJ', 'SP']}))
+    index.add_year(2022, *_collect({'CO_ENTIDADE': ['1', '2', 'x', '4', '5'], 'NO_UF': ['SP', 'RJ', 'SP', 'SP', 'MG']}))
+    index.add_year(2023, *_collect({'CO_ENTIDADE': [5, 4, 2, 1], 'NO_UF': ['MG', 'SP', 'RJ', 'SP']}))
+
+    assert index.churn_summary() == [
+        {'year': '2021', 'total': 4, 'new': 0, 'closed': 0, 'retained': 0, 'changed_uf': 0},
+        {'year': '2022', 'total': 4, 'new': 1, 'closed': 1, 'retained': 3, 'changed_uf': 1},
+        {'year': '2023', 'total': 4, 'new': 0, 'closed': 0, 'retained': 4, 'changed_uf': 0},
+    ]
+    assert index.changed_attribute(2022).tolist() == [2]
+    assert index.attribute(2022, [2, 5]).tolist() == ['RJ', 'MG']
+    assert index.present_in_all().tolist() == [1, 2, 4]
+
+    index.save()
+    reloaded = EntityIndex(str(tmp_path)).load()
+    assert reloaded.churn_summary() == index.churn_summary()
+    assert np.array_equal(reloaded.ids(2021), [1, 2, 3, 4])
+
+def test_churn_summary_of_an_empty_index(tmp_path):
+    assert EntityIndex(str(tmp_path)).load().churn_summary() == []
@@ -0,0 +1,154 @@
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import fzl_http_utils
+from fzl_http_utils import download_file
+
+PAYLOAD = bytes(range(256)) * (4 * 4096)  # 4MB
+
+class RangeHandler(BaseHTTPRequestHandler):
+    """
+    Serves server.payload (tagged server.etag) with Range, If-Range and If-None-Match support.
+    While server.cut_after is set, every GET stops after that many bytes and drops the
+    connection, like a download interrupted midway.
+    """
+
+    def log_message(self, *args):
+        pass
+
+    def _headers(self, status, start, end):
+        self.send_response(status)
+        self.send_header('Content-Length', str(end - start + 1))
+        self.send_header('Accept-Ranges', 'bytes')
+        self.send_header('ETag', self.server.etag)
+        if status == 206:
+            self.send_header('Content-Range', f'bytes {start}-{end}/{len(self.server.payload)}')
+        self.end_headers()
+
+    def _range(self):
+        header = self.headers.get('Range')
+        if_range = self.headers.get('If-Range')
+        if not header or (if_range and if_range != self.server.etag):
+            return 200, 0, len(self.server.payload) - 1
+        first, last = header.split('=', 1)[1].split('-')
+        return 206, int(first), int(last) if last else len(self.server.payload) - 1
+
+    def do_HEAD(self):
+        self._headers(200, 0, len(self.server.payload) - 1)
+
+    def do_GET(self):
+        with self.server.lock:
+            self.server.ranges.append(self.headers.get('Range'))
+            self.server.conditions.append((self.headers.get('If-None-Match'), self.headers.get('If-Range')))
+        if self.headers.get('If-None-Match') == self.server.etag:
+            self.send_response(304)
+            self.send_header('ETag', self.server.etag)
+            self.end_headers()
+            return
+        status, start, end = self._range()
+        self._headers(status, start, end)
+        body = self.server.payload[start:end + 1]
+        if self.server.cut_after is not None and len(body) > self.server.cut_after:
+            self.wfile.write(body[:self.server.cut_after])
+            self.wfile.flush()
+            self.close_connection = True
+            return
+        self.wfile.write(body)
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), RangeHandler)
+    httpd.daemon_threads = True
+    httpd.lock = threading.Lock()
+    httpd.ranges = []
+    httpd.conditions = []
+    httpd.payload = PAYLOAD
+    httpd.etag = '"payload-v1"'
+    httpd.cut_after = None
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+def _change_payload(server):
+    server.payload = bytes(reversed(PAYLOAD))
+    server.etag = '"payload-v2"'
+
+def _download(server, dest, **kwargs):
+    url = f'http://127.0.0.1:{server.server_address[1]}/census.zip'
+    return download_file(url, str(dest), progress_hook=None, timeout=10, **kwargs)
+
+def test_segmented_download_fetches_byte_ranges(server, tmp_path):
+    dest = tmp_path / 'census.zip'
+    assert _download(server, dest, segments=4)
+
+    assert dest.read_bytes() == PAYLOAD
+    quarter = len(PAYLOAD) // 4
+    assert sorted(server.ranges) == sorted(f'bytes={i * quarter}-{(i + 1) * quarter - 1}' for i in range(4))
+    assert not os.path.exists(f'{dest}.part.json')
+
+def test_interrupted_segmented_download_resumes_each_range(server, tmp_path, monkeypatch):
+    # No throttled save happens within the test, so the progress on disk comes from the final save
+    monkeypatch.setattr(fzl_http_utils, 'SEGMENT_STATE_INTERVAL', 3600)
+    dest = tmp_path / 'census.zip'
+    server.cut_after = 600 * 1024
+    assert not _download(server, dest, segments=4, retries=0)
+
+    with open(f'{dest}.part.json', 'r', encoding='utf-8') as f:
+        segments = json.load(f)['segments']
+    assert all(0 < done < end - start + 1 for start, end, done in segments)
+
+    server.ranges.clear()
+    server.cut_after = None
+    assert _download(server, dest, segments=4)
+
+    assert dest.read_bytes() == PAYLOAD
+    assert sorted(server.ranges) == sorted(f'bytes={start + done}-{end}' for start, end, done in segments)
+
+def test_revalidation_skips_an_unchanged_file_and_fetches_a_changed_one(server, tmp_path):
+    dest = tmp_path / 'census.zip'
+    metrics = []
+    assert _download(server, dest)
+    assert json.loads((tmp_path / 'census.zip.http.json').read_text())['etag'] == '"payload-v1"'
+
+    server.conditions.clear()
+    assert _download(server, dest, revalidate=True, metrics_hook=metrics.append)
+    assert metrics[-1]['status'] == 'not_modified'
+    assert server.conditions == [('"payload-v1"', None)]
+
+    _change_payload(server)
+    assert _download(server, dest, revalidate=True, metrics_hook=metrics.append)
+    assert metrics[-1]['status'] == 'downloaded'
+    assert dest.read_bytes() == server.payload
+
+def test_resume_sends_if_range_with_the_etag_of_the_partial_data(server, tmp_path):
+    dest = tmp_path / 'census.zip'
+    server.cut_after = 2 * 1024 * 1024 + 1000
+    assert not _download(server, dest, retries=0)
+    partial = os.path.getsize(f'{dest}.part')
+    assert partial
+
+    server.cut_after = None
+    server.conditions.clear()
+    assert _download(server, dest)
+    assert dest.read_bytes() == PAYLOAD
+    assert server.ranges[-1] == f'bytes={partial}-'
+    assert server.conditions[-1] == (None, '"payload-v1"')
+
+def test_partial_data_of_a_changed_file_is_not_resumed(server, tmp_path):
+    dest = tmp_path / 'census.zip'
+    server.cut_after = 2 * 1024 * 1024 + 1000
+    assert not _download(server, dest, retries=0)
+    assert os.path.getsize(f'{dest}.part')
+
+    _change_payload(server)
+    server.cut_after = None
+    server.ranges.clear()
+    assert _download(server, dest)
+    assert dest.read_bytes() == server.payload
+    assert server.ranges[-1] is None
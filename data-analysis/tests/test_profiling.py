@@ -0,0 +1,69 @@
+import types
+
+import pytest
+
+import fzl_profiling_utils
+from fzl_profiling_utils import StageProfiler
+
+@pytest.fixture
+def clock(monkeypatch):
+    """
+    Wall clock of the profiler, advanced by hand so stage times are exact.
+    """
+    now = [0.0]
+    monkeypatch.setattr(fzl_profiling_utils, 'time', types.SimpleNamespace(perf_counter=lambda: now[0]))
+
+    def advance(seconds):
+        now[0] += seconds
+    return advance
+
+def test_nested_stages_report_their_own_time(clock):
+    profiler = StageProfiler()
+    with profiler.stage('scan', 2023) as scan:
+        clock(1.0)
+        for _ in range(3):
+            with profiler.stage('dedup', 2023) as dedup:
+                clock(2.0)
+                dedup.add_rows(10)
+        scan.add_rows(30)
+        clock(0.5)
+
+    scan_record = profiler.record('scan', 2023)
+    dedup_record = profiler.record('dedup', 2023)
+    assert scan_record['wall_s'] == pytest.approx(1.5)
+    assert (scan_record['calls'], scan_record['rows']) == (1, 30)
+    assert dedup_record['wall_s'] == pytest.approx(6.0)
+    assert (dedup_record['calls'], dedup_record['rows'], dedup_record['status']) == (3, 30, 'completed')
+
+def test_failed_stage_keeps_the_error_status(clock):
+    profiler = StageProfiler()
+    with pytest.raises(RuntimeError):
+        with profiler.stage('scan', 2023):
+            with profiler.stage('dedup', 2023):
+                clock(1.0)
+                raise RuntimeError('bad chunk')
+    with profiler.stage('dedup', 2023):
+        clock(1.0)
+
+    assert profiler.record('scan', 2023)['status'] == 'error'
+    assert profiler.record('dedup', 2023)['status'] == 'error'
+    assert profiler.record('scan', 2023)['wall_s'] == pytest.approx(0.0)
+
+def test_merged_worker_records_and_pipeline_graph(clock):
+    profiler = StageProfiler()
+    profiler.mark('download', 2022)
+    with profiler.stage('scan', 2023) as run:
+        clock(4.0)
+        run.add_rows(100)
+    worker = StageProfiler()
+    with worker.stage('scan', 2023) as run:
+        clock(2.0)
+        run.add_rows(50)
+    profiler.merge(worker.records)
+
+    graph = profiler.pipeline_graph([{'id': 'download', 'label': 'Download'}, {'id': 'scan', 'label': 'Scan'}])
+    download, scan = graph
+    assert download['years'][0]['status'] == 'cached'
+    assert (download['wall_s'], download['bottleneck']) == (0, False)
+    assert (scan['wall_s'], scan['rows'], scan['rows_per_s'], scan['bottleneck']) == (6.0, 150, 25.0, True)
+    assert [(y['year'], y['rows']) for y in scan['years']] == [(2023, 150)]
@@ -0,0 +1,59 @@
+import csv
+import io
+import pytest
+
+import fzl_shard_utils
+from process_census import scan_columns, scan_columns_mapped
+
+COLUMNS = ['NU_ANO_CENSO', 'NO_ENTIDADE', 'QT_MAT_ESP']
+
+def census_lines():
+    lines = ['NU_ANO_CENSO;NO_UF;NO_ENTIDADE;TP_DEPENDENCIA;QT_MAT_ESP']
+    for i in range(3000):
+        if i % 97 == 0:
+            # Quoted name holding the delimiter, and quotes escaped by doubling
+            name = f'"ESCOLA {i}; ANEXO ""CENTRO"""'
+        elif i % 89 == 0:
+            name = f'"ESCOLA {i}"'
+        else:
+            name = f'ESCOLA {i}'
+        lines.append(f"{2022 + i % 2};{'SÃO PAULO' if i % 3 else 'PARÁ'};{name};{1 + i % 4};{'' if i % 10 == 0 else i % 50}")
+    return ('\r\n'.join(lines) + '\r\n').encode('latin1')
+
+def dict_reader_rows(data):
+    reader = csv.DictReader(io.StringIO(data.decode('latin1'), newline=''), delimiter=';')
+    return sorted(tuple(row[c] for c in COLUMNS) for row in reader)
+
+def scanned_rows(blocks):
+    rows = []
+    for block in blocks:
+        rows += zip(*(values for values in block))
+    # Lines with quotes come after the plain lines of their block, so rows are compared as sets of rows
+    return sorted(tuple(v.decode('latin1') for v in row) for row in rows)
+
+@pytest.fixture
+def census_path(tmp_path):
+    path = tmp_path / 'microdados_ed_basica_2023.csv'
+    path.write_bytes(census_lines())
+    return str(path)
+
+@pytest.mark.parametrize('block_size', [4096, 1 << 20])
+def test_scan_columns_matches_dict_reader(block_size):
+    data = census_lines()
+    assert scanned_rows(scan_columns(io.BytesIO(data), COLUMNS, block_size=block_size)) == dict_reader_rows(data)
+
+@pytest.mark.parametrize('block_size', [4096, 1 << 20])
+def test_scan_columns_mapped_matches_dict_reader(census_path, block_size):
+    expected = dict_reader_rows(census_lines())
+    assert scanned_rows(scan_columns_mapped(census_path, COLUMNS, block_size=block_size)) == expected
+
+    shards = fzl_shard_utils.csv_shard_offsets(census_path, 3, min_shard_size=1024)
+    assert len(shards) == 3
+    sharded = []
+    for start, end in shards:
+        sharded += scanned_rows(scan_columns_mapped(census_path, COLUMNS, block_size=block_size, start=start, end=end))
+    assert sorted(sharded) == expected
+
+def test_missing_column_is_reported():
+    with pytest.raises(ValueError, match='QT_INEXISTENTE'):
+        next(scan_columns(io.BytesIO(census_lines()), ['NU_ANO_CENSO', 'QT_INEXISTENTE']))
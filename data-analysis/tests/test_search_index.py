@@ -0,0 +1,42 @@
+import json
+import pandas as pd
+
+from fzl_opendata_utils import (fold_search_text, tokenize_search_text, fzl_opendata_build_dictionary_search_index,
+                                fzl_opendata_write_dictionary_search_index)
+
+def _fields(*rows):
+    return pd.DataFrame([{'Nome da Variável': name, 'Descrição da Variável': desc} for name, desc in rows])
+
+def _search(index, token):
+    terms = index['terms']
+    return sorted(index['docs'][d][0] for d in index['postings'][terms.index(token)]) if token in terms else []
+
+def test_tokens_are_accent_folded_without_stopwords():
+    assert fold_search_text('Educação Básica - MATRÍCULAS') == 'educacao basica - matriculas'
+    assert tokenize_search_text('Número de Matrículas da Educação Especial') == ['numero', 'matriculas', 'educacao', 'especial']
+    assert tokenize_search_text('Água potável (rede pública)') == ['agua', 'potavel', 'rede', 'publica']
+
+def test_index_maps_name_parts_and_description_tokens_to_variables(tmp_path):
+    fields_by_year = {
+        2022: _fields(('QT_MAT_ESP', 'Número de Matrículas da Educação Especial'), ('IN_AGUA_POTAVEL', 'Água potável')),
+        '2023': _fields((' qt_mat_esp ', 'Número de  Matrículas da\nEducação Especial (revisado)'), ('CO_ENTIDADE', None)),
+    }
+    index = fzl_opendata_build_dictionary_search_index(fields_by_year)
+
+    assert index['years'] == ['2022', '2023']
+    assert index['docs'] == [
+        ['CO_ENTIDADE', '', [1]],
+        ['IN_AGUA_POTAVEL', 'Água potável', [0]],
+        # The description of the latest year, whitespace collapsed
+        ['QT_MAT_ESP', 'Número de Matrículas da Educação Especial (revisado)', [0, 1]],
+    ]
+    assert index['terms'] == sorted(index['terms'])
+    assert _search(index, 'educacao') == ['QT_MAT_ESP']
+    assert _search(index, 'agua') == ['IN_AGUA_POTAVEL']
+    assert _search(index, 'qt_mat_esp') == ['QT_MAT_ESP']
+    assert _search(index, 'mat') == ['QT_MAT_ESP']
+    assert _search(index, 'de') == []
+
+    path = tmp_path / 'dictionary' / 'search_index.json'
+    assert fzl_opendata_write_dictionary_search_index(fields_by_year, str(path)) == 3
+    assert json.loads(path.read_text(encoding='utf-8')) == index
@@ -0,0 +1,70 @@
+import io
+import os
+import pandas as pd
+import pytest
+
+import fzl_shard_utils
+import process_census
+from fzl_dedup_utils import DuplicateDetector, find_duplicates
+from fzl_opendata_censoeducacaoinep import aggregate_csv_sharded, aggregate_in_chunks, load_census_csv
+from test_aggregation import NARROW_PLAN, census_csv
+
+@pytest.fixture
+def census_file(tmp_path, monkeypatch):
+    # Small shards, so a test-sized file is still split across workers
+    monkeypatch.setattr(fzl_shard_utils, 'MIN_SHARD_SIZE', 64 * 1024)
+    path = tmp_path / 'microdados_ed_basica_2023.csv'
+    path.write_bytes(census_csv(60000))
+    return str(path)
+
+def test_sharded_sums_match_single_pass(census_file):
+    groupings = [['NU_ANO_CENSO'], ['NO_UF', 'NU_ANO_CENSO']]
+    assert len(fzl_shard_utils.csv_shard_offsets(census_file, 3)) == 3
+
+    sharded = aggregate_csv_sharded(census_file, groupings, workers=3, dtype=NARROW_PLAN, chunksize=7000)
+    single = aggregate_in_chunks(load_census_csv(census_file, dtype=NARROW_PLAN, chunksize=7000), groupings)
+
+    assert sharded[0]['QT_MAT_ESP'].tolist() == [30 * 54000, 30 * 54000]
+    for a, b in zip(sharded, single):
+        pd.testing.assert_frame_equal(a, b, check_dtype=False)
+
+def test_raw_scanner_sharded_matches_single_pass(census_file):
+    with open(census_file, 'rb') as f:
+        single = process_census.read_and_aggregate(f)
+    sharded = process_census.aggregate_file_sharded(census_file, workers=3, use_mmap=False)
+    mapped = process_census.aggregate_file_sharded(census_file, workers=3, use_mmap=True)
+
+    assert single == {'2022': 30 * 54000, '2023': 30 * 54000}
+    assert sharded == single
+    assert mapped == single
+
+def test_shard_rewinds_for_the_dtype_fallback(census_file):
+    with open(census_file, 'ab') as f:
+        f.write(b'2023;SP;2.5\n')
+    start, end = fzl_shard_utils.csv_shard_offsets(census_file, 3)[-1]
+    with fzl_shard_utils.open_shard(census_file, start, end) as shard:
+        first = shard.read()
+        shard.seek(0)
+        assert shard.read() == first
+
+    sharded = aggregate_csv_sharded(census_file, [['NU_ANO_CENSO']], workers=3, dtype=NARROW_PLAN, chunksize=7000)[0]
+    assert sharded['QT_MAT_ESP'].tolist() == [30 * 54000, 30 * 54000 + 2.5]
+
+def test_sharded_keys_reach_the_detector_chunk_by_chunk(census_file, tmp_path):
+    key_cols = ['NO_UF', 'QT_MAT_ESP']
+    received = []
+    detector = DuplicateDetector(key_cols, memory_budget=64 * 1024, spill_dir=str(tmp_path / 'spill'))
+
+    def on_keys(keys):
+        received.append(len(keys))
+        detector.add(keys)
+
+    aggregate_csv_sharded(census_file, [['NU_ANO_CENSO']], workers=3, dtype=NARROW_PLAN, chunksize=7000,
+                          key_cols=key_cols, on_keys=on_keys, spill_dir=str(tmp_path / 'spill'))
+    sharded = detector.finish(sample_size=None)
+    single = find_duplicates(load_census_csv(census_file, dtype=NARROW_PLAN, chunksize=7000), key_cols, sample_size=None)
+
+    assert max(received) <= 7000 and sum(received) == 120000
+    assert sharded['duplicate_rows'] == single['duplicate_rows']
+    assert sharded['sample'].to_json() == single['sample'].to_json()
+    assert os.listdir(tmp_path / 'spill') == []
@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+
+from fzl_sketch_utils import GroupSketch, SKETCH_QUANTILES
+
+def enrollments(rows=20000, seed=3, integral=False):
+    rng = np.random.default_rng(seed)
+    values = rng.lognormal(3, 1.2, rows)
+    return pd.DataFrame({
+        'NO_UF': rng.choice(['SP', 'RJ', 'MG'], rows),
+        'NU_ANO_CENSO': rng.choice([2022, 2023], rows),
+        'CO_ENTIDADE': np.arange(rows),
+        'NO_ENTIDADE': [f'ESCOLA {i}' for i in range(rows)],
+        'QT_MAT_ESP': np.round(values) if integral else values
+    })
+
+def test_merged_chunk_sketches_equal_one_sketch():
+    # Counts, as in the census: float sums would differ in the last digits with the order of additions
+    df = enrollments(integral=True)
+    whole = GroupSketch(['NO_UF'], 'QT_MAT_ESP', top_k=5)
+    whole.add(df)
+    merged = GroupSketch(['NO_UF'], 'QT_MAT_ESP', top_k=5)
+    for start in range(0, len(df), 3000):
+        part = merged.empty_copy()
+        part.add(df.iloc[start:start + 3000])
+        merged.merge(part)
+
+    assert merged.to_json() == whole.to_json()
+
+def test_quantiles_are_within_the_relative_accuracy():
+    df = enrollments()
+    sketch = GroupSketch(['NO_UF'], 'QT_MAT_ESP', relative_accuracy=0.01)
+    sketch.add(df)
+
+    estimates = sketch.quantiles().set_index(['NO_UF', 'NU_ANO_CENSO'])
+    for (uf, year), values in df.groupby(['NO_UF', 'NU_ANO_CENSO'])['QT_MAT_ESP']:
+        values = np.sort(values.to_numpy())
+        for q in SKETCH_QUANTILES:
+            exact = values[int(q * (len(values) - 1))]
+            assert abs(estimates.loc[(uf, year), f"p{round(q * 100):d}"] - exact) <= 0.01 * exact
+
+def test_top_k_and_totals_per_group():
+    df = enrollments(rows=500, integral=True)
+    sketch = GroupSketch([], 'QT_MAT_ESP', top_k=3)
+    sketch.add(df)
+
+    for record in sketch.to_records():
+        year_rows = df[df['NU_ANO_CENSO'] == record['NU_ANO_CENSO']]
+        assert record['count'] == len(year_rows)
+        assert record['max'] == year_rows['QT_MAT_ESP'].max()
+        assert [t['id'] for t in record['top']] == year_rows.nlargest(3, 'QT_MAT_ESP')['CO_ENTIDADE'].tolist()
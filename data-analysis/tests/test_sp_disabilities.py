@@ -0,0 +1,51 @@
+import csv
+import json
+import random
+import pytest
+
+import download_sp_data
+from download_sp_data import DISABILITY_MAP
+
+def row_wise_stats(path):
+    """
+    The csv.DictReader loop process_data replaced, kept as the reference.
+    """
+    stats, stats_by_rede = {}, {}
+    with open(path, 'r', encoding='latin1', errors='replace') as f:
+        reader = csv.DictReader(f, delimiter=';')
+        field_map = {name.strip(): name for name in reader.fieldnames}
+        def_cols = [field_map[f"DEF{i}"] for i in range(1, 11) if f"DEF{i}" in field_map]
+        for row in reader:
+            found = [DISABILITY_MAP[v] for v in (row.get(c, "0") for c in def_cols) if v and v != "0" and v in DISABILITY_MAP]
+            for d in found:
+                by_mun = stats.setdefault(row[field_map['MUN']], {})
+                by_mun[d] = by_mun.get(d, 0) + 1
+                by_rede = stats_by_rede.setdefault(row[field_map['NOMEDEP']], {}).setdefault(row[field_map['MUN']], {})
+                by_rede[d] = by_rede.get(d, 0) + 1
+    return stats, stats_by_rede
+
+@pytest.fixture
+def sp_files(tmp_path, monkeypatch):
+    rng = random.Random(7)
+    codes = list(DISABILITY_MAP) + ['', '99', ' ']
+    lines = ['ANO;MUN ;NOMEDEP;DEF1;DEF2;DEF3;SERIE']
+    for _ in range(5000):
+        defs = [rng.choice(codes) if rng.random() < 0.3 else '0' for _ in range(3)]
+        mun = rng.choice(['SÃO PAULO', 'CAMPINAS', 'SANTOS', 'ARAÇATUBA'])
+        lines.append(f"2024;{mun};{rng.choice(['ESTADUAL', 'MUNICIPAL', 'PRIVADA'])};{';'.join(defs)};1")
+    raw = tmp_path / 'microdados_sp_2024.csv'
+    raw.write_bytes(('\n'.join(lines) + '\n').encode('latin1'))
+    monkeypatch.setattr(download_sp_data, 'RAW_FILE', str(raw))
+    monkeypatch.setattr(download_sp_data, 'JSON_OUTPUT', str(tmp_path / 'stats.json'))
+    monkeypatch.setattr(download_sp_data, 'JSON_OUTPUT_BY_REDE', str(tmp_path / 'stats_by_rede.json'))
+    return raw, tmp_path
+
+@pytest.mark.parametrize('chunksize', [333, 100000])
+def test_columnar_counts_match_the_row_wise_loop(sp_files, chunksize):
+    raw, out = sp_files
+    stats, stats_by_rede = row_wise_stats(raw)
+    download_sp_data.process_data(by_rede=True, chunksize=chunksize)
+
+    # Same JSON text: the same counts in the same key order
+    assert (out / 'stats.json').read_text(encoding='utf-8') == json.dumps(stats, ensure_ascii=False, indent=4)
+    assert (out / 'stats_by_rede.json').read_text(encoding='utf-8') == json.dumps(stats_by_rede, ensure_ascii=False, indent=4)
@@ -0,0 +1,54 @@
+import pytest
+
+import main
+from fzl_cache_utils import load_cached_stage, save_cached_stage, stage_cache_key
+from fzl_synthetic_census import make_synthetic_census_zip
+
+@pytest.fixture
+def census_dirs(tmp_path, monkeypatch):
+    data_dir = tmp_path / 'data'
+    data_dir.mkdir()
+    monkeypatch.setattr(main, 'DATA_DIR', str(data_dir))
+    monkeypatch.setattr(main, 'CACHE_DIR', str(data_dir / 'cache'))
+    monkeypatch.setattr(main, 'ANGULAR_ASSETS_DIR', str(tmp_path / 'assets'))
+    return data_dir
+
+def _add_year(data_dir, year, seed=0):
+    make_synthetic_census_zip(str(data_dir / f"microdados_censo_escolar_{year}.zip"), year, rows=2000, seed=seed)
+
+def test_stage_cache_key_changes_with_any_input(tmp_path):
+    key = stage_cache_key('zip-sha', ['QT_MAT_ESP'], '10')
+    assert key == stage_cache_key('zip-sha', ['QT_MAT_ESP'], '10')
+    assert key != stage_cache_key('zip-sha', ['QT_MAT_BAS'], '10')
+    assert key != stage_cache_key('zip-sha', ['QT_MAT_ESP'], '11')
+
+    assert load_cached_stage(str(tmp_path), '2023', 'process', key) is None
+    save_cached_stage(str(tmp_path), '2023', 'process', key, {'rows': 1})
+    assert load_cached_stage(str(tmp_path), '2023', 'process', key) == {'rows': 1}
+    # A new key replaces the older entry of the same stage
+    save_cached_stage(str(tmp_path), '2023', 'process', 'other', {'rows': 2})
+    assert load_cached_stage(str(tmp_path), '2023', 'process', key) is None
+
+def test_rerun_serves_unchanged_years_from_the_cache(census_dirs):
+    _add_year(census_dirs, '2022')
+    first, = main.run_years(['2022'], chunksize=500)
+    assert first['cached_stages'] == []
+
+    second, = main.run_years(['2022'], chunksize=500)
+    assert {'sanitize', 'process'} <= set(second['cached_stages'])
+    for name, table in first['aggregates'].items():
+        assert second['aggregates'][name].equals(table)
+
+def test_only_a_newly_added_year_is_processed(census_dirs):
+    _add_year(census_dirs, '2022')
+    main.run_years(['2022'], chunksize=500)
+
+    _add_year(census_dirs, '2023', seed=1)
+    old, new = main.run_years(['2022', '2023'], chunksize=500)
+    assert {'sanitize', 'process'} <= set(old['cached_stages'])
+    assert new['cached_stages'] == []
+
+    # A changed zip (new content hash) is processed again
+    _add_year(census_dirs, '2022', seed=2)
+    changed, = main.run_years(['2022'], chunksize=500)
+    assert changed['cached_stages'] == []